@@ -8,6 +8,11 @@ load_dotenv()
 from flask import Flask, request
 from queue import Queue
 from services.webhook import send_webhook
+from services.job_history import record_job, payload_size
+from services.job_progress import get_job_progress
+from services.cancellation import CANCELLED_STATUS_CODE, register_job, release_job
+from services.file_management import remove_job_workspace
+from services import metrics
 import threading
 import uuid
 import time
@@ -21,15 +26,40 @@ def create_app():
     # Create a queue to hold tasks
     task_queue = Queue()
     queue_id = id(task_queue)  # Generate a single queue_id for this worker
+    metrics.register_gauge("nca_queue_depth", "Jobs waiting in each queue lane", ("lane",),
+                           lambda: [({"lane": "webhook"}, task_queue.qsize())])
+    metrics.REGISTRY.start_flusher()
+    progress = get_job_progress()
+
+    # Run a job unless it was cancelled while queued. A job cancelled before or
+    # while running reports CANCELLED_STATUS_CODE. The job's workspace is removed
+    # when it ends, whatever the outcome.
+    def run_task(job_id, endpoint, task_func):
+        token = register_job(job_id)
+        try:
+            response = None
+            if not token.cancelled:
+                progress.status(job_id, "started")
+                response = task_func()
+            if token.cancelled:
+                response = (token.reason, response[1] if response else endpoint, CANCELLED_STATUS_CODE)
+        finally:
+            release_job(job_id)
+            remove_job_workspace(job_id)
+        if response[2] == 200:
+            progress.finish(job_id, "succeeded", code=200)
+        else:
+            progress.finish(job_id, "cancelled" if response[2] == CANCELLED_STATUS_CODE else "failed", code=response[2])
+        return response
 
     # Function to process tasks from the queue
     def process_queue():
         while True:
-            job_id, data, task_func, queue_start_time = task_queue.get()
+            job_id, data, task_func, queue_start_time, endpoint = task_queue.get()
             queue_time = time.time() - queue_start_time
             run_start_time = time.time()
             pid = os.getpid()  # Get the PID of the actual processing thread
-            response = task_func()
+            response = run_task(job_id, endpoint, task_func)
             run_time = time.time() - run_start_time
             total_time = time.time() - queue_start_time
 
@@ -49,6 +79,23 @@ def create_app():
                 "build_number": BUILD_NUMBER  # Add build number to response
             }
 
+            metrics.observe_job(response[1], response[2], run_time, queue_time)
+            record_job(
+                job_id=job_id,
+                endpoint=response[1],
+                status_code=response[2],
+                run_time=run_time,
+                queue_time=queue_time,
+                total_time=total_time,
+                queued=True,
+                queue_id=queue_id,
+                pid=pid,
+                request_bytes=payload_size(data),
+                response_bytes=payload_size(response[0]),
+                stages=response[0].get("stages") if isinstance(response[0], dict) else None,
+                error=None if response[2] == 200 else str(response[0])
+            )
+
             send_webhook(data.get("webhook_url"), response_data)
 
             task_queue.task_done()
@@ -67,8 +114,23 @@ def create_app():
                 
                 if bypass_queue or 'webhook_url' not in data:
                     
-                    response = f(job_id=job_id, data=data, *args, **kwargs)
+                    if data.get("progress_webhook_url"):
+                        progress.set_webhook(job_id, data["progress_webhook_url"])
+                    response = run_task(job_id, request.path, lambda: f(job_id=job_id, data=data, *args, **kwargs))
                     run_time = time.time() - start_time
+                    metrics.observe_job(response[1], response[2], run_time)
+                    record_job(
+                        job_id=job_id,
+                        endpoint=response[1],
+                        status_code=response[2],
+                        run_time=run_time,
+                        queue_id=queue_id,
+                        pid=pid,
+                        request_bytes=payload_size(data),
+                        response_bytes=payload_size(response[0]),
+                        stages=response[0].get("stages") if isinstance(response[0], dict) else None,
+                        error=None if response[2] == 200 else str(response[0])
+                    )
                     return {
                         "code": response[2],
                         "id": data.get("id"),
@@ -85,6 +147,7 @@ def create_app():
                     }, response[2]
                 else:
                     if MAX_QUEUE_LENGTH > 0 and task_queue.qsize() >= MAX_QUEUE_LENGTH:
+                        metrics.QUEUE_REJECTIONS.inc(lane="webhook")
                         return {
                             "code": 429,
                             "id": data.get("id"),
@@ -96,7 +159,12 @@ def create_app():
                             "build_number": BUILD_NUMBER  # Add build number to response
                         }, 429
                     
-                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
+                    if data.get("progress_webhook_url"):
+                        progress.set_webhook(job_id, data["progress_webhook_url"])
+                    # Registered now so that DELETE /v1/jobs/<job_id> can cancel it while it waits
+                    register_job(job_id)
+                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time, request.path))
+                    progress.status(job_id, "queued", queue_length=task_queue.qsize())
                     
                     return {
                         "code": 202,
@@ -125,6 +193,7 @@ def create_app():
     from routes.extract_keyframes import extract_keyframes_bp
     from routes.image_to_video import image_to_video_bp
     from routes.health import health_bp  # Import the new health blueprint
+    from routes.metrics import metrics_bp
     
 
     # Register blueprints
@@ -138,6 +207,7 @@ def create_app():
     app.register_blueprint(extract_keyframes_bp)
     app.register_blueprint(image_to_video_bp)
     app.register_blueprint(health_bp)  # Register the health blueprint
+    app.register_blueprint(metrics_bp)
     
     
 
@@ -154,8 +224,12 @@ def create_app():
     from routes.v1.video.add_title_to_video import add_title_to_video_bp
     from routes.v1.image.transform.image_to_video import v1_image_transform_video_bp
     from routes.v1.image.add_title_to_image import add_title_to_image_bp
+    from routes.v1.image.add_title_to_image_batch import add_title_to_image_batch_bp
     from routes.v1.toolkit.test import v1_toolkit_test_bp
     from routes.v1.toolkit.authenticate import v1_toolkit_auth_bp
+    from routes.v1.toolkit.job_stats import v1_toolkit_job_stats_bp
+    from routes.v1.jobs.job_events import v1_jobs_events_bp
+    from routes.v1.jobs.cancel_job import v1_jobs_cancel_bp
     from routes.v1.code.execute.execute_python import v1_code_execute_bp
 
     app.register_blueprint(v1_ffmpeg_compose_bp)
@@ -169,11 +243,19 @@ def create_app():
     app.register_blueprint(replicate_auto_caption_bp)
     app.register_blueprint(add_title_to_video_bp)
     app.register_blueprint(add_title_to_image_bp)
+    app.register_blueprint(add_title_to_image_batch_bp)
     app.register_blueprint(v1_image_transform_video_bp)
     app.register_blueprint(v1_toolkit_test_bp)
     app.register_blueprint(v1_toolkit_auth_bp)
+    app.register_blueprint(v1_toolkit_job_stats_bp)
+    app.register_blueprint(v1_jobs_events_bp)
+    app.register_blueprint(v1_jobs_cancel_bp)
     app.register_blueprint(v1_code_execute_bp)
 
+    # Build the font index in the background so the first render does not wait for it
+    from services.v1.fonts.font_registry import get_font_registry
+    threading.Thread(target=get_font_registry().load, daemon=True).start()
+
     return app
 
 app = create_app()
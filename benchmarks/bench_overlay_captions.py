@@ -0,0 +1,94 @@
+"""
+Benchmark the overlay caption engine against the libass subtitles filter.
+
+Generates a synthetic video and an SRT file with many short Thai events, burns
+the subtitles in with both engines and reports wall time, output size and the
+SSIM between the two renders.
+
+Usage:
+    python benchmarks/bench_overlay_captions.py --duration 300 --events 600
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.v1.video.caption_video import add_subtitles_to_video
+
+SAMPLE_LINES = [
+    "สวัสดีครับ วันนี้เราจะมาเรียนรู้เรื่องใหม่",
+    "การตัดต่อวิดีโอไม่ใช่เรื่องยากอย่างที่คิด",
+    "ขอบคุณที่ติดตามชมนะครับ",
+    "This line mixes English and ภาษาไทย",
+    "อย่าลืมกดติดตามช่องของเรา",
+]
+
+def make_test_video(path, duration, width, height):
+    subprocess.run([
+        "ffmpeg", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "60",
+        "-c:a", "aac", "-shortest",
+        path
+    ], check=True, capture_output=True)
+
+def make_test_srt(path, duration, events):
+    step = duration / events
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(events):
+            start = i * step
+            end = start + step * 0.9
+            f.write(f"{i + 1}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{SAMPLE_LINES[i % len(SAMPLE_LINES)]} #{i % 50}\n\n")
+
+def format_srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    h, millis = divmod(millis, 3600000)
+    m, millis = divmod(millis, 60000)
+    s, millis = divmod(millis, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{millis:03d}"
+
+def measure_ssim(reference, distorted):
+    result = subprocess.run(
+        ["ffmpeg", "-i", reference, "-i", distorted, "-lavfi", "ssim", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    match = re.search(r"All:([0-9.]+)", result.stderr)
+    return float(match.group(1)) if match else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=120, help="Video duration in seconds")
+    parser.add_argument("--events", type=int, default=300, help="Number of subtitle events")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_overlay_")
+    video_path = os.path.join(work_dir, "input.mp4")
+    srt_path = os.path.join(work_dir, "subtitles.srt")
+    make_test_video(video_path, args.duration, args.width, args.height)
+    make_test_srt(srt_path, args.duration, args.events)
+
+    results = {}
+    for engine in ("libass", "overlay"):
+        output_path = os.path.join(work_dir, f"output_{engine}.mp4")
+        start = time.perf_counter()
+        add_subtitles_to_video(video_path, srt_path, output_path, font_size=48, font_name="Sarabun", engine=engine)
+        elapsed = time.perf_counter() - start
+        results[engine] = (elapsed, os.path.getsize(output_path), output_path)
+        print(f"{engine:8s} {elapsed:8.2f}s  {os.path.getsize(output_path) / 1e6:8.2f} MB")
+
+    speedup = results["libass"][0] / results["overlay"][0]
+    ssim = measure_ssim(results["libass"][2], results["overlay"][2])
+    print(f"speedup  {speedup:8.2f}x")
+    print(f"SSIM libass vs overlay: {ssim}")
+    print(f"outputs in {work_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark script-to-transcript alignment on long scripts.
+
+Builds a script of about one hour of speech (150 words per minute by default),
+derives a noisy transcript from it by dropping, inserting and replacing words
+as speech recognition does, splits it into cues and aligns the script with the
+cues. Reports the alignment time and the share of cues that got exactly the
+script words they were built from.
+
+Usage:
+    python benchmarks/bench_script_alignment.py --minutes 60 --noise 0.1
+    python benchmarks/bench_script_alignment.py --thai
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.v1.subtitles.script_aligner import align_script_to_cues
+
+THAI_WORDS = [
+    "สวัสดี", "วันนี้", "เรา", "จะ", "มา", "เรียนรู้", "เรื่อง", "ใหม่", "ที่", "น่าสนใจ",
+    "การ", "ตัดต่อ", "วิดีโอ", "ไม่", "ใช่", "ยาก", "อย่าง", "หลาย", "คน", "คิด",
+    "ขอบคุณ", "ติดตาม", "ชม", "แล้ว", "พบ", "กัน", "ตอน", "หน้า", "ช่อง", "สำคัญ",
+]
+
+def make_vocabulary(thai, size=4000):
+    if thai:
+        # Compound Thai words so the vocabulary is realistic in size
+        return [a + b for a in THAI_WORDS for b in THAI_WORDS][:size]
+    return [f"word{i}" for i in range(size)]
+
+def make_case(minutes, words_per_minute, words_per_cue, noise, thai, seed):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(thai)
+    script_words = [rng.choice(vocabulary) for _ in range(minutes * words_per_minute)]
+
+    cues = []
+    expected = []
+    for start in range(0, len(script_words), words_per_cue):
+        words = script_words[start:start + words_per_cue]
+        expected.append(words)
+        heard = []
+        for word in words:
+            roll = rng.random()
+            if roll < noise / 3:
+                continue
+            if roll < noise * 2 / 3:
+                heard.append(rng.choice(vocabulary))
+                continue
+            heard.append(word)
+            if roll < noise:
+                heard.append(rng.choice(vocabulary))
+        cues.append(heard)
+
+    separator = "" if thai else " "
+    script = separator.join(script_words)
+    cue_texts = [separator.join(words) for words in cues]
+    expected_texts = [separator.join(words) for words in expected]
+    return script, cue_texts, expected_texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=60, help="Length of the script in minutes of speech")
+    parser.add_argument("--wpm", type=int, default=150, help="Words per minute")
+    parser.add_argument("--words-per-cue", type=int, default=8)
+    parser.add_argument("--noise", type=float, default=0.1, help="Fraction of transcribed words that are wrong")
+    parser.add_argument("--thai", action="store_true", help="Use Thai text without spaces")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    script, cue_texts, expected = make_case(args.minutes, args.wpm, args.words_per_cue, args.noise, args.thai, args.seed)
+    print(f"script: {len(script)} characters, {len(cue_texts)} cues")
+
+    start = time.perf_counter()
+    alignments = align_script_to_cues(script, cue_texts, is_thai=args.thai)
+    elapsed = time.perf_counter() - start
+
+    placed = sum(1 for alignment in alignments if alignment.text)
+    exact = sum(1 for alignment, text in zip(alignments, expected) if alignment.text == text)
+    print(f"aligned in {elapsed:.3f}s ({len(cue_texts) / elapsed:.0f} cues/s)")
+    print(f"placed {placed / len(cue_texts):.1%} of cues, exact spans for {exact / len(cue_texts):.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark SRT to ASS conversion for long-form Thai subtitle files.
+
+Generates an SRT file with many Thai cues (10k by default, as produced by
+long-form transcripts), converts it with the streaming ASS transcoder and
+reports the wall time, cues per second and peak Python memory. A second run
+shows the effect of the warm tokenization cache.
+
+Usage:
+    python benchmarks/bench_srt_to_ass.py --cues 10000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.v1.subtitles.ass_transcoder import transcode_srt_to_ass
+from services.v1.subtitles.thai_tokenizer import clear_cache, get_cache_stats
+
+SAMPLE_LINES = [
+    "สวัสดีครับ วันนี้เราจะมาเรียนรู้เรื่องใหม่ที่น่าสนใจมาก",
+    "การตัดต่อวิดีโอไม่ใช่เรื่องยากอย่างที่หลายคนคิด",
+    "ขอบคุณที่ติดตามชมนะครับ แล้วพบกันใหม่ในตอนหน้า",
+    "ถ้าชอบวิดีโอนี้ อย่าลืมกดไลก์และกดติดตามช่องของเรา",
+    "เรื่องนี้สำคัญมากสำหรับผู้เริ่มต้นทุกคน",
+]
+
+def format_srt_time(milliseconds):
+    h, milliseconds = divmod(milliseconds, 3600000)
+    m, milliseconds = divmod(milliseconds, 60000)
+    s, milliseconds = divmod(milliseconds, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{milliseconds:03d}"
+
+def make_test_srt(path, cues, unique):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(cues):
+            start = i * 2500
+            text = SAMPLE_LINES[i % len(SAMPLE_LINES)]
+            if unique:
+                text = f"{text} ตอนที่ {i}"
+            f.write(f"{i + 1}\n{format_srt_time(start)} --> {format_srt_time(start + 2200)}\n{text}\n\n")
+
+def run(srt_path, ass_path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = transcode_srt_to_ass(srt_path, ass_path, "Sarabun", font_size=48)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, default=10000, help="Number of subtitle cues")
+    parser.add_argument("--unique", action="store_true", help="Make every cue distinct (no tokenizer cache hits)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_srt_to_ass_")
+    srt_path = os.path.join(work_dir, "subtitles.srt")
+    ass_path = os.path.join(work_dir, "subtitles.ass")
+    make_test_srt(srt_path, args.cues, args.unique)
+    print(f"SRT: {args.cues} cues, {os.path.getsize(srt_path) / 1e6:.2f} MB")
+
+    clear_cache()
+    for label in ("cold cache", "warm cache"):
+        count, elapsed, peak = run(srt_path, ass_path)
+        print(f"{label:10s} {elapsed:8.3f}s  {count / elapsed:10.0f} cues/s  peak {peak / 1e6:6.2f} MB")
+
+    print(f"tokenizer cache: {get_cache_stats()}")
+    print(f"output in {ass_path}")
+
+if __name__ == "__main__":
+    main()
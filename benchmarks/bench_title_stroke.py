@@ -0,0 +1,76 @@
+"""
+Benchmark the single-pass text border against the per-offset redraw it replaced.
+
+Renders a three-line Thai title onto a 1080x1920 image at several border widths
+with both methods and reports the per-image render time and the share of pixels
+that differ between the two outputs.
+
+Usage:
+    python benchmarks/bench_title_stroke.py --font-size 64 --iterations 20
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.v1.image.add_title_to_image import draw_text_border
+from services.v1.fonts.font_registry import find_thai_font
+from services.v1.fonts.font_cache import load_font
+
+TITLE_LINES = [
+    "สวัสดีครับ วันนี้เราจะมาเรียนรู้",
+    "การตัดต่อวิดีโอไม่ใช่เรื่องยาก",
+    "Subscribe และกดติดตาม",
+]
+
+def draw_border_per_offset(draw, position, text, font, border_color, border_width):
+    """The previous border: one full text rasterization per (dx, dy) offset."""
+    x, y = position
+    for offset_x in range(-border_width, border_width + 1):
+        for offset_y in range(-border_width, border_width + 1):
+            if offset_x != 0 or offset_y != 0:
+                draw.text((x + offset_x, y + offset_y), text, font=font, fill=border_color)
+
+def render(border_func, font, font_size, border_width):
+    image = Image.new("RGB", (1080, 1920), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(TITLE_LINES):
+        y = 1500 + i * int(font_size * 1.3)
+        x = (1080 - draw.textlength(line, font=font)) / 2
+        border_func(draw, (x, y), line, font, "black", border_width)
+        draw.text((x, y), line, font=font, fill="white")
+    return image
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--font-size", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=10, help="Renders per method and border width")
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 2, 3, 5, 8])
+    args = parser.parse_args()
+
+    font = load_font(find_thai_font(), args.font_size)
+
+    print(f"{'width':>5s} {'per-offset':>12s} {'single-pass':>12s} {'speedup':>8s} {'diff px':>8s}")
+    for border_width in args.widths:
+        timings = {}
+        images = {}
+        for name, border_func in (("per_offset", draw_border_per_offset), ("single_pass", draw_text_border)):
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                images[name] = render(border_func, font, args.font_size, border_width)
+            timings[name] = (time.perf_counter() - start) / args.iterations
+
+        # Square offsets and round strokes differ slightly at the corners of the outline
+        difference = np.any(np.asarray(images["per_offset"]) != np.asarray(images["single_pass"]), axis=2)
+        print(
+            f"{border_width:5d} {timings['per_offset'] * 1000:10.1f}ms {timings['single_pass'] * 1000:10.1f}ms "
+            f"{timings['per_offset'] / timings['single_pass']:7.1f}x {difference.mean() * 100:7.3f}%"
+        )
+
+if __name__ == "__main__":
+    main()
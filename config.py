@@ -22,6 +22,9 @@ if not API_KEY:
     if os.environ.get('ENVIRONMENT') != 'production':
         API_KEY = "test123"  # Default for development only
 
+# Directory for state that must survive restarts, such as the job history
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
 # GCP environment variables
 GCP_SA_CREDENTIALS = os.environ.get('GCP_SA_CREDENTIALS', '')
 GCP_BUCKET_NAME = os.environ.get('GCP_BUCKET_NAME', '')
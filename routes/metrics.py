@@ -0,0 +1,18 @@
+from flask import Blueprint, Response
+import logging
+from services import metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus scrape endpoint: queue depth, job durations, ffmpeg time,
+    transferred bytes, cache hit ratios, transcription speed and webhook delivery.
+    With PROMETHEUS_MULTIPROC_DIR set, every worker reports the totals of all workers.
+    """
+    return Response(metrics.REGISTRY.expose(), content_type=metrics.CONTENT_TYPE)
@@ -7,6 +7,9 @@ from app_utils import *
 from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.job_progress import get_job_progress
+from services.file_management import remove_job_workspace
+from services.cancellation import CANCELLED_STATUS_CODE, claim_job_id, register_job, release_job
 
 v1_ffmpeg_compose_bp = Blueprint('v1_ffmpeg_compose', __name__)
 logger = logging.getLogger(__name__)
@@ -91,6 +94,8 @@ logger = logging.getLogger(__name__)
             }
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "progress_webhook_url": {"type": "string", "format": "uri"},
+        "job_id": {"type": "string", "pattern": "^[A-Za-z0-9_-]{8,128}$"},
         "id": {"type": "string"}
     },
     "required": ["inputs", "outputs"],
@@ -101,15 +106,30 @@ def ffmpeg_compose():
     Flexible FFmpeg composition endpoint.
     
     This endpoint allows for flexible composition of FFmpeg commands,
-    supporting multiple inputs, filters, and outputs.
+    supporting multiple inputs, filters, and outputs. Progress is published
+    at /v1/jobs/<job_id>/events once the request has started; pass job_id to know the ID up front.
+    DELETE /v1/jobs/<job_id> cancels the request and stops its ffmpeg processes.
     """
+    job_id = None
     try:
-        # Generate a unique job ID
-        job_id = str(uuid.uuid4())
-        logger.info(f"Job {job_id}: Received flexible FFmpeg request")
-        
         # Get request data
         data = request.get_json()
+        
+        # Use the caller's job ID if given so it can follow the progress events
+        if data.get("job_id"):
+            try:
+                cancellation = claim_job_id(data["job_id"])
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            job_id = data["job_id"]
+        else:
+            job_id = str(uuid.uuid4())
+            cancellation = register_job(job_id)
+        logger.info(f"Job {job_id}: Received flexible FFmpeg request")
+        progress = get_job_progress()
+        if data.get("progress_webhook_url"):
+            progress.set_webhook(job_id, data["progress_webhook_url"])
+        progress.status(job_id, "started")
         logger.debug(f"Job {job_id}: Request data: {json.dumps(data, indent=2)}")
         
         # Process FFmpeg request
@@ -119,8 +139,11 @@ def ffmpeg_compose():
             logger.debug(f"Job {job_id}: Output filenames: {output_filenames}")
             logger.debug(f"Job {job_id}: Metadata: {json.dumps(metadata, indent=2, default=str)}")
         except Exception as e:
+            if cancellation.cancelled:
+                return cancelled_response(job_id, cancellation)
             logger.error(f"Job {job_id}: Error processing FFmpeg request - {str(e)}")
             logger.exception(e)  # Log the full stack trace
+            progress.finish(job_id, "failed", code=500, error=str(e))
             return jsonify({"status": "error", "message": f"Error processing FFmpeg request: {str(e)}"}), 500
         
         # Upload results to cloud storage
@@ -133,7 +156,7 @@ def ffmpeg_compose():
                     continue
                     
                 # Upload the file
-                file_url = upload_file(output_filename)
+                file_url = upload_file(output_filename, job_id=job_id)
                 logger.info(f"Job {job_id}: Uploaded file {i+1}/{len(output_filenames)} to {file_url}")
                 
                 # Add to response
@@ -147,7 +170,7 @@ def ffmpeg_compose():
                     
                     # If there's a thumbnail, upload it too
                     if "thumbnail" in metadata[i] and os.path.exists(metadata[i]["thumbnail"]):
-                        thumbnail_url = upload_file(metadata[i]["thumbnail"])
+                        thumbnail_url = upload_file(metadata[i]["thumbnail"], job_id=job_id)
                         result["metadata"]["thumbnail_url"] = thumbnail_url
                         logger.info(f"Job {job_id}: Uploaded thumbnail to {thumbnail_url}")
                 
@@ -168,13 +191,27 @@ def ffmpeg_compose():
                     except Exception as e:
                         logger.warning(f"Job {job_id}: Failed to remove thumbnail file {metadata[i]['thumbnail']}: {str(e)}")
         except Exception as e:
+            if cancellation.cancelled:
+                return cancelled_response(job_id, cancellation)
             logger.error(f"Job {job_id}: Error uploading results - {str(e)}")
             logger.exception(e)  # Log the full stack trace
+            progress.finish(job_id, "failed", code=500, error=str(e))
             return jsonify({"status": "error", "message": f"Error uploading results: {str(e)}"}), 500
         
         logger.info(f"Job {job_id}: Request completed successfully")
-        return jsonify({"status": "success", "response": response})
+        progress.finish(job_id, "succeeded", code=200)
+        return jsonify({"status": "success", "job_id": job_id, "response": response})
     except Exception as e:
         logger.error(f"Unhandled error in FFmpeg compose endpoint: {str(e)}")
         logger.exception(e)  # Log the full stack trace
-        return jsonify({"status": "error", "message": f"Unhandled error: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"status": "error", "message": f"Unhandled error: {str(e)}"}), 500
+    finally:
+        if job_id:
+            release_job(job_id)
+            remove_job_workspace(job_id)
+
+def cancelled_response(job_id, cancellation):
+    """Build the response of a cancelled compose job; its workspace is removed when the request ends."""
+    get_job_progress().finish(job_id, "cancelled", code=CANCELLED_STATUS_CODE)
+    logger.info(f"Job {job_id}: FFmpeg request cancelled")
+    return jsonify({"status": "cancelled", "job_id": job_id, "message": cancellation.reason}), CANCELLED_STATUS_CODE
\ No newline at end of file
@@ -10,7 +10,9 @@ from werkzeug.utils import secure_filename
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from io import BytesIO
-from pythainlp import word_tokenize
+from services.v1.subtitles.thai_tokenizer import tokenize as thai_tokenize
+from services.v1.fonts import font_registry
+from services.v1.fonts.font_cache import load_font
 
 # Comment out GCP imports but keep them for future use
 # from services.gcp_toolkit import upload_to_gcs_with_path, generate_signed_url
@@ -94,22 +96,10 @@ def add_title_to_image():
         job_id = str(uuid.uuid4())
         logger.info(f"[DEBUG] Generated job ID: {job_id}")
         
-        # Clean title text by removing colons and semicolons
-        title = clean_title_text(title)
-        logger.info(f"[DEBUG] Cleaned title: {title}")
-        
-        # Split title into lines for better display
-        title_lines = adaptive_split_thai_text(title, max_lines)
-        logger.info(f"[DEBUG] Split title into {len(title_lines)} lines: {title_lines}")
-        
-        # Auto-highlight important words if requested
-        if auto_highlight:
-            logger.info(f"[DEBUG] Auto-highlighting enabled, looking for {highlight_count} important words")
-            auto_highlight_words = find_important_words(title, highlight_count)
-            logger.info(f"[DEBUG] Auto-highlighted words: {auto_highlight_words}")
-            # Combine with manually specified highlight words
-            highlight_words = list(set(highlight_words + auto_highlight_words))
-            logger.info(f"[DEBUG] Final highlight words: {highlight_words}")
+        # Clean the title, split it into lines and pick the words to highlight
+        title_lines, highlight_words = prepare_title_lines(
+            title, max_lines, highlight_words, auto_highlight, highlight_count
+        )
         
         # Process the image
         logger.info("[DEBUG] Starting image processing")
@@ -137,6 +127,39 @@ def add_title_to_image():
         logger.error(f"[DEBUG] Error in add_title_to_image: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def prepare_title_lines(title, max_lines=3, highlight_words=[], auto_highlight=False, highlight_count=2):
+    """
+    Clean a title, split it into display lines and collect the words to highlight.
+    
+    Args:
+        title: Title text
+        max_lines: Maximum number of lines to display
+        highlight_words: Words to highlight
+        auto_highlight: Whether to also highlight automatically found important words
+        highlight_count: Number of words to auto-highlight
+        
+    Returns:
+        Tuple of (title_lines, highlight_words)
+    """
+    # Clean title text by removing colons and semicolons
+    title = clean_title_text(title)
+    logger.info(f"[DEBUG] Cleaned title: {title}")
+    
+    # Split title into lines for better display
+    title_lines = adaptive_split_thai_text(title, max_lines)
+    logger.info(f"[DEBUG] Split title into {len(title_lines)} lines: {title_lines}")
+    
+    # Auto-highlight important words if requested
+    if auto_highlight:
+        logger.info(f"[DEBUG] Auto-highlighting enabled, looking for {highlight_count} important words")
+        auto_highlight_words = find_important_words(title, highlight_count)
+        logger.info(f"[DEBUG] Auto-highlighted words: {auto_highlight_words}")
+        # Combine with manually specified highlight words
+        highlight_words = list(set(highlight_words + auto_highlight_words))
+        logger.info(f"[DEBUG] Final highlight words: {highlight_words}")
+    
+    return title_lines, highlight_words
+
 def clean_title_text(text):
     """
     Clean title text by removing colons and semicolons.
@@ -205,71 +228,23 @@ def find_thai_font(font_size=64, font_name=None):
     Returns:
         PIL ImageFont object
     """
-    # Check for fonts in the project's fonts directory first
-    project_fonts = [
-        # Prioritize Sarabun (modern Thai sans-serif)
-        os.path.join('fonts', 'Sarabun-Regular.ttf'),
-        os.path.join('fonts', 'Sarabun-Bold.ttf'),
-        os.path.join('fonts', 'Sarabun-Medium.ttf'),
-        # Then Noto Sans Thai (excellent Thai support)
-        os.path.join('fonts', 'NotoSansThai-Regular.ttf'),
-        os.path.join('fonts', 'NotoSansThai-Bold.ttf'),
-        os.path.join('fonts', 'NotoSansThai-Medium.ttf')
-    ]
+    registry = font_registry.get_font_registry()
     
     # If a specific font name is provided, try to use it first
+    candidates = []
     if font_name:
-        specific_font = os.path.join('fonts', font_name)
-        if os.path.exists(specific_font):
-            try:
-                return ImageFont.truetype(specific_font, font_size)
-            except Exception as e:
-                logger.warning(f"Could not load specified font {specific_font}: {str(e)}")
-    
-    # Try project fonts first
-    for path in project_fonts:
-        if os.path.exists(path):
-            try:
-                logger.info(f"Loading Thai font: {path}")
-                return ImageFont.truetype(path, font_size)
-            except Exception as e:
-                logger.warning(f"Could not load font {path}: {str(e)}")
-    
-    # Try common Thai sans-serif font paths (prioritizing sans-serif fonts)
-    possible_paths = [
-        # Sans-serif Thai fonts
-        "/usr/share/fonts/truetype/thai-tlwg/Garuda.ttf",
-        "/usr/share/fonts/truetype/thai-tlwg/Garuda-Bold.ttf",
-        "/usr/share/fonts/custom/Garuda.ttf",
-        "/usr/share/fonts/custom/Garuda-Bold.ttf",
-        "/usr/share/fonts/truetype/thai-tlwg/THSarabunNew.ttf",
-        "/usr/share/fonts/truetype/thai-tlwg/THSarabunNew-Bold.ttf",
-        "/usr/share/fonts/custom/THSarabunNew.ttf",
-        "/usr/share/fonts/custom/THSarabunNew-Bold.ttf",
-        # Fallback to other Thai fonts
-        "/usr/share/fonts/truetype/thai-tlwg/Sarabun.ttf",
-        "/usr/share/fonts/truetype/thai-tlwg/Sarabun-Bold.ttf",
-        "/usr/share/fonts/custom/Sarabun.ttf",
-        "/usr/share/fonts/custom/Sarabun-Bold.ttf",
-        # Windows paths
-        "C:/Windows/Fonts/Garuda.ttf",
-        "C:/Windows/Fonts/Garuda-Bold.ttf",
-        "C:/Windows/Fonts/THSarabunNew.ttf",
-        "C:/Windows/Fonts/THSarabunNew-Bold.ttf",
-        "C:/Windows/Fonts/Sarabun.ttf",
-        "C:/Windows/Fonts/Sarabun-Bold.ttf",
-        # Mac paths
-        "/System/Library/Fonts/Garuda.ttf",
-        "/System/Library/Fonts/THSarabunNew.ttf",
-        "/System/Library/Fonts/Sarabun.ttf"
-    ]
+        candidates.append(registry.find(font_name))
+    # Then the preferred Thai fonts (bundled Sarabun and Noto Sans Thai first)
+    candidates.extend(registry.thai_fonts()[:3])
     
-    for path in possible_paths:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, font_size)
-            except Exception as e:
-                logger.warning(f"Could not load font {path}: {str(e)}")
+    for path in candidates:
+        if not path:
+            continue
+        try:
+            logger.info(f"Loading Thai font: {path}")
+            return load_font(path, font_size)
+        except Exception as e:
+            logger.warning(f"Could not load font {path}: {str(e)}")
     
     # Fallback to default font
     return ImageFont.load_default()
@@ -289,7 +264,7 @@ def find_important_words(text, count):
     logger.info(f"[DEBUG] Finding important words in text: '{text}', max count: {count}")
     
     # Tokenize the text into words
-    words = word_tokenize(text, engine='newmm')
+    words = thai_tokenize(text)
     logger.info(f"[DEBUG] Tokenized into {len(words)} words: {words}")
     
     # Remove common stop words (expanded list)
@@ -446,6 +421,206 @@ def adaptive_split_thai_text(text, max_lines):
     logger.info(f"[DEBUG] Adaptive split: {len(lines)} lines with {chars_per_line} chars per line")
     return lines
 
+def draw_text_border(draw, position, text, font, border_color, border_width):
+    """
+    Draw the border (outline) of a text in a single pass.
+    
+    FreeType strokes the glyph outlines once, instead of rasterizing the whole
+    text again for every pixel offset around it.
+    
+    Args:
+        draw: PIL ImageDraw object
+        position: (x, y) position of the text
+        text: Text to outline
+        font: PIL ImageFont object
+        border_color: Border color
+        border_width: Border width in pixels
+    """
+    draw.text(position, text, font=font, fill=border_color,
+              stroke_width=border_width, stroke_fill=border_color)
+
+def render_title_on_image(img, title_lines, font_size, font_color, border_color, border_width,
+                          padding_bottom, padding_color, font_name=None, text_align='center',
+                          highlight_words=[], highlight_color='#ffff00', padding_multiplier=0.5):
+    """
+    Render a title with padding onto an image.
+    
+    Args:
+        img: PIL Image object
+        title_lines: List of title lines
+        font_size: Font size
+        font_color: Font color
+        border_color: Border color
+        border_width: Border width
+        padding_bottom: Bottom padding in pixels
+        padding_color: Padding color
+        font_name: Optional font name
+        text_align: Text alignment (left, center, right)
+        highlight_words: Words to highlight
+        highlight_color: Color for highlighted words
+        padding_multiplier: Multiplier for padding space (breathing area) above and below text
+        
+    Returns:
+        New PIL Image object with the title, the same size as the input image
+    """
+    # Get image dimensions
+    original_width, original_height = img.size
+    logger.info(f"[DEBUG] Original image dimensions: {original_width}x{original_height}")
+    
+    # Ensure padding is sufficient for text
+    # Calculate minimum required padding based on text content
+    font = find_thai_font(font_size, font_name)
+    logger.info(f"[DEBUG] Selected font: {font}")
+    
+    # Calculate total text height with spacing
+    total_lines = len(title_lines)
+    line_spacing = int(font_size * 0.3)  # Adjust line spacing to 30% of font size
+    
+    # Calculate the total height of all text lines including spacing
+    total_text_height = (total_lines * font_size) + ((total_lines - 1) * line_spacing)
+    
+    # Add extra padding above and below text (using the padding_multiplier parameter)
+    extra_padding = int(font_size * padding_multiplier)
+    
+    # Calculate minimum required padding
+    min_required_padding = total_text_height + (extra_padding * 2)
+    logger.info(f"[DEBUG] Calculated min required padding: {min_required_padding}px (with padding multiplier: {padding_multiplier})")
+    
+    # If requested padding is less than required, increase it
+    if padding_bottom < min_required_padding:
+        padding_bottom = min_required_padding
+        logger.info(f"[DEBUG] Increased padding to {padding_bottom}px to fit text properly")
+    
+    # Calculate the ratio to resize the original image to make room for the title
+    # while maintaining the original dimensions
+    new_image_height = original_height - padding_bottom
+    if new_image_height <= 0:
+        # If padding would take up entire image, reduce padding to half the image height
+        padding_bottom = original_height // 2
+        new_image_height = original_height - padding_bottom
+        logger.warning(f"[DEBUG] Padding was too large, reduced to {padding_bottom}px")
+    
+    # Resize the original image to make room for the title
+    # Keep the original width (no side padding)
+    resized_img = img.resize((original_width, new_image_height), Image.LANCZOS)
+    logger.info(f"[DEBUG] Resized image to: {original_width}x{new_image_height}")
+    
+    # Create a new image with the original dimensions
+    new_img = Image.new('RGB', (original_width, original_height), color=padding_color)
+    logger.info(f"[DEBUG] Created new image with dimensions: {original_width}x{original_height}")
+    
+    # Paste the resized original image at the top
+    new_img.paste(resized_img, (0, 0))
+    
+    # Create a drawing context
+    draw = ImageDraw.Draw(new_img)
+    
+    # Calculate starting Y position to center text vertically in the padding area with extra space
+    padding_start_y = new_image_height
+    y_start = padding_start_y + extra_padding
+    logger.info(f"[DEBUG] Text starting Y position: {y_start}")
+    
+    # Calculate maximum text width to ensure it fits within the image
+    max_text_width = 0
+    for line in title_lines:
+        text_width = draw.textlength(line, font=font)
+        max_text_width = max(max_text_width, text_width)
+    logger.info(f"[DEBUG] Maximum text width: {max_text_width}px")
+    
+    # If text is too wide, reduce font size
+    if max_text_width > (original_width * 0.9):  # Allow 90% of image width
+        scale_factor = (original_width * 0.9) / max_text_width
+        new_font_size = int(font_size * scale_factor)
+        logger.info(f"[DEBUG] Reduced font size from {font_size} to {new_font_size} to fit text width")
+        font = find_thai_font(new_font_size, font_name)
+        # Recalculate line spacing with new font size
+        line_spacing = int(new_font_size * 0.3)
+    
+    # Set margins for text alignment
+    left_margin = 30  # Left margin for left-aligned text
+    right_margin = 30  # Right margin for right-aligned text
+    
+    # Draw each line of text
+    for i, line in enumerate(title_lines):
+        # Calculate exact Y position for this line with improved spacing
+        y_pos = y_start + (i * (font_size + line_spacing))
+        
+        # Calculate text position based on alignment
+        text_width = draw.textlength(line, font=font)
+        if text_align == 'center':
+            x_pos = (original_width - text_width) / 2
+        elif text_align == 'left':
+            x_pos = left_margin
+        elif text_align == 'right':
+            x_pos = original_width - text_width - right_margin
+        else:
+            logger.warning(f"[DEBUG] Unknown text alignment: {text_align}. Defaulting to center.")
+            x_pos = (original_width - text_width) / 2
+        
+        logger.info(f"[DEBUG] Drawing line {i+1}: '{line}' at position ({x_pos}, {y_pos})")
+        
+        # Draw text border if specified
+        if border_width > 0:
+            draw_text_border(draw, (x_pos, y_pos), line, font, border_color, border_width)
+        
+        # If there are words to highlight, we need to draw each word separately
+        if highlight_words and any(word.lower() in line.lower() for word in highlight_words):
+            logger.info(f"[DEBUG] Line {i+1} contains words to highlight")
+            # Split the line into words while preserving Thai word boundaries
+            import re
+            # Check if text is primarily Thai
+            is_thai = bool(re.search(r'[\u0E00-\u0E7F]', line))
+            
+            # This regex pattern will match Thai words and other words with spaces
+            if is_thai:
+                # Use pythainlp for proper Thai word tokenization (memoized)
+                words = thai_tokenize(line)
+            else:
+                # For non-Thai text, use regular expression
+                words = re.findall(r'[\u0E00-\u0E7F]+|[^\s]+', line)
+                
+            logger.info(f"[DEBUG] Split line into words: {words}")
+            
+            current_x = x_pos
+            for word in words:
+                # Check if this word should be highlighted
+                word_to_draw = word
+                word_color = font_color
+                
+                # Check if this word matches any highlight word (case insensitive)
+                for highlight_word in highlight_words:
+                    if highlight_word.lower() in word.lower():
+                        word_color = highlight_color
+                        logger.info(f"[DEBUG] Highlighting word: '{word}' with color: {highlight_color}")
+                        break
+                
+                # Draw the word with appropriate color
+                # For Thai text, don't add space after the word when measuring width
+                if is_thai:
+                    word_width = draw.textlength(word_to_draw, font=font)
+                else:
+                    word_width = draw.textlength(word_to_draw + ' ', font=font)
+                
+                # Draw word border if specified
+                if border_width > 0 and word_color != font_color:
+                    draw_text_border(draw, (current_x, y_pos), word_to_draw, font, border_color, border_width)
+                
+                # Draw the word
+                draw.text((current_x, y_pos), word_to_draw, font=font, fill=word_color)
+                
+                # Add space after the word (only for non-Thai text)
+                current_x += word_width
+                
+                # Add space between words only for non-Thai text
+                if not is_thai and word != words[-1]:  # Don't add space after the last word
+                    # Space width is already included in word_width for non-Thai text
+                    pass
+        else:
+            # Draw the main text normally if no highlighting needed
+            draw.text((x_pos, y_pos), line, font=font, fill=font_color)
+    
+    return new_img
+
 def process_add_title_to_image(image_url, title_lines, font_size, font_color, 
                               border_color, border_width, padding_bottom, padding_color, job_id, font_name=None,
                               text_align='center', highlight_words=[], highlight_color='#ffff00', padding_multiplier=0.5):
@@ -489,170 +664,14 @@ def process_add_title_to_image(image_url, title_lines, font_size, font_color,
         img = download_image(image_url, input_image_path)
         logger.info(f"[DEBUG] Downloaded image to: {input_image_path}")
         
-        # Get image dimensions
+        # Render the title
         original_width, original_height = img.size
-        logger.info(f"[DEBUG] Original image dimensions: {original_width}x{original_height}")
-        
-        # Ensure padding is sufficient for text
-        # Calculate minimum required padding based on text content
-        font = find_thai_font(font_size, font_name)
-        logger.info(f"[DEBUG] Selected font: {font}")
-        
-        # Calculate total text height with spacing
-        total_lines = len(title_lines)
-        line_spacing = int(font_size * 0.3)  # Adjust line spacing to 30% of font size
-        
-        # Calculate the total height of all text lines including spacing
-        total_text_height = (total_lines * font_size) + ((total_lines - 1) * line_spacing)
-        
-        # Add extra padding above and below text (using the padding_multiplier parameter)
-        extra_padding = int(font_size * padding_multiplier)
-        
-        # Calculate minimum required padding
-        min_required_padding = total_text_height + (extra_padding * 2)
-        logger.info(f"[DEBUG] Calculated min required padding: {min_required_padding}px (with padding multiplier: {padding_multiplier})")
-        
-        # If requested padding is less than required, increase it
-        if padding_bottom < min_required_padding:
-            padding_bottom = min_required_padding
-            logger.info(f"[DEBUG] Increased padding to {padding_bottom}px to fit text properly")
-        
-        # Calculate the ratio to resize the original image to make room for the title
-        # while maintaining the original dimensions
-        new_image_height = original_height - padding_bottom
-        if new_image_height <= 0:
-            # If padding would take up entire image, reduce padding to half the image height
-            padding_bottom = original_height // 2
-            new_image_height = original_height - padding_bottom
-            logger.warning(f"[DEBUG] Padding was too large, reduced to {padding_bottom}px")
-        
-        # Resize the original image to make room for the title
-        # Keep the original width (no side padding)
-        resized_img = img.resize((original_width, new_image_height), Image.LANCZOS)
-        logger.info(f"[DEBUG] Resized image to: {original_width}x{new_image_height}")
-        
-        # Create a new image with the original dimensions
-        new_img = Image.new('RGB', (original_width, original_height), color=padding_color)
-        logger.info(f"[DEBUG] Created new image with dimensions: {original_width}x{original_height}")
-        
-        # Paste the resized original image at the top
-        new_img.paste(resized_img, (0, 0))
-        
-        # Create a drawing context
-        draw = ImageDraw.Draw(new_img)
-        
-        # Calculate starting Y position to center text vertically in the padding area with extra space
-        padding_start_y = new_image_height
-        y_start = padding_start_y + extra_padding
-        logger.info(f"[DEBUG] Text starting Y position: {y_start}")
-        
-        # Calculate maximum text width to ensure it fits within the image
-        max_text_width = 0
-        for line in title_lines:
-            text_width = draw.textlength(line, font=font)
-            max_text_width = max(max_text_width, text_width)
-        logger.info(f"[DEBUG] Maximum text width: {max_text_width}px")
-        
-        # If text is too wide, reduce font size
-        if max_text_width > (original_width * 0.9):  # Allow 90% of image width
-            scale_factor = (original_width * 0.9) / max_text_width
-            new_font_size = int(font_size * scale_factor)
-            logger.info(f"[DEBUG] Reduced font size from {font_size} to {new_font_size} to fit text width")
-            font = find_thai_font(new_font_size, font_name)
-            # Recalculate line spacing with new font size
-            line_spacing = int(new_font_size * 0.3)
-        
-        # Set margins for text alignment
-        left_margin = 30  # Left margin for left-aligned text
-        right_margin = 30  # Right margin for right-aligned text
-        
-        # Draw each line of text
-        for i, line in enumerate(title_lines):
-            # Calculate exact Y position for this line with improved spacing
-            y_pos = y_start + (i * (font_size + line_spacing))
-            
-            # Calculate text position based on alignment
-            text_width = draw.textlength(line, font=font)
-            if text_align == 'center':
-                x_pos = (original_width - text_width) / 2
-            elif text_align == 'left':
-                x_pos = left_margin
-            elif text_align == 'right':
-                x_pos = original_width - text_width - right_margin
-            else:
-                logger.warning(f"[DEBUG] Unknown text alignment: {text_align}. Defaulting to center.")
-                x_pos = (original_width - text_width) / 2
-            
-            logger.info(f"[DEBUG] Drawing line {i+1}: '{line}' at position ({x_pos}, {y_pos})")
-            
-            # Draw text border if specified
-            if border_width > 0:
-                for offset_x in range(-border_width, border_width + 1):
-                    for offset_y in range(-border_width, border_width + 1):
-                        if offset_x != 0 or offset_y != 0:
-                            draw.text((x_pos + offset_x, y_pos + offset_y), line, 
-                                     font=font, fill=border_color)
-            
-            # If there are words to highlight, we need to draw each word separately
-            if highlight_words and any(word.lower() in line.lower() for word in highlight_words):
-                logger.info(f"[DEBUG] Line {i+1} contains words to highlight")
-                # Split the line into words while preserving Thai word boundaries
-                import re
-                # Check if text is primarily Thai
-                is_thai = bool(re.search(r'[\u0E00-\u0E7F]', line))
-                
-                # This regex pattern will match Thai words and other words with spaces
-                if is_thai:
-                    # Use pythainlp for proper Thai word tokenization
-                    from pythainlp import word_tokenize
-                    words = word_tokenize(line, engine="newmm")
-                else:
-                    # For non-Thai text, use regular expression
-                    words = re.findall(r'[\u0E00-\u0E7F]+|[^\s]+', line)
-                    
-                logger.info(f"[DEBUG] Split line into words: {words}")
-                
-                current_x = x_pos
-                for word in words:
-                    # Check if this word should be highlighted
-                    word_to_draw = word
-                    word_color = font_color
-                    
-                    # Check if this word matches any highlight word (case insensitive)
-                    for highlight_word in highlight_words:
-                        if highlight_word.lower() in word.lower():
-                            word_color = highlight_color
-                            logger.info(f"[DEBUG] Highlighting word: '{word}' with color: {highlight_color}")
-                            break
-                    
-                    # Draw the word with appropriate color
-                    # For Thai text, don't add space after the word when measuring width
-                    if is_thai:
-                        word_width = draw.textlength(word_to_draw, font=font)
-                    else:
-                        word_width = draw.textlength(word_to_draw + ' ', font=font)
-                    
-                    # Draw word border if specified
-                    if border_width > 0 and word_color != font_color:
-                        for offset_x in range(-border_width, border_width + 1):
-                            for offset_y in range(-border_width, border_width + 1):
-                                if offset_x != 0 or offset_y != 0:
-                                    draw.text((current_x + offset_x, y_pos + offset_y), word_to_draw, 
-                                             font=font, fill=border_color)
-                    
-                    # Draw the word
-                    draw.text((current_x, y_pos), word_to_draw, font=font, fill=word_color)
-                    
-                    # Add space after the word (only for non-Thai text)
-                    current_x += word_width
-                    
-                    # Add space between words only for non-Thai text
-                    if not is_thai and word != words[-1]:  # Don't add space after the last word
-                        # Space width is already included in word_width for non-Thai text
-                        pass
-            else:
-                # Draw the main text normally if no highlighting needed
-                draw.text((x_pos, y_pos), line, font=font, fill=font_color)
+        new_img = render_title_on_image(
+            img, title_lines, font_size, font_color, border_color, border_width,
+            padding_bottom, padding_color, font_name=font_name, text_align=text_align,
+            highlight_words=highlight_words, highlight_color=highlight_color,
+            padding_multiplier=padding_multiplier
+        )
         
         # Save the output image
         output_image_path = os.path.join(temp_dir, f"output_title_{job_id}.jpg")
@@ -0,0 +1,268 @@
+import os
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+import requests
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from flask import Blueprint, request, jsonify
+from PIL import Image
+from routes.v1.image.add_title_to_image import prepare_title_lines, render_title_on_image
+from storage_utils import upload_file
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+add_title_to_image_batch_bp = Blueprint('add_title_to_image_batch', __name__)
+
+# Maximum number of items accepted in one batch request
+BATCH_MAX_ITEMS = int(os.environ.get('TITLE_BATCH_MAX_ITEMS', 1000))
+
+# Concurrent image downloads and uploads
+BATCH_DOWNLOAD_WORKERS = int(os.environ.get('TITLE_BATCH_DOWNLOAD_WORKERS', 8))
+BATCH_UPLOAD_WORKERS = int(os.environ.get('TITLE_BATCH_UPLOAD_WORKERS', 8))
+
+# Text rendering holds the GIL for most of its time, so images are rendered in separate processes.
+# One pool of this size is shared by all batch requests.
+BATCH_RENDER_PROCESSES = int(os.environ.get('TITLE_BATCH_RENDER_PROCESSES', os.cpu_count() or 1))
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Style parameters accepted per item, with the same defaults as /add_title_to_image
+DEFAULT_STYLE = {
+    "font_size": 64,
+    "font_color": "white",
+    "border_color": "#000000",
+    "border_width": 2,
+    "padding_bottom": 180,
+    "padding_color": "#fa901e",
+    "font_name": None,
+    "text_align": "center",
+    "max_lines": 3,
+    "highlight_words": [],
+    "highlight_color": "#ffff00",
+    "auto_highlight": False,
+    "highlight_count": 2,
+    "padding_multiplier": 0.5
+}
+
+def download_image_bytes(url):
+    """Download an image and return its raw bytes."""
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    return response.content
+
+def get_render_pool():
+    """
+    Get the render process pool shared by all batch requests.
+
+    Workers are spawned rather than forked, since forking the threaded server
+    can deadlock the child on a lock held by another thread. Concurrent batches
+    queue for the same fixed number of processes.
+
+    Returns:
+        ProcessPoolExecutor instance
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=BATCH_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _render_pool
+
+def discard_render_pool(pool):
+    """Drop a broken render pool so that the next batch starts a new one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def render_title_item(image_bytes, title, style, output_path):
+    """
+    Render one titled image in a worker process.
+
+    Args:
+        image_bytes: Raw bytes of the source image
+        title: Title text
+        style: Style parameters (see DEFAULT_STYLE)
+        output_path: Path for the rendered JPEG
+
+    Returns:
+        Dictionary with the output path, dimensions and title lines
+    """
+    img = Image.open(BytesIO(image_bytes))
+    title_lines, highlight_words = prepare_title_lines(
+        title, style["max_lines"], list(style["highlight_words"]),
+        style["auto_highlight"], style["highlight_count"]
+    )
+    new_img = render_title_on_image(
+        img, title_lines, style["font_size"], style["font_color"], style["border_color"],
+        style["border_width"], style["padding_bottom"], style["padding_color"],
+        font_name=style["font_name"], text_align=style["text_align"],
+        highlight_words=highlight_words, highlight_color=style["highlight_color"],
+        padding_multiplier=style["padding_multiplier"]
+    )
+    new_img.convert("RGB").save(output_path, quality=95)
+    width, height = img.size
+    return {"path": output_path, "width": width, "height": height, "title_lines": title_lines}
+
+def process_title_batch(items, default_style, job_id):
+    """
+    Title a batch of images.
+
+    Downloads run in a bounded thread pool, each finished download is rendered
+    in a process pool, and finished renders are uploaded concurrently. A failing
+    item does not fail the batch; its error is reported in the manifest.
+
+    Args:
+        items: List of {"image_url", "title", "style"} dictionaries
+        default_style: Style applied to every item, overridden by the item style
+        job_id: Job ID
+
+    Returns:
+        List of per-item result dictionaries, in request order
+    """
+    temp_dir = tempfile.mkdtemp(prefix="title_batch_")
+    results = [{"index": index, "image_url": item.get("image_url")} for index, item in enumerate(items)]
+
+    def fail(index, stage, error):
+        logger.warning(f"Job {job_id}: Item {index} failed during {stage}: {error}")
+        results[index]["error"] = f"{stage} failed: {error}"
+
+    render_pool = get_render_pool()
+
+    try:
+        with ThreadPoolExecutor(max_workers=BATCH_DOWNLOAD_WORKERS) as download_pool, \
+             ThreadPoolExecutor(max_workers=BATCH_UPLOAD_WORKERS) as upload_pool:
+
+            # Step 1: Download all images, handing each one to the render pool as soon as it arrives
+            download_futures = {
+                download_pool.submit(download_image_bytes, item["image_url"]): index
+                for index, item in enumerate(items)
+            }
+            render_futures = {}
+            for future in as_completed(download_futures):
+                index = download_futures[future]
+                try:
+                    image_bytes = future.result()
+                except Exception as e:
+                    fail(index, "download", e)
+                    continue
+                item = items[index]
+                style = {**DEFAULT_STYLE, **default_style, **(item.get("style") or {})}
+                output_path = os.path.join(temp_dir, f"output_title_{job_id}_{index}.jpg")
+                try:
+                    render_futures[render_pool.submit(render_title_item, image_bytes, item["title"], style, output_path)] = index
+                except BrokenProcessPool as e:
+                    discard_render_pool(render_pool)
+                    fail(index, "render", e)
+
+            # Step 2: Upload each rendered image as soon as it is ready
+            upload_futures = {}
+            for future in as_completed(render_futures):
+                index = render_futures[future]
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        discard_render_pool(render_pool)
+                    fail(index, "render", e)
+                    continue
+                results[index]["dimensions"] = {
+                    "original": {"width": rendered["width"], "height": rendered["height"]},
+                    "output": {"width": rendered["width"], "height": rendered["height"]}
+                }
+                results[index]["title_lines"] = rendered["title_lines"]
+                upload_futures[upload_pool.submit(
+                    upload_file,
+                    rendered["path"],
+                    object_name=f"{job_id}_{index}_titled_image.jpg",
+                    content_type="image/jpeg",
+                    folder="titled-images",
+                    make_public=True
+                )] = index
+
+            for future in as_completed(upload_futures):
+                index = upload_futures[future]
+                try:
+                    success, public_url, storage_used = future.result()
+                except Exception as e:
+                    fail(index, "upload", e)
+                    continue
+                if not success:
+                    fail(index, "upload", "storage returned no URL")
+                    continue
+                results[index]["url"] = public_url
+                results[index]["storage_provider"] = storage_used
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+@add_title_to_image_batch_bp.route('/add_title_to_image/batch', methods=['POST'])
+def add_title_to_image_batch():
+    """
+    Add titles to a batch of images in one request.
+
+    Request body:
+    {
+        "items": [
+            {
+                "image_url": "URL of the image",
+                "title": "Title text",
+                "style": {"font_size": 56, "padding_color": "#000000"}  # Optional: per-item style
+            }
+        ],
+        "style": {"font_name": "Sarabun-Regular.ttf"}  # Optional: style shared by all items
+    }
+
+    Style keys are the optional parameters of /add_title_to_image.
+
+    Returns:
+        JSON manifest with one result per item; failed items carry an "error" instead of a "url"
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('items')
+        default_style = data.get('style') or {}
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Missing required parameter: items"}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Too many items: {len(items)} (maximum {BATCH_MAX_ITEMS})"}), 400
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or 'image_url' not in item or 'title' not in item:
+                return jsonify({"error": f"Item {index} must have image_url and title"}), 400
+            unknown = set(item.get('style') or {}) - set(DEFAULT_STYLE)
+            if unknown:
+                return jsonify({"error": f"Item {index} has unknown style keys: {sorted(unknown)}"}), 400
+        unknown = set(default_style) - set(DEFAULT_STYLE)
+        if unknown:
+            return jsonify({"error": f"Unknown style keys: {sorted(unknown)}"}), 400
+
+        job_id = str(uuid.uuid4())
+        logger.info(f"Job {job_id}: Titling batch of {len(items)} images")
+
+        results = process_title_batch(items, default_style, job_id)
+        failed = sum(1 for result in results if "error" in result)
+        logger.info(f"Job {job_id}: Batch finished, {len(results) - failed} succeeded, {failed} failed")
+
+        return jsonify({
+            "job_id": job_id,
+            "total": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": results
+        })
+
+    except Exception as e:
+        logger.error(f"Error in add_title_to_image_batch: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
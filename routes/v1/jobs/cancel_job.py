@@ -0,0 +1,32 @@
+import logging
+from flask import Blueprint, jsonify
+from services.authentication import authenticate
+from services.cancellation import get_cancellation_registry
+from services.job_progress import get_job_progress
+
+v1_jobs_cancel_bp = Blueprint('v1_jobs_cancel', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_jobs_cancel_bp.route('/v1/jobs/<job_id>', methods=['DELETE'])
+@authenticate
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job.
+
+    Cancellation is cooperative: queued jobs are dropped, running ffmpeg
+    processes are stopped, Replicate predictions are cancelled at the
+    provider and downloads and uploads are aborted. The job then finishes
+    with status "cancelled" and code 499 on its progress stream and webhook,
+    and its workspace is removed. The request may reach any server worker;
+    the worker running the job picks it up from the shared job store.
+    """
+    cancelled = get_cancellation_registry().cancel(job_id)
+    if cancelled is None:
+        channel = get_job_progress().find(job_id)
+        if channel is not None and channel.closed:
+            return jsonify({"job_id": job_id, "message": "Job already finished"}), 409
+        return jsonify({"job_id": job_id, "message": "Job not found"}), 404
+
+    logger.info(f"Job {job_id}: Cancellation requested")
+    message = "Cancellation requested" if cancelled else "Job is already being cancelled"
+    return jsonify({"job_id": job_id, "status": "cancelling", "message": message}), 202
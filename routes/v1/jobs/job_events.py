@@ -0,0 +1,37 @@
+import logging
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from services.authentication import authenticate
+from services.job_progress import get_job_progress
+
+v1_jobs_events_bp = Blueprint('v1_jobs_events', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_jobs_events_bp.route('/v1/jobs/<job_id>/events', methods=['GET'])
+@authenticate
+def job_events(job_id):
+    """
+    Stream the progress of a job as Server-Sent Events.
+
+    Events are "status" (queued, started), "progress" (download and upload
+    percent, ffmpeg out_time/total, transcription chunk i/N, pipeline stage
+    start and end) and a final "done", after which the stream ends. Clients
+    resume after a reconnect with the Last-Event-ID header or the
+    last_event_id query parameter. Any server worker can serve the stream.
+    Unknown jobs, including jobs whose events have expired, get a 404.
+    """
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id', 0))
+    except ValueError:
+        return jsonify({"message": "Last-Event-ID must be an integer"}), 400
+
+    progress = get_job_progress()
+    if progress.find(job_id) is None:
+        return jsonify({"job_id": job_id, "message": "Job not found"}), 404
+
+    logger.info(f"Job {job_id}: Progress stream opened from event {last_event_id}")
+    stream = progress.stream(job_id, last_event_id)
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -23,6 +23,7 @@ logger = logging.getLogger(__name__)
         "response_type": {"type": "string", "enum": ["direct", "cloud"]},
         "language": {"type": "string"},
         "webhook_url": {"type": "string", "format": "uri"},
+        "progress_webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
     "required": ["media_url"],
@@ -64,7 +65,7 @@ def transcribe(job_id, data):
                 import uuid
                 filename = os.path.basename(result[0])
                 destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["text_url"] = upload_file(result[0])
+                cloud_urls["text_url"] = upload_file(result[0], job_id=job_id)
                 logger.info(f"Job {job_id}: Text file uploaded to cloud: {cloud_urls['text_url']}")
                 # Keep the local file path for direct response type
                 cloud_urls["text"] = result[0] if response_type == "direct" else None
@@ -78,7 +79,7 @@ def transcribe(job_id, data):
                 # Generate a destination path with a unique name
                 filename = os.path.basename(result[1])
                 destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["srt_url"] = upload_file(result[1])
+                cloud_urls["srt_url"] = upload_file(result[1], job_id=job_id)
                 logger.info(f"Job {job_id}: SRT file uploaded to cloud: {cloud_urls['srt_url']}")
                 # Keep the local file path for direct response type
                 cloud_urls["srt"] = result[1] if response_type == "direct" else None
@@ -92,7 +93,7 @@ def transcribe(job_id, data):
                 # Generate a destination path with a unique name
                 filename = os.path.basename(result[2])
                 destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["segments_url"] = upload_file(result[2])
+                cloud_urls["segments_url"] = upload_file(result[2], job_id=job_id)
                 logger.info(f"Job {job_id}: Segments file uploaded to cloud: {cloud_urls['segments_url']}")
                 # Keep the local file path for direct response type
                 cloud_urls["segments"] = result[2] if response_type == "direct" else None
@@ -17,6 +17,7 @@ logger = logging.getLogger(__name__)
     "properties": {
         "media_url": {"type": "string", "format": "uri"},
         "webhook_url": {"type": "string", "format": "uri"},
+        "progress_webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"},
         "bitrate": {"type": "string", "pattern": "^[0-9]+k$"}
     },
@@ -36,7 +37,7 @@ def convert_media_to_mp3(job_id, data):
         output_file = process_media_to_mp3(media_url, job_id, bitrate)
         logger.info(f"Job {job_id}: Media conversion process completed successfully")
 
-        cloud_url = upload_file(output_file)
+        cloud_url = upload_file(output_file, job_id=job_id)
         logger.info(f"Job {job_id}: Converted media uploaded to cloud storage: {cloud_url}")
 
         return cloud_url, "/v1/media/transform/mp3", 200
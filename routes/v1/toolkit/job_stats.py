@@ -0,0 +1,41 @@
+import logging
+from flask import Blueprint, request, jsonify
+from services.authentication import authenticate
+from services.job_history import get_job_history
+
+v1_toolkit_job_stats_bp = Blueprint('v1_toolkit_job_stats', __name__)
+logger = logging.getLogger(__name__)
+
+MAX_WINDOW = 90 * 24 * 3600
+
+@v1_toolkit_job_stats_bp.route('/v1/toolkit/job-stats', methods=['GET'])
+@authenticate
+def job_stats():
+    """
+    Latency percentiles (p50/p95/p99) and throughput per endpoint from the job history.
+
+    Query parameters:
+        window: Look-back window in seconds (default 3600)
+        bucket: Optional bucket width in seconds for a time series per endpoint
+        endpoint: Optional endpoint filter, e.g. /v1/media/transcribe
+        jobs: Optional number of most recent jobs to include
+    """
+    try:
+        window = int(request.args.get('window', 3600))
+        bucket = request.args.get('bucket', type=int)
+        limit = request.args.get('jobs', type=int)
+    except ValueError:
+        return jsonify({"message": "window, bucket and jobs must be integers"}), 400
+    if window <= 0 or window > MAX_WINDOW:
+        return jsonify({"message": f"window must be between 1 and {MAX_WINDOW} seconds"}), 400
+    if bucket is not None and (bucket <= 0 or window // bucket > 1000):
+        return jsonify({"message": "bucket must be positive and split the window into at most 1000 buckets"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"message": "jobs must be positive"}), 400
+    endpoint = request.args.get('endpoint')
+
+    history = get_job_history()
+    stats = history.stats(window=window, endpoint=endpoint, bucket=bucket)
+    if limit:
+        stats["jobs"] = history.jobs(since=stats["since"], endpoint=endpoint, limit=limit)
+    return jsonify(stats), 200
@@ -8,11 +8,14 @@ import subprocess
 import re
 import glob
 from werkzeug.utils import secure_filename
-from pythainlp.tokenize import word_tokenize
+from services.v1.subtitles.thai_tokenizer import tokenize as thai_tokenize
+from services.v1.subtitles.thai_line_breaker import PIL_AVAILABLE, wrap_text_to_width
 
 from services.gcp_toolkit import upload_to_gcs_with_path
 from services.file_management import download_file
 from services.v1.ffmpeg.ffmpeg_compose import find_thai_font
+from services.v1.video.render_graph import RenderGraph
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
 
 # Set up logging with more detailed format
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -39,6 +42,7 @@ def add_title_to_video():
         "padding_color": "white",
         "text_align": "center",              # Optional: text alignment (left, center, right)
         "max_lines": 3,                      # Optional: maximum number of lines to display
+        "max_width": 1000,                   # Optional: maximum line width in pixels (wraps by measured text width)
         "padding_multiplier": 0.5,           # Optional: padding multiplier for breathing area (0.5 = 50% of font size)
         "id": "Optional job ID",
         "metadata": {
@@ -71,6 +75,7 @@ def add_title_to_video():
         padding_color = data.get('padding_color', 'white')
         text_align = data.get('text_align', 'center')  # Default to center alignment
         max_lines = data.get('max_lines', 3)  # Default to 3 lines maximum
+        max_width = data.get('max_width')  # Optional pixel width for measured wrapping
         padding_multiplier = data.get('padding_multiplier', 0.5)  # Default to 50% of font size
         job_id = data.get('id', f"title_{uuid.uuid4()}")
         metadata_request = data.get('metadata', {})
@@ -97,7 +102,15 @@ def add_title_to_video():
         logger.info(f"[DEBUG] Cleaned title: {title}")
             
         # Process the title with adaptive Thai text handling
-        title_lines = adaptive_split_thai_text(title, max_lines)
+        title_lines = None
+        if max_width:
+            # Wrap by measured width with the font that will render the title
+            title_lines = smart_split_thai_text(title, font_path=find_thai_font(), font_size=font_size, max_width_px=max_width)
+            if len(title_lines) > max_lines:
+                logger.info(f"[DEBUG] Title needs {len(title_lines)} lines at {max_width}px, using adaptive split")
+                title_lines = None
+        if not title_lines:
+            title_lines = adaptive_split_thai_text(title, max_lines)
         logger.info(f"[DEBUG] Split title into {len(title_lines)} lines: {title_lines}")
         
         # Process the video
@@ -160,17 +173,26 @@ def clean_title_text(text):
     
     return cleaned_text
 
-def smart_split_thai_text(text, max_chars_per_line=30):
+def smart_split_thai_text(text, max_chars_per_line=30, font_path=None, font_size=None, max_width_px=None):
     """
     Intelligently split Thai text into lines using pythainlp for proper word tokenization.
     
+    If a font file, font size and pixel width are given, lines are broken by
+    measured glyph widths so each one fits the frame exactly.
+    
     Args:
         text: The text to split
         max_chars_per_line: Maximum characters per line
+        font_path: Font file used to render the text (optional)
+        font_size: Font size in pixels (optional)
+        max_width_px: Maximum line width in pixels (optional)
         
     Returns:
         List of lines
     """
+    if font_path and font_size and max_width_px and PIL_AVAILABLE:
+        return wrap_text_to_width(text, font_path, font_size, max_width_px)
+    
     # If text already has newlines, respect them
     if '\n' in text:
         return text.split('\n')
@@ -199,8 +221,8 @@ def smart_split_thai_text(text, max_chars_per_line=30):
     is_thai = bool(re.search(r'[\u0E00-\u0E7F]', text))
     
     if is_thai:
-        # Use pythainlp to tokenize Thai text into words
-        words = word_tokenize(text, engine="newmm")
+        # Use pythainlp to tokenize Thai text into words (memoized, adaptive splitting calls this repeatedly)
+        words = thai_tokenize(text)
         
         # Special handling to preserve punctuation with the preceding word
         processed_words = []
@@ -419,8 +441,13 @@ def process_add_title(video_url, title_lines, font_name, font_size, font_color,
             logger.info(f"[DEBUG] Using Thai font: {thai_font_path}")
             font_path = thai_font_path
         
-        # Create drawtext filters for each line with improved spacing
-        drawtext_filters = []
+        # Build the render graph - Scale video first, then add padding
+        # This keeps the final dimensions at the original size
+        graph = RenderGraph(input_video, job_id=job_id)
+        graph.scale(target_width, video_height)
+        graph.pad(top=padding_top, color=padding_color, width=target_width, height=target_height)
+        
+        # Add drawtext nodes for each line with improved spacing
         
         # Set margins for text alignment
         left_margin = 30  # Left margin for left-aligned text
@@ -446,9 +473,9 @@ def process_add_title(video_url, title_lines, font_name, font_size, font_color,
             
             # Add a shadow for better visibility for Thai text
             if is_thai:
-                shadow_option = ":shadowcolor=black:shadowx=1:shadowy=1"
+                shadow_color = "black"
             else:
-                shadow_option = ""
+                shadow_color = None
             
             # Set x position based on text alignment
             if text_align == 'center':
@@ -463,43 +490,27 @@ def process_add_title(video_url, title_lines, font_name, font_size, font_color,
                 
             logger.info(f"[DEBUG] Line {i+1} alignment: {text_align}, x position: {x_position}")
             
-            filter_text = (
-                f"drawtext=text='{escaped_line}':"
-                f"fontfile={current_font_path}:"
-                f"fontsize={font_size}:"
-                f"fontcolor={font_color}:"
-                f"bordercolor={border_color}:"
-                f"borderw={border_width}{shadow_option}:"
+            graph.drawtext(
+                escaped_line,
+                current_font_path,
+                font_size,
+                font_color=font_color,
+                border_color=border_color,
+                border_width=border_width,
                 # Position text based on alignment
-                f"x={x_position}:"
+                x=x_position,
                 # Position text precisely
-                f"y={int(y_pos)}"
+                y=int(y_pos),
+                shadow_color=shadow_color
             )
-            drawtext_filters.append(filter_text)
             logger.info(f"[DEBUG] Created filter for line {i+1}: '{escaped_line}' at y={int(y_pos)}")
         
-        # Create the full filter string - Scale video first, then add padding
-        # This keeps the final dimensions at the original size
-        filter_string = f"scale={target_width}:{video_height},pad={target_width}:{target_height}:0:{padding_top}:color={padding_color}"
-        for filter_text in drawtext_filters:
-            filter_string += f",{filter_text}"
-        
         # Output video path
         output_video = os.path.join(temp_dir, f"output_{job_id}.mp4")
         
-        # Run FFmpeg command
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-i", input_video,
-            "-vf", filter_string,
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-y",
-            output_video
-        ]
-        
-        logger.info(f"[DEBUG] Running FFmpeg command with filter: {filter_string}")
-        subprocess.run(ffmpeg_cmd, check=True)
+        # Render scale, padding and title text in a single encode
+        logger.info(f"[DEBUG] Running FFmpeg command with filter: {graph.build_filtergraph()}")
+        graph.render(output_video)
         logger.info(f"[DEBUG] FFmpeg command completed successfully")
         
         # Upload to GCS
@@ -529,7 +540,7 @@ def process_add_title(video_url, title_lines, font_name, font_size, font_color,
                     "-y",
                     thumbnail_path
                 ]
-                subprocess.run(thumbnail_cmd, check=True)
+                run_ffmpeg(thumbnail_cmd, operation="thumbnail", job_id=job_id)
                 
                 # Upload thumbnail
                 thumbnail_dest = f"thumbnails/{os.path.basename(thumbnail_path)}"
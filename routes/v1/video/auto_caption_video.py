@@ -17,7 +17,7 @@ except ImportError:
     logging.error("NumPy is not available. This will affect transcription functionality.")
 
 from services.v1.media.media_transcribe import process_transcribe_media
-from services.v1.video.caption_video import add_subtitles_to_video
+from services.v1.video.caption_video import add_subtitles_to_video, mux_subtitles_into_video
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -44,6 +44,7 @@ def auto_caption_video():
         "style": "classic",  # Optional: "classic" or "modern"
         "margin": 50,  # Optional: vertical margin in pixels
         "max_width": 80,  # Optional: maximum width as percentage of video width
+        "delivery": "hard",  # Optional: "hard" (burn in) or "soft" (subtitle stream, no re-encode)
         "output_path": "optional/custom/output/path.mp4"  # Optional
     }
     
@@ -87,6 +88,7 @@ def auto_caption_video():
         margin = data.get('margin', 50)
         max_width = data.get('max_width', 80)
         output_path = data.get('output_path', None)
+        delivery = data.get('delivery', 'hard')
         
         # Generate a job ID
         import uuid
@@ -177,18 +179,28 @@ def auto_caption_video():
                 "message": f"Error reading SRT file: {str(e)}"
             }), 500
         
-        caption_result = add_subtitles_to_video(
-            video_path=video_url,
-            subtitle_path=srt_path,
-            output_path=output_path,
-            font_name=font,
-            font_size=24,
-            margin_v=margin,
-            subtitle_style=style,
-            max_width=max_width,
-            position=position,
-            job_id=job_id
-        )
+        if delivery == "soft":
+            # Mux the SRT as a subtitle stream instead of re-encoding the video
+            caption_result = mux_subtitles_into_video(
+                video_path=video_url,
+                subtitle_path=srt_path,
+                output_path=output_path,
+                language=None if multi_language else language,
+                job_id=job_id
+            )
+        else:
+            caption_result = add_subtitles_to_video(
+                video_path=video_url,
+                subtitle_path=srt_path,
+                output_path=output_path,
+                font_name=font,
+                font_size=24,
+                margin_v=margin,
+                subtitle_style=style,
+                max_width=max_width,
+                position=position,
+                job_id=job_id
+            )
         
         if not caption_result:
             logger.error("Failed to add subtitles to video, caption_result is None")
@@ -68,9 +68,14 @@ logger = logging.getLogger(__name__)
             }
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "progress_webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"},
         "language": {"type": "string"},
-        "auto_transcribe": {"type": "boolean"}
+        "auto_transcribe": {"type": "boolean"},
+        "delivery": {
+            "type": "string",
+            "enum": ["hard", "soft"]
+        }
     },
     "required": ["video_url"],
     "additionalProperties": False
@@ -85,6 +90,7 @@ def caption_video_v1(job_id, data):
     id = data.get('id')
     language = data.get('language', 'auto')
     auto_transcribe = data.get('auto_transcribe', False)
+    delivery = data.get('delivery', 'hard')
     
     logger.info(f"Job {job_id}: Received v1 captioning request for {video_url}")
     logger.info(f"Job {job_id}: Settings received: {settings}")
@@ -109,7 +115,7 @@ def caption_video_v1(job_id, data):
             captions = None
         
         # Process video with the enhanced v1 service
-        output = process_captioning_v1(video_url, captions, settings, replace, job_id, language)
+        output = process_captioning_v1(video_url, captions, settings, job_id=job_id, delivery=delivery, language=language)
         
         if isinstance(output, dict):
             if 'error' in output:
@@ -132,7 +138,7 @@ def caption_video_v1(job_id, data):
             logger.info(f"Job {job_id}: Captioning process completed successfully")
 
             # Upload the captioned video
-            cloud_url = upload_file(output_path)
+            cloud_url = upload_file(output_path, job_id=job_id)
             logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {cloud_url}")
 
             # Clean up the output file after upload
@@ -25,6 +25,7 @@ logger = logging.getLogger(__name__)
             "minItems": 1
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "progress_webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
     "required": ["video_urls"],
@@ -42,7 +43,7 @@ def combine_videos(job_id, data):
         output_file = process_video_concatenate(media_urls, job_id)
         logger.info(f"Job {job_id}: Video combination process completed successfully")
 
-        cloud_url = upload_file(output_file)
+        cloud_url = upload_file(output_file, job_id=job_id)
         logger.info(f"Job {job_id}: Combined video uploaded to cloud storage: {cloud_url}")
 
         return cloud_url, "/v1/video/concatenate", 200
@@ -1,18 +1,21 @@
 import os
 import time
-import tempfile
 import uuid
+import shutil
 import traceback
 import logging
 import json
 from typing import Dict, List, Any, Optional, Union
 from flask import Blueprint, request, jsonify
 
-from services.file_management import download_file
+from services.file_management import download_file, job_workspace, remove_job_workspace
 from services.v1.transcription.replicate_whisper import transcribe_with_replicate
 from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
 from services.v1.video.caption_video import add_subtitles_to_video
 from services.cloud_storage import upload_to_cloud_storage
+from services.v1.video.artifact_store import get_artifact_store, new_artifact_id, read_json, write_json
+from services.job_progress import get_job_progress
+from services.cancellation import CANCELLED_STATUS_CODE, JobCancelled, claim_job_id, register_job, release_job
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -39,18 +42,33 @@ def replicate_auto_caption():
             "font_name": "Arial",
             "max_width": 40,
             "batch_size": 64
-        }
+        },
+        "artifact_id": "Optional artifact ID of a previous run to restyle without transcribing again",
+        "job_id": "Optional job ID of 8 to 128 letters, digits, '-' or '_', not used by another job; it can be cancelled with DELETE /v1/jobs/<job_id>"
     }
     """
     try:
         # Get request data
         data = request.get_json()
         
+        # A restyle request references a previous run and may omit its inputs
+        artifact_id = data.get('artifact_id')
+        previous_inputs = {}
+        if artifact_id:
+            try:
+                previous = get_artifact_store().load_manifest(artifact_id)
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            if previous is None:
+                return jsonify({"status": "error", "message": f"Unknown or expired artifact_id: {artifact_id}"}), 404
+            previous_inputs = previous["inputs"]
+        
         # Extract required parameters
-        video_url = data.get('video_url')
-        script_text = data.get('script_text')
-        language = data.get('language', 'en')
-        settings = data.get('settings', {})
+        video_url = data.get('video_url', previous_inputs.get('video_url'))
+        script_text = data.get('script_text', previous_inputs.get('script_text'))
+        language = data.get('language', previous_inputs.get('language', 'en'))
+        # Settings not given in a restyle request keep the values of the previous run
+        settings = {**(previous_inputs.get('settings') or {}), **data.get('settings', {})}
         
         # Validate required parameters
         if not video_url:
@@ -58,8 +76,15 @@ def replicate_auto_caption():
         if not script_text:
             return jsonify({"status": "error", "message": "script_text is required"}), 400
             
-        # Generate job ID
-        job_id = f"replicate_auto_caption_{int(time.time())}"
+        # Use the caller's job ID if given so it can be followed and cancelled
+        if data.get("job_id"):
+            try:
+                claim_job_id(data["job_id"])
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            job_id = data["job_id"]
+        else:
+            job_id = str(uuid.uuid4())
         
         # Process the request directly (no queue)
         try:
@@ -68,9 +93,12 @@ def replicate_auto_caption():
                 script_text=script_text,
                 language=language,
                 settings=settings,
-                job_id=job_id
+                job_id=job_id,
+                artifact_id=artifact_id
             )
             return jsonify(result)
+        except JobCancelled as e:
+            return jsonify({"status": "cancelled", "job_id": job_id, "message": str(e)}), CANCELLED_STATUS_CODE
         except Exception as e:
             logger.error(f"Error in replicate-auto-caption task: {str(e)}")
             logger.error(traceback.format_exc())
@@ -81,7 +109,7 @@ def replicate_auto_caption():
         logger.error(traceback.format_exc())
         return jsonify({"status": "error", "message": str(e)}), 500
 
-def process_replicate_auto_caption(video_url, script_text, language="en", settings=None, job_id=None):
+def process_replicate_auto_caption(video_url, script_text, language="en", settings=None, job_id=None, artifact_id=None):
     """
     Process a video with Replicate Whisper auto-captioning.
     
@@ -91,9 +119,13 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
         language: Language code (default: "en")
         settings: Additional settings for the captioning process
         job_id: Job ID for tracking
+        artifact_id: Artifact ID of a previous run; stages whose inputs did not change are reused
         
     Returns:
         Dictionary with results
+
+    Raises:
+        JobCancelled: The job was cancelled with DELETE /v1/jobs/<job_id>
     """
     # Initialize settings
     settings_obj = settings if settings else {}
@@ -108,20 +140,35 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
     # Track processing time
     process_start_time = time.time()
     
-    # Create a temporary directory for processing
-    temp_dir = os.path.join(tempfile.gettempdir(), f"replicate_auto_caption_{job_id}")
-    os.makedirs(temp_dir, exist_ok=True)
+    # Work in the job's workspace, removed when the job ends
+    temp_dir = job_workspace(job_id)
     logger.info(f"Job {job_id}: Created temporary directory: {temp_dir}")
     
+    progress = get_job_progress()
+    progress.status(job_id, "started")
+    
+    # DELETE /v1/jobs/<job_id> sets this token; ffmpeg, downloads, uploads and the Replicate prediction follow it
+    cancellation = register_job(job_id)
+    
     try:
-        # Step 1: Download the video
-        logger.info(f"Job {job_id}: Downloading video from {video_url}")
-        downloaded_video_path = os.path.join(temp_dir, f"video_{job_id}.mp4")
-        download_file(video_url, downloaded_video_path)
-        logger.info(f"Job {job_id}: Video downloaded to {downloaded_video_path}")
+        store = get_artifact_store()
+        previous = store.load_manifest(artifact_id) if artifact_id else None
+        stages = {}
         
-        # Step 2: Transcribe the video using Replicate Whisper
-        logger.info(f"Job {job_id}: Transcribing video with Replicate Whisper")
+        # Step 1: Get the video. A restyle of a previous run reuses its stored download.
+        video_dir = None
+        if previous and previous["inputs"].get("video_url") == video_url and previous["stages"].get("video"):
+            video_dir = store.lookup("video", previous["stages"]["video"])
+        if video_dir:
+            stages["video"] = previous["stages"]["video"]
+            downloaded_video_path = os.path.join(video_dir, "video.mp4")
+            logger.info(f"Job {job_id}: Reusing video of artifact {artifact_id}")
+        else:
+            logger.info(f"Job {job_id}: Downloading video from {video_url}")
+            download_path = os.path.join(temp_dir, f"video_{job_id}.mp4")
+            download_file(video_url, download_path, job_id=job_id)
+            stages["video"], downloaded_video_path = store.import_file("video", download_path, "video.mp4", job_id=job_id)
+            logger.info(f"Job {job_id}: Video downloaded to {downloaded_video_path}")
         
         # Extract audio URL if provided
         audio_url = settings_obj.get("audio_url")
@@ -140,55 +187,94 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
                 error_msg = "Replicate requires a publicly accessible URL for audio. Please provide a public URL."
                 logger.error(error_msg)
                 raise ValueError(error_msg)
-            
-        # Use Replicate for transcription
-        logger.info(f"Using Replicate Whisper for transcription with URL: {audio_url}")
-        segments = transcribe_with_replicate(
-            audio_url=audio_url,
-            language=language,
-            batch_size=settings_obj.get("batch_size", 64)
-        )
-        logger.info(f"Transcription completed with Replicate Whisper, got {len(segments)} segments")
-        
-        # Step 3: Adjust segment start times if needed
-        if start_time > 0:
-            logger.info(f"Adjusting segment start times by {start_time} seconds")
-            for segment in segments:
-                segment["start"] = segment["start"] + start_time
-                segment["end"] = segment["end"] + start_time
         
-        # Ensure segments have minimum duration
-        min_duration = 1.0  # Minimum duration in seconds
-        for segment in segments:
-            if segment["end"] - segment["start"] < min_duration:
-                segment["end"] = segment["start"] + min_duration
-        
-        # Step 4: Enhance subtitles with script alignment
-        logger.info(f"Job {job_id}: Aligning script with transcription segments")
+        # Step 2: Transcribe the video using Replicate Whisper, unless it was already transcribed
+        stages["segments"] = store.stage_key("segments", [downloaded_video_path], {
+            "audio_url": audio_url,
+            "language": language,
+            "transcription_tool": "replicate_whisper",
+            "batch_size": settings_obj.get("batch_size", 64),
+            "start_time": start_time
+        })
         
-        try:
-            # Get subtitle settings
-            subtitle_settings = {
-                "font_name": settings_obj.get("font_name", "Arial"),
-                "font_size": settings_obj.get("font_size", 24),
-                "max_width": settings_obj.get("max_width", 40)
-            }
-            
-            # Generate enhanced subtitles
-            srt_path, ass_path = enhance_subtitles_from_segments(
-                segments=segments,
-                script_text=script_text,
+        def transcribe_stage(work_dir):
+            logger.info(f"Job {job_id}: Transcribing video with Replicate Whisper using URL: {audio_url}")
+            segments = transcribe_with_replicate(
+                audio_url=audio_url,
                 language=language,
-                settings=subtitle_settings
+                batch_size=settings_obj.get("batch_size", 64),
+                job_id=job_id
             )
+            logger.info(f"Transcription completed with Replicate Whisper, got {len(segments)} segments")
             
-            logger.info(f"Generated subtitle files: SRT={srt_path}, ASS={ass_path}")
+            # Step 3: Adjust segment start times if needed
+            if start_time > 0:
+                logger.info(f"Adjusting segment start times by {start_time} seconds")
+                for segment in segments:
+                    segment["start"] = segment["start"] + start_time
+                    segment["end"] = segment["end"] + start_time
             
-            # Use the ASS file for captioning
-            subtitle_path = ass_path
-        except Exception as e:
-            logger.error(f"Error in enhanced subtitles generation: {str(e)}")
-            raise ValueError(f"Enhanced subtitles generation error: {str(e)}")
+            # Ensure segments have minimum duration
+            min_duration = 1.0  # Minimum duration in seconds
+            for segment in segments:
+                if segment["end"] - segment["start"] < min_duration:
+                    segment["end"] = segment["start"] + min_duration
+            
+            write_json(os.path.join(work_dir, "segments.json"), {"segments": segments, "transcription_tool": "replicate_whisper"})
+        
+        segments_dir = store.build("segments", stages["segments"], transcribe_stage, job_id=job_id)
+        segments_path = os.path.join(segments_dir, "segments.json")
+        segments = read_json(segments_path)["segments"]
+        
+        # Step 4: Enhance subtitles with script alignment
+        # Get subtitle settings
+        subtitle_settings = {
+            "font_name": settings_obj.get("font_name", "Arial"),
+            "font_size": settings_obj.get("font_size", 24),
+            "max_width": settings_obj.get("max_width", 40)
+        }
+        stages["subtitles"] = store.stage_key("subtitles", [segments_path], {
+            "script_text": script_text,
+            "language": language,
+            "settings": subtitle_settings
+        })
+        
+        def subtitles_stage(work_dir):
+            logger.info(f"Job {job_id}: Aligning script with transcription segments")
+            try:
+                # Generate enhanced subtitles
+                built_srt_path, built_ass_path = enhance_subtitles_from_segments(
+                    segments=segments,
+                    script_text=script_text,
+                    language=language,
+                    settings=subtitle_settings
+                )
+                logger.info(f"Generated subtitle files: SRT={built_srt_path}, ASS={built_ass_path}")
+            except Exception as e:
+                logger.error(f"Error in enhanced subtitles generation: {str(e)}")
+                raise ValueError(f"Enhanced subtitles generation error: {str(e)}")
+            shutil.copyfile(built_srt_path, os.path.join(work_dir, "subtitles.srt"))
+            shutil.copyfile(built_ass_path, os.path.join(work_dir, "subtitles.ass"))
+        
+        subtitles_dir = store.build("subtitles", stages["subtitles"], subtitles_stage, job_id=job_id)
+        
+        # Use copies of the ASS and SRT files for captioning
+        srt_path = os.path.join(temp_dir, "subtitles.srt")
+        subtitle_path = os.path.join(temp_dir, "subtitles.ass")
+        shutil.copyfile(os.path.join(subtitles_dir, "subtitles.srt"), srt_path)
+        shutil.copyfile(os.path.join(subtitles_dir, "subtitles.ass"), subtitle_path)
+        
+        # Record this run so a later request can restyle it by artifact ID
+        run_artifact_id = new_artifact_id()
+        store.save_manifest(run_artifact_id, {
+            "inputs": {
+                "video_url": video_url,
+                "script_text": script_text,
+                "language": language,
+                "settings": settings_obj
+            },
+            "stages": stages
+        })
         
         # Step 5: Add subtitles to video
         logger.info(f"Job {job_id}: Adding subtitles to video")
@@ -206,6 +292,7 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
                 video_path=downloaded_video_path,
                 subtitle_path=subtitle_path,
                 output_path=output_path,
+                job_id=job_id,
                 font_size=font_size,
                 font_name=font_name
             )
@@ -221,7 +308,7 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
             # Use a UUID for the filename to avoid collisions
             file_uuid = str(uuid.uuid4())
             cloud_path = f"videos/captioned/{file_uuid}_{os.path.basename(captioned_video_path)}"
-            output_video_url = upload_to_cloud_storage(captioned_video_path, cloud_path)
+            output_video_url = upload_to_cloud_storage(captioned_video_path, cloud_path, job_id=job_id)
             logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {output_video_url}")
         except Exception as e:
             logger.error(f"Job {job_id}: Failed to upload captioned video to cloud storage: {str(e)}")
@@ -235,7 +322,7 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
             try:
                 file_uuid = str(uuid.uuid4())
                 srt_cloud_path = f"subtitles/{file_uuid}_{os.path.basename(srt_path)}"
-                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path)
+                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path, job_id=job_id)
                 logger.info(f"Job {job_id}: Successfully uploaded SRT to cloud storage: {srt_cloud_url}")
             except Exception as e:
                 logger.error(f"Job {job_id}: Failed to upload SRT to cloud storage: {str(e)}")
@@ -254,6 +341,7 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
             "output_video_url": output_video_url,
             "transcription_tool": "replicate_whisper",
             "job_id": job_id,
+            "artifact_id": run_artifact_id,
             "processing_time": round(total_time, 3)
         }
         
@@ -261,27 +349,23 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
         if srt_cloud_url and include_srt:
             response["srt_url"] = srt_cloud_url
         
-        # Clean up temporary files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-            logger.info(f"Job {job_id}: Cleaned up temporary files")
-        except Exception as e:
-            logger.warning(f"Job {job_id}: Failed to clean up temporary files: {str(e)}")
-        
+        progress.finish(job_id, "succeeded", code=200, file_url=output_video_url)
         return response
         
     except Exception as e:
+        cancelled = cancellation.cancelled
+        if cancelled:
+            logger.info(f"Job {job_id}: Replicate auto-caption cancelled: {str(e)}")
+            progress.finish(job_id, "cancelled", code=CANCELLED_STATUS_CODE, error=cancellation.reason)
+            raise JobCancelled(cancellation.reason) from e
+        
         logger.error(f"Error in replicate auto-caption processing: {str(e)}")
         logger.error(traceback.format_exc())
-        
-        # Clean up temporary files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-            logger.info(f"Job {job_id}: Cleaned up temporary files")
-        except Exception as cleanup_error:
-            logger.warning(f"Job {job_id}: Failed to clean up temporary files: {str(cleanup_error)}")
+        progress.finish(job_id, "failed", code=500, error=str(e))
         
         # Re-raise the exception with a more informative message
         raise ValueError(f"Replicate auto-caption processing error: {str(e)}")
+        
+    finally:
+        release_job(job_id)
+        remove_job_workspace(job_id)
@@ -5,13 +5,12 @@ import json
 from datetime import datetime
 import time
 import threading
-import tempfile
 import traceback
 import shutil
 import uuid
 import sys
 import re
-import subprocess
+import requests
 
 from services.v1.media.transcribe import transcribe_with_whisper
 from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
@@ -19,11 +18,26 @@ from services.v1.video.caption_video import add_subtitles_to_video
 from services.v1.transcription.replicate_whisper import transcribe_with_replicate
 from services.v1.subtitles.thai_text_wrapper import create_srt_file, is_thai_text
 from services.webhook import send_webhook
-from services.file_management import download_file
+from services.file_management import download_file, job_workspace, remove_job_workspace
+from services.v1.video.artifact_store import get_artifact_store, new_artifact_id, read_json, write_json
+from services.v1.video.pipeline import Pipeline
+from services.cloud_storage import upload_to_cloud_storage
+from services.job_history import record_job
+from services.job_progress import get_job_progress
+from services.cancellation import CANCELLED_STATUS_CODE, JobCancelled, claim_job_id, register_job, release_job
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Settings the subtitle files depend on; other styles only affect the burn-in
+SUBTITLE_STAGE_SETTINGS = (
+    "font_name", "font_size", "max_width", "max_width_px", "margin_v", "line_color",
+    "outline_color", "back_color", "alignment", "max_words_per_line", "subtitle_style"
+)
+
+# Seconds to wait for the HEAD request that identifies remote media content
+REMOTE_HEAD_TIMEOUT = 10
+
 # Create blueprint
 script_enhanced_auto_caption_bp = Blueprint('script_enhanced_auto_caption', __name__, url_prefix='/api/v1/video')
 
@@ -126,7 +140,14 @@ def script_enhanced_auto_caption():
         "padding_top": "Top padding value (in pixels)",
         "padding_bottom": "Bottom padding value (in pixels)",
         "padding_left": "Left padding value (in pixels)",
-        "padding_right": "Right padding value (in pixels)"
+        "padding_right": "Right padding value (in pixels)",
+        "parallel_render": "Split long videos at keyframes and burn subtitles into the segments in parallel",
+        "caption_engine": "Subtitle renderer: libass (default) or overlay (pre-rendered subtitle images)",
+        "delivery": "hard (burn subtitles in, default) or soft (mux subtitles as a stream without re-encoding)",
+        "max_width_px": "Maximum subtitle line width in pixels of a 1920x1080 frame (wraps by measured text width)",
+        "artifact_id": "Artifact ID returned by a previous run; only the stages whose inputs changed are re-run (video_url and script_text may be omitted)",
+        "job_id": "Optional job ID of 8 to 128 letters, digits, '-' or '_', not used by another job; progress can be followed at /v1/jobs/<job_id>/events once the request has started",
+        "progress_webhook_url": "Optional URL receiving progress events, at most PROGRESS_WEBHOOK_PER_MINUTE per minute"
     }
     """
     try:
@@ -140,6 +161,24 @@ def script_enhanced_auto_caption():
         data = request.get_json()
         logger.debug(f"Received request data: {json.dumps(data, indent=2)}")
         
+        # A restyle request references a previous run and may omit its inputs
+        artifact_id = data.get("artifact_id")
+        previous_settings = {}
+        if artifact_id:
+            try:
+                previous = get_artifact_store().load_manifest(artifact_id)
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            if previous is None:
+                logger.error(f"Unknown or expired artifact_id: {artifact_id}")
+                return jsonify({"status": "error", "message": f"Unknown or expired artifact_id: {artifact_id}"}), 404
+            data = dict(data)
+            for key in ("video_url", "script_text", "language", "audio_url", "transcription_tool"):
+                if key not in data and previous["inputs"].get(key) is not None:
+                    data[key] = previous["inputs"][key]
+            previous_settings = previous["inputs"].get("settings") or {}
+            logger.info(f"Restyling artifact {artifact_id}")
+        
         # Validate required parameters
         required_params = ["video_url", "script_text"]
         for param in required_params:
@@ -229,13 +268,18 @@ def script_enhanced_auto_caption():
             "max_width", "line_color", "word_color", "outline_color", "all_caps",
             "max_words_per_line", "x", "y", "alignment", "bold", "italic", 
             "underline", "strikeout", "shadow", "outline", "back_color", 
-            "margin_l", "margin_r", "encoding"
+            "margin_l", "margin_r", "encoding", "padding", "padding_color",
+            "padding_top", "padding_bottom", "padding_left", "padding_right",
+            "parallel_render", "caption_engine", "delivery", "max_width_px"
         ]
         
         for param in optional_params:
             if param in data:
                 styling_params[param] = data[param]
         
+        # Styles not given in a restyle request keep the values of the previous run
+        styling_params = {**previous_settings, **styling_params}
+        
         # Special handling for back_color to ensure it's properly passed through
         if "back_color" in styling_params:
             logger.info(f"Found back_color in request: {styling_params['back_color']}")
@@ -316,8 +360,15 @@ def script_enhanced_auto_caption():
         # Log the extracted styling parameters
         logger.info(f"Extracted styling parameters: {styling_params}")
         
-        # Generate a job ID if not provided
-        job_id = data.get("job_id", f"script_enhanced_auto_caption_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+        # Use the caller's job ID if given so it can follow the progress events
+        if data.get("job_id"):
+            try:
+                claim_job_id(data["job_id"])
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            job_id = data["job_id"]
+        else:
+            job_id = str(uuid.uuid4())
         
         # Process the request
         try:
@@ -335,9 +386,13 @@ def script_enhanced_auto_caption():
                 subtitle_delay=subtitle_delay,
                 max_chars_per_line=max_chars_per_line,
                 transcription_tool=transcription_tool,
-                audio_url=audio_url
+                audio_url=audio_url,
+                artifact_id=artifact_id,
+                progress_webhook_url=data.get("progress_webhook_url")
             )
             return jsonify(result)
+        except JobCancelled as e:
+            return jsonify({"status": "cancelled", "job_id": job_id, "message": str(e)}), CANCELLED_STATUS_CODE
         except ValueError as e:
             logger.error(f"Error in script-enhanced auto-caption processing: {str(e)}")
             logger.error(traceback.format_exc())
@@ -352,7 +407,283 @@ def script_enhanced_auto_caption():
         logger.error(traceback.format_exc())
         return jsonify({"status": "error", "message": f"Unexpected error: {str(e)}"}), 500
 
-def process_script_enhanced_auto_caption(video_url, script_text, language="en", settings=None, output_path=None, webhook_url=None, job_id=None, response_type="cloud", include_srt=False, min_start_time=0.0, subtitle_delay=0.0, max_chars_per_line=30, transcription_tool="openai_whisper", audio_url=""):
+def remote_transcription_url(video_url, audio_url):
+    """
+    Get the URL Replicate would transcribe: the audio URL, or the video URL if that one is not remote.
+    
+    Returns:
+        Remote URL, or None if neither URL is remote
+    """
+    for url in (audio_url, video_url):
+        if url and url.startswith(('http://', 'https://')):
+            return url
+    return None
+
+def remote_content_version(url):
+    """
+    Identify the content behind a URL from its HEAD response, so a file re-uploaded
+    under the same URL is not mistaken for the one transcribed before.
+    
+    Returns:
+        Dictionary of the ETag, Last-Modified and Content-Length headers that are set, or None
+    """
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=REMOTE_HEAD_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not read the content version of {url}: {str(e)}")
+        return None
+    version = {name: response.headers[name] for name in ("ETag", "Last-Modified", "Content-Length") if response.headers.get(name)}
+    return version or None
+
+def transcribe_segments(downloaded_video_path, video_url, audio_url, language, transcription_tool, allow_fallback, start_time, settings_obj, job_id=None):
+    """
+    Transcribe a video with the selected tool, falling back to the other tool if allowed.
+    
+    Segment times are shifted by start_time and every segment lasts at least one second.
+    
+    Returns:
+        Tuple (segments, transcription_tool_used)
+    """
+    # Try to import the Replicate Whisper module
+    try:
+        from services.v1.transcription.replicate_whisper import transcribe_with_replicate
+        replicate_available = True
+    except ImportError:
+        logger.warning("Replicate Whisper module not available")
+        replicate_available = False
+    
+    # Transcribe the video based on selected tool
+    transcription_tool_used = transcription_tool  # Default to the selected tool
+    try:
+        if transcription_tool == "replicate_whisper" and replicate_available:
+            try:
+                # Extract audio URL if provided
+                if audio_url:
+                    audio_url = audio_url
+                else:
+                    # If no audio URL provided, use the video URL
+                    audio_url = video_url
+                # Ensure the audio_url is a remote URL (not a local path)
+                if not audio_url.startswith(('http://', 'https://')):
+                    logger.warning(f"Audio URL {audio_url} is not a remote URL. Replicate requires a remote URL.")
+                    # Fall back to using the video URL if it's remote
+                    if video_url.startswith(('http://', 'https://')):
+                        logger.info(f"Using video URL instead: {video_url}")
+                        audio_url = video_url
+                    else:
+                        error_msg = "Replicate requires a publicly accessible URL for audio. Please provide a public URL."
+                        logger.error(error_msg)
+                        raise ValueError(error_msg)
+                    
+                # Use Replicate for transcription
+                logger.info(f"Using Replicate Whisper for transcription with URL: {audio_url}")
+                segments = transcribe_with_replicate(
+                    audio_url=audio_url,
+                    language=language,
+                    batch_size=settings_obj.get("batch_size", 64),
+                    job_id=job_id
+                )
+                transcription_tool_used = "replicate_whisper"
+                logger.info(f"Transcription completed with Replicate Whisper, got {len(segments)} segments")
+            except Exception as e:
+                logger.error(f"Error in Replicate transcription: {str(e)}")
+                
+                # Only fall back if allowed
+                if allow_fallback:
+                    logger.warning("Replicate transcription failed, trying OpenAI Whisper as fallback...")
+                    try:
+                        from services.v1.media.transcribe import transcribe_with_whisper
+                        segments = transcribe_with_whisper(
+                            video_path=downloaded_video_path,
+                            language=language,
+                            job_id=job_id
+                        )
+                        transcription_tool_used = "openai_whisper"
+                        logger.info(f"Fallback transcription completed with OpenAI Whisper, got {len(segments)} segments")
+                    except Exception as fallback_error:
+                        logger.error(f"Fallback transcription also failed: {str(fallback_error)}")
+                        raise ValueError(f"Transcription failed with Replicate: {str(e)}\nFallback also failed: {str(fallback_error)}")
+                else:
+                    # If fallback is not allowed, raise the original error
+                    raise ValueError(f"Replicate transcription failed and fallback is disabled: {str(e)}")
+        else:
+            # Default to OpenAI Whisper
+            try:
+                logger.info("Using OpenAI Whisper for transcription")
+                from services.v1.media.transcribe import transcribe_with_whisper
+                segments = transcribe_with_whisper(
+                    video_path=downloaded_video_path,
+                    language=language,
+                    job_id=job_id
+                )
+                transcription_tool_used = "openai_whisper"
+                logger.info(f"Transcription completed with OpenAI Whisper, got {len(segments)} segments")
+            except Exception as e:
+                logger.error(f"Error in OpenAI transcription: {str(e)}")
+                
+                # Only fall back if allowed
+                if allow_fallback:
+                    logger.warning("OpenAI transcription failed, trying Replicate Whisper as fallback...")
+                    try:
+                        from services.v1.transcription.replicate_whisper import transcribe_with_replicate
+                        
+                        # Ensure we have a remote URL for Replicate
+                        if video_url.startswith(('http://', 'https://')):
+                            audio_url = video_url
+                            segments = transcribe_with_replicate(
+                                audio_url=audio_url,
+                                language=language,
+                                batch_size=settings_obj.get("batch_size", 64),
+                                job_id=job_id
+                            )
+                            transcription_tool_used = "replicate_whisper"
+                            logger.info(f"Fallback transcription completed with Replicate Whisper, got {len(segments)} segments")
+                        else:
+                            logger.error("Cannot fall back to Replicate: video URL is not a remote URL")
+                            raise ValueError("OpenAI transcription failed and cannot fall back to Replicate: video URL is not a remote URL")
+                    except Exception as fallback_error:
+                        logger.error(f"Fallback transcription also failed: {str(fallback_error)}")
+                        raise ValueError(f"Transcription failed with OpenAI: {str(e)}\nFallback also failed: {str(fallback_error)}")
+                else:
+                    # If fallback is not allowed, raise the original error
+                    raise ValueError(f"OpenAI transcription failed and fallback is disabled: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error in transcription: {str(e)}")
+        raise ValueError(f"Transcription error: {str(e)}")
+    
+    # Adjust segment start times if needed
+    if start_time > 0:
+        logger.info(f"Adjusting segment start times by {start_time} seconds")
+        for segment in segments:
+            segment["start"] = segment["start"] + start_time
+            segment["end"] = segment["end"] + start_time
+    
+    # Ensure minimum duration for segments
+    min_duration = 1.0  # Minimum duration in seconds
+    for segment in segments:
+        if segment["end"] - segment["start"] < min_duration:
+            segment["end"] = segment["start"] + min_duration
+    
+    return segments, transcription_tool_used
+
+def generate_subtitle_files(segments, script_text, language, settings_obj, subtitle_delay, max_chars_per_line, job_id=None):
+    """
+    Build the SRT and ASS subtitle files for aligned segments.
+    
+    Returns:
+        Tuple (srt_path, ass_path)
+    """
+    # Align script text with segments
+    logger.info(f"Job {job_id}: Aligning script with transcription segments")
+    
+    try:
+        # Use the enhanced subtitles function with the new signature
+        from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
+        
+        # Get subtitle settings
+        subtitle_settings = {
+            "font_name": settings_obj.get("font_name", "Arial"),
+            "font_size": settings_obj.get("font_size", 24),
+            "max_width": settings_obj.get("max_width", 40),
+            "margin_v": settings_obj.get("margin_v", 30),  # Add margin_v parameter
+            "line_color": settings_obj.get("line_color", "#FFFFFF"),
+            "outline_color": settings_obj.get("outline_color", "#000000"),
+            "back_color": settings_obj.get("back_color", "&H80000000"),
+            "alignment": settings_obj.get("alignment", 2),
+            "max_words_per_line": settings_obj.get("max_words_per_line", 15),
+            "subtitle_style": settings_obj.get("subtitle_style", "modern")
+        }
+        
+        # Call the enhanced subtitles function with the new signature
+        srt_path, ass_path = enhance_subtitles_from_segments(
+            segments=segments,
+            script_text=script_text,
+            language=language,
+            settings=subtitle_settings
+        )
+        
+        logger.info(f"Generated subtitle files: SRT={srt_path}, ASS={ass_path}")
+        
+        # If Thai language and subtitle_delay is specified, create a new SRT file with the delay
+        if is_thai_text(script_text) and subtitle_delay > 0:
+            logger.info(f"Thai text detected, applying subtitle delay of {subtitle_delay} seconds")
+            delayed_srt_path = os.path.join(os.path.dirname(srt_path), f"delayed_{os.path.basename(srt_path)}")
+            
+            # Parse the original SRT file
+            with open(srt_path, 'r', encoding='utf-8') as f:
+                srt_content = f.read()
+            
+            # Extract segments from SRT content
+            import re
+            pattern = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.+\n)+)'
+            matches = re.findall(pattern, srt_content, re.MULTILINE)
+            
+            segments_from_srt = []
+            for match in matches:
+                index, start_time_str, end_time_str, text = match
+                
+                # Convert SRT time format to seconds
+                def time_to_seconds(time_str):
+                    h, m, s = time_str.replace(',', '.').split(':')
+                    return int(h) * 3600 + int(m) * 60 + float(s)
+                
+                start_time = time_to_seconds(start_time_str)
+                end_time = time_to_seconds(end_time_str)
+                
+                segments_from_srt.append({
+                    "start": start_time,
+                    "end": end_time,
+                    "text": text.strip()
+                })
+            
+            # Measure lines with the subtitle font when a pixel width is requested
+            max_width_px = settings_obj.get("max_width_px")
+            measure_font_path = None
+            if max_width_px:
+                from services.v1.video.caption_video import get_font_path
+                measure_font_path = get_font_path(subtitle_settings.get("font_name"))
+            
+            # Create a new SRT file with the delay and improved text wrapping
+            delayed_srt_path = create_srt_file(
+                path=delayed_srt_path,
+                segments=segments_from_srt,
+                delay_seconds=subtitle_delay,
+                max_chars_per_line=max_chars_per_line,
+                font_path=measure_font_path,
+                font_size=subtitle_settings.get("font_size"),
+                max_width_px=max_width_px
+            )
+            
+            logger.info(f"Created delayed SRT file with improved Thai text wrapping: {delayed_srt_path}")
+            
+            # Use the delayed SRT file for captioning
+            srt_path = delayed_srt_path
+            
+            # Convert the delayed SRT to ASS for better styling
+            from services.v1.video.caption_video import convert_srt_to_ass_for_thai
+            delayed_ass_path = delayed_srt_path.replace('.srt', '.ass')
+            convert_srt_to_ass_for_thai(
+                srt_path=delayed_srt_path,
+                font_name=subtitle_settings.get("font_name"),
+                font_size=subtitle_settings.get("font_size"),
+                max_words_per_line=max_chars_per_line,
+                max_width_px=max_width_px
+            )
+            
+            if os.path.exists(delayed_ass_path):
+                logger.info(f"Created delayed ASS file: {delayed_ass_path}")
+                ass_path = delayed_ass_path
+        
+        # Use the ASS file for captioning
+        subtitle_path = ass_path
+    except Exception as e:
+        logger.error(f"Error in enhanced subtitles generation: {str(e)}")
+        raise ValueError(f"Enhanced subtitles generation error: {str(e)}")
+    
+    return srt_path, subtitle_path
+
+def process_script_enhanced_auto_caption(video_url, script_text, language="en", settings=None, output_path=None, webhook_url=None, job_id=None, response_type="cloud", include_srt=False, min_start_time=0.0, subtitle_delay=0.0, max_chars_per_line=30, transcription_tool="openai_whisper", audio_url="", artifact_id=None, progress_webhook_url=None):
     """
     Process script-enhanced auto-captioning.
     
@@ -371,6 +702,8 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
         max_chars_per_line (int, optional): Maximum characters per subtitle line
         transcription_tool (str, optional): Transcription tool to use (replicate_whisper or openai_whisper)
         audio_url (str, optional): Optional URL to an audio file to use for transcription instead of extracting from video
+        artifact_id (str, optional): Artifact ID of a previous run; stages whose inputs did not change are reused
+        progress_webhook_url (str, optional): URL receiving throttled progress events
         
     Returns:
         dict: Response with captioned video URL and metadata
@@ -436,350 +769,246 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
     
     process_start_time = time.time()
     
-    # Create a temporary directory for processing
-    temp_dir = os.path.join(tempfile.gettempdir(), f"script_enhanced_auto_caption_{job_id}")
-    os.makedirs(temp_dir, exist_ok=True)
+    # Work in the job's workspace, removed when the job ends
+    temp_dir = job_workspace(job_id)
     
     logger.info(f"Job {job_id}: Created temporary directory: {temp_dir}")
     
+    progress = get_job_progress()
+    if progress_webhook_url:
+        progress.set_webhook(job_id, progress_webhook_url)
+    progress.status(job_id, "started")
+    
+    # DELETE /v1/jobs/<job_id> sets this token; the pipeline, ffmpeg, downloads, uploads and Replicate follow it
+    cancellation = register_job(job_id)
+    
+    store = get_artifact_store()
+    previous = store.load_manifest(artifact_id) if artifact_id else None
+    # Runs restyled from one another share a lineage, named after the first run
+    lineage = (previous.get("lineage") or artifact_id) if previous else job_id
+    pipeline = Pipeline("script-enhanced-auto-caption", job_id=job_id)
+    
     try:
-        # Download the video
-        logger.info(f"Job {job_id}: Downloading video from {video_url}")
-        downloaded_video_path = os.path.join(temp_dir, f"video_{job_id}.mp4")
-        download_file(video_url, downloaded_video_path)
-        logger.info(f"Job {job_id}: Video downloaded to {downloaded_video_path}")
+        # Step 1: Get the video. A restyle of a previous run reuses its stored download.
+        def download_stage():
+            video_dir = None
+            if previous and previous["inputs"].get("video_url") == video_url and previous["stages"].get("video"):
+                video_dir = store.lookup("video", previous["stages"]["video"])
+            if video_dir:
+                logger.info(f"Job {job_id}: Reusing video of artifact {artifact_id}")
+                return os.path.join(video_dir, "video.mp4"), previous["stages"]["video"]
+            logger.info(f"Job {job_id}: Downloading video from {video_url}")
+            download_path = os.path.join(temp_dir, f"video_{job_id}.mp4")
+            download_file(video_url, download_path, job_id=job_id)
+            video_key, downloaded_video_path = store.import_file("video", download_path, "video.mp4", job_id=job_id)
+            logger.info(f"Job {job_id}: Video downloaded to {downloaded_video_path}")
+            return downloaded_video_path, video_key
         
-        # Try to import the Replicate Whisper module
-        try:
-            from services.v1.transcription.replicate_whisper import transcribe_with_replicate
-            replicate_available = True
-        except ImportError:
-            logger.warning("Replicate Whisper module not available")
-            replicate_available = False
+        pipeline.add_stage("download", download_stage, outputs=("video_path", "video_key"), retries=2)
         
-        # Transcribe the video based on selected tool
-        transcription_tool_used = transcription_tool  # Default to the selected tool
-        try:
-            if transcription_tool == "replicate_whisper" and replicate_available:
-                try:
-                    # Extract audio URL if provided
-                    if audio_url:
-                        audio_url = audio_url
-                    else:
-                        # If no audio URL provided, use the video URL
-                        audio_url = video_url
-                    # Ensure the audio_url is a remote URL (not a local path)
-                    if not audio_url.startswith(('http://', 'https://')):
-                        logger.warning(f"Audio URL {audio_url} is not a remote URL. Replicate requires a remote URL.")
-                        # Fall back to using the video URL if it's remote
-                        if video_url.startswith(('http://', 'https://')):
-                            logger.info(f"Using video URL instead: {video_url}")
-                            audio_url = video_url
-                        else:
-                            error_msg = "Replicate requires a publicly accessible URL for audio. Please provide a public URL."
-                            logger.error(error_msg)
-                            raise ValueError(error_msg)
-                        
-                    # Use Replicate for transcription
-                    logger.info(f"Using Replicate Whisper for transcription with URL: {audio_url}")
-                    segments = transcribe_with_replicate(
-                        audio_url=audio_url,
-                        language=language,
-                        batch_size=settings_obj.get("batch_size", 64)
-                    )
-                    transcription_tool_used = "replicate_whisper"
-                    logger.info(f"Transcription completed with Replicate Whisper, got {len(segments)} segments")
-                except Exception as e:
-                    logger.error(f"Error in Replicate transcription: {str(e)}")
-                    
-                    # Only fall back if allowed
-                    if allow_fallback:
-                        logger.warning("Replicate transcription failed, trying OpenAI Whisper as fallback...")
-                        try:
-                            from services.v1.media.transcribe import transcribe_with_whisper
-                            segments = transcribe_with_whisper(
-                                video_path=downloaded_video_path,
-                                language=language
-                            )
-                            transcription_tool_used = "openai_whisper"
-                            logger.info(f"Fallback transcription completed with OpenAI Whisper, got {len(segments)} segments")
-                        except Exception as fallback_error:
-                            logger.error(f"Fallback transcription also failed: {str(fallback_error)}")
-                            raise ValueError(f"Transcription failed with Replicate: {str(e)}\nFallback also failed: {str(fallback_error)}")
-                    else:
-                        # If fallback is not allowed, raise the original error
-                        raise ValueError(f"Replicate transcription failed and fallback is disabled: {str(e)}")
+        # Step 2: Transcribe, unless this media was already transcribed with the same options.
+        # Replicate reads the media from its URL, so without a local fallback it runs while the
+        # video downloads and the critical path is max(download, transcribe) instead of the sum.
+        transcription_options = {
+            "audio_url": audio_url,
+            "language": language,
+            "transcription_tool": transcription_tool,
+            "allow_fallback": allow_fallback,
+            "batch_size": settings_obj.get("batch_size", 64),
+            "start_time": start_time
+        }
+        remote_url = remote_transcription_url(video_url, audio_url)
+        transcribe_from_url = transcription_tool == "replicate_whisper" and remote_url is not None and not allow_fallback
+        
+        def transcribe_stage(video_path=None):
+            if video_path:
+                segments_key = store.stage_key("segments", [video_path], transcription_options)
             else:
-                # Default to OpenAI Whisper
-                try:
-                    logger.info("Using OpenAI Whisper for transcription")
-                    from services.v1.media.transcribe import transcribe_with_whisper
-                    segments = transcribe_with_whisper(
-                        video_path=downloaded_video_path,
-                        language=language
-                    )
-                    transcription_tool_used = "openai_whisper"
-                    logger.info(f"Transcription completed with OpenAI Whisper, got {len(segments)} segments")
-                except Exception as e:
-                    logger.error(f"Error in OpenAI transcription: {str(e)}")
-                    
-                    # Only fall back if allowed
-                    if allow_fallback:
-                        logger.warning("OpenAI transcription failed, trying Replicate Whisper as fallback...")
-                        try:
-                            from services.v1.transcription.replicate_whisper import transcribe_with_replicate
-                            
-                            # Ensure we have a remote URL for Replicate
-                            if video_url.startswith(('http://', 'https://')):
-                                audio_url = video_url
-                                segments = transcribe_with_replicate(
-                                    audio_url=audio_url,
-                                    language=language,
-                                    batch_size=settings_obj.get("batch_size", 64)
-                                )
-                                transcription_tool_used = "replicate_whisper"
-                                logger.info(f"Fallback transcription completed with Replicate Whisper, got {len(segments)} segments")
-                            else:
-                                logger.error("Cannot fall back to Replicate: video URL is not a remote URL")
-                                raise ValueError("OpenAI transcription failed and cannot fall back to Replicate: video URL is not a remote URL")
-                        except Exception as fallback_error:
-                            logger.error(f"Fallback transcription also failed: {str(fallback_error)}")
-                            raise ValueError(f"Transcription failed with OpenAI: {str(e)}\nFallback also failed: {str(fallback_error)}")
-                    else:
-                        # If fallback is not allowed, raise the original error
-                        raise ValueError(f"OpenAI transcription failed and fallback is disabled: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error in transcription: {str(e)}")
-            raise ValueError(f"Transcription error: {str(e)}")
-        
-        # Adjust segment start times if needed
-        if start_time > 0:
-            logger.info(f"Adjusting segment start times by {start_time} seconds")
-            for segment in segments:
-                segment["start"] = segment["start"] + start_time
-                segment["end"] = segment["end"] + start_time
-        
-        # Ensure minimum duration for segments
-        min_duration = 1.0  # Minimum duration in seconds
-        for segment in segments:
-            if segment["end"] - segment["start"] < min_duration:
-                segment["end"] = segment["start"] + min_duration
+                # Without a content version a re-upload under the same URL cannot be told apart,
+                # so the transcription is then only reused by restyles of the same run
+                version = remote_content_version(remote_url)
+                identity = {"content_version": version} if version else {"lineage": lineage}
+                segments_key = store.stage_key("segments", [], dict(transcription_options, transcription_url=remote_url, **identity))
+            
+            def build(work_dir):
+                segments, tool_used = transcribe_segments(
+                    video_path, video_url, audio_url, language,
+                    transcription_tool, allow_fallback, start_time, settings_obj, job_id=job_id
+                )
+                write_json(os.path.join(work_dir, "segments.json"), {"segments": segments, "transcription_tool": tool_used})
+            
+            segments_dir = store.build("segments", segments_key, build, job_id=job_id)
+            segments_path = os.path.join(segments_dir, "segments.json")
+            return segments_path, read_json(segments_path)["transcription_tool"], segments_key
         
-        # Align script text with segments
-        logger.info(f"Job {job_id}: Aligning script with transcription segments")
+        # Remote transcription is worth another attempt; a local Whisper failure is not
+        pipeline.add_stage("transcribe", transcribe_stage, inputs=() if transcribe_from_url else ("video_path",),
+                           outputs=("segments_path", "transcription_tool_used", "segments_key"),
+                           retries=1 if transcription_tool == "replicate_whisper" else 0)
         
-        try:
-            # Use the enhanced subtitles function with the new signature
-            from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
+        # Step 3: Align the script and build the subtitle files, unless nothing they depend on changed
+        def subtitles_stage(segments_path):
+            subtitles_key = store.stage_key("subtitles", [segments_path], {
+                "script_text": script_text,
+                "language": language,
+                "settings": {key: settings_obj.get(key) for key in SUBTITLE_STAGE_SETTINGS},
+                "subtitle_delay": subtitle_delay,
+                "max_chars_per_line": max_chars_per_line
+            })
             
-            # Get subtitle settings
-            subtitle_settings = {
-                "font_name": settings_obj.get("font_name", "Arial"),
-                "font_size": settings_obj.get("font_size", 24),
-                "max_width": settings_obj.get("max_width", 40),
-                "margin_v": settings_obj.get("margin_v", 30),  # Add margin_v parameter
-                "line_color": settings_obj.get("line_color", "#FFFFFF"),
-                "outline_color": settings_obj.get("outline_color", "#000000"),
-                "back_color": settings_obj.get("back_color", "&H80000000"),
-                "alignment": settings_obj.get("alignment", 2),
-                "max_words_per_line": settings_obj.get("max_words_per_line", 15),
-                "subtitle_style": settings_obj.get("subtitle_style", "modern")
-            }
+            def build(work_dir):
+                segments = read_json(segments_path)["segments"]
+                built_srt_path, built_ass_path = generate_subtitle_files(
+                    segments, script_text, language, settings_obj, subtitle_delay, max_chars_per_line, job_id=job_id
+                )
+                shutil.copyfile(built_srt_path, os.path.join(work_dir, "subtitles.srt"))
+                shutil.copyfile(built_ass_path, os.path.join(work_dir, "subtitles.ass"))
             
-            # Call the enhanced subtitles function with the new signature
-            srt_path, ass_path = enhance_subtitles_from_segments(
-                segments=segments,
-                script_text=script_text,
-                language=language,
-                settings=subtitle_settings
-            )
+            subtitles_dir = store.build("subtitles", subtitles_key, build, job_id=job_id)
             
-            logger.info(f"Generated subtitle files: SRT={srt_path}, ASS={ass_path}")
+            # Work on copies: the renderer may write positioned variants next to the subtitle file
+            srt_path = os.path.join(temp_dir, "subtitles.srt")
+            subtitle_path = os.path.join(temp_dir, "subtitles.ass")
+            shutil.copyfile(os.path.join(subtitles_dir, "subtitles.srt"), srt_path)
+            shutil.copyfile(os.path.join(subtitles_dir, "subtitles.ass"), subtitle_path)
+            return srt_path, subtitle_path, subtitles_key
+        
+        pipeline.add_stage("subtitles", subtitles_stage, inputs=("segments_path",), outputs=("srt_path", "subtitle_path", "subtitles_key"))
+        
+        # Record this run so a later request can restyle it by artifact ID. It waits for the
+        # download as well, which may still be running when the subtitles are ready.
+        def manifest_stage(video_key, segments_key, subtitles_key):
+            run_artifact_id = new_artifact_id()
+            store.save_manifest(run_artifact_id, {
+                "inputs": {
+                    "video_url": video_url,
+                    "script_text": script_text,
+                    "language": language,
+                    "audio_url": audio_url,
+                    "transcription_tool": transcription_tool,
+                    "settings": settings
+                },
+                "lineage": lineage,
+                "stages": {"video": video_key, "segments": segments_key, "subtitles": subtitles_key}
+            })
+            return run_artifact_id
+        
+        pipeline.add_stage("manifest", manifest_stage, inputs=("video_key", "segments_key", "subtitles_key"), outputs=("artifact_id",))
+        
+        # Step 4: Add subtitles to video
+        def burn_stage(video_path, srt_path, subtitle_path):
+            logger.info(f"Job {job_id}: Adding subtitles to video")
             
-            # If Thai language and subtitle_delay is specified, create a new SRT file with the delay
-            if is_thai_text(script_text) and subtitle_delay > 0:
-                logger.info(f"Thai text detected, applying subtitle delay of {subtitle_delay} seconds")
-                delayed_srt_path = os.path.join(os.path.dirname(srt_path), f"delayed_{os.path.basename(srt_path)}")
-                
-                # Parse the original SRT file
-                with open(srt_path, 'r', encoding='utf-8') as f:
-                    srt_content = f.read()
-                
-                # Extract segments from SRT content
-                import re
-                pattern = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.+\n)+)'
-                matches = re.findall(pattern, srt_content, re.MULTILINE)
-                
-                segments_from_srt = []
-                for match in matches:
-                    index, start_time_str, end_time_str, text = match
-                    
-                    # Convert SRT time format to seconds
-                    def time_to_seconds(time_str):
-                        h, m, s = time_str.replace(',', '.').split(':')
-                        return int(h) * 3600 + int(m) * 60 + float(s)
-                    
-                    start_time = time_to_seconds(start_time_str)
-                    end_time = time_to_seconds(end_time_str)
-                    
-                    segments_from_srt.append({
-                        "start": start_time,
-                        "end": end_time,
-                        "text": text.strip()
-                    })
-                
-                # Create a new SRT file with the delay and improved text wrapping
-                delayed_srt_path = create_srt_file(
-                    path=delayed_srt_path,
-                    segments=segments_from_srt,
-                    delay_seconds=subtitle_delay,
-                    max_chars_per_line=max_chars_per_line
-                )
-                
-                logger.info(f"Created delayed SRT file with improved Thai text wrapping: {delayed_srt_path}")
+            # Create the output path
+            output_path = os.path.join(temp_dir, f"captioned_{job_id}.mp4")
+            
+            # Get font settings
+            font_name = settings_obj.get("font_name", "Arial")
+            font_size = settings_obj.get("font_size", 24)
+            
+            # Only include the parameters that the function accepts
+            add_subtitles_params = {
+                "video_path": video_path,
+                "subtitle_path": subtitle_path,
+                "output_path": output_path,
+                "font_size": font_size,
+                "font_name": font_name,
+                "job_id": job_id
+            }
+            
+            # Apply padding if requested. It is folded into the caption encode so the
+            # video is only rendered once.
+            if "padding" in settings_obj or "padding_top" in settings_obj or "padding_bottom" in settings_obj or "padding_left" in settings_obj or "padding_right" in settings_obj:
+                # If padding is specified as a single value, use it for all sides
+                if "padding" in settings_obj:
+                    padding_top = padding_bottom = padding_left = padding_right = int(settings_obj["padding"])
+                else:
+                    padding_top = int(settings_obj.get("padding_top", 0))
+                    padding_bottom = int(settings_obj.get("padding_bottom", 0))
+                    padding_left = int(settings_obj.get("padding_left", 0))
+                    padding_right = int(settings_obj.get("padding_right", 0))
                 
-                # Use the delayed SRT file for captioning
-                srt_path = delayed_srt_path
+                add_subtitles_params["padding_top"] = padding_top
+                add_subtitles_params["padding_bottom"] = padding_bottom
+                add_subtitles_params["padding_left"] = padding_left
+                add_subtitles_params["padding_right"] = padding_right
+                add_subtitles_params["padding_color"] = settings_obj.get("padding_color", "white")
+                logger.info(f"Job {job_id}: Padding values: Top={padding_top}, Bottom={padding_bottom}, Left={padding_left}, Right={padding_right}")
+            
+            # Select the subtitle renderer
+            if settings_obj.get("caption_engine") == "overlay":
+                add_subtitles_params["engine"] = "overlay"
+                logger.info(f"Job {job_id}: Using overlay caption engine")
+            
+            # Burn long videos segment by segment across all cores if requested
+            if settings_obj.get("parallel_render"):
+                add_subtitles_params["parallel"] = True
+                logger.info(f"Job {job_id}: Parallel segment rendering enabled")
+            
+            # Add positioning parameters
+            if "position" in settings_obj:
+                add_subtitles_params["position"] = settings_obj["position"]
                 
-                # Convert the delayed SRT to ASS for better styling
-                from services.v1.video.caption_video import convert_srt_to_ass_for_thai
-                delayed_ass_path = delayed_srt_path.replace('.srt', '.ass')
-                convert_srt_to_ass_for_thai(
-                    srt_path=delayed_srt_path,
-                    font_name=subtitle_settings.get("font_name"),
-                    font_size=subtitle_settings.get("font_size"),
-                    max_words_per_line=max_chars_per_line
-                )
+            # Custom coordinates anchor every subtitle at (x, y) in the subtitle engine
+            if settings_obj.get("x") is not None and settings_obj.get("y") is not None:
+                add_subtitles_params["x"] = settings_obj["x"]
+                add_subtitles_params["y"] = settings_obj["y"]
+                logger.info(f"Job {job_id}: Custom coordinates: x={settings_obj['x']}, y={settings_obj['y']}")
                 
-                if os.path.exists(delayed_ass_path):
-                    logger.info(f"Created delayed ASS file: {delayed_ass_path}")
-                    ass_path = delayed_ass_path
+            # Log the final parameters
+            for key, value in add_subtitles_params.items():
+                logger.info(f"Job {job_id}: {key}: {value}")
             
-            # Use the ASS file for captioning
-            subtitle_path = ass_path
-        except Exception as e:
-            logger.error(f"Error in enhanced subtitles generation: {str(e)}")
-            raise ValueError(f"Enhanced subtitles generation error: {str(e)}")
-        
-        # Step 3: Add subtitles to video
-        logger.info(f"Job {job_id}: Adding subtitles to video")
-        
-        # Create the output path
-        output_path = os.path.join(temp_dir, f"captioned_{job_id}.mp4")
-        
-        # Prepare parameters for add_subtitles_to_video
-        logger.info(f"Job {job_id}: Calling add_subtitles_to_video with parameters:")
-        logger.info(f"Job {job_id}: video_path: {downloaded_video_path}")
-        logger.info(f"Job {job_id}: subtitle_path: {subtitle_path}")
-        logger.info(f"Job {job_id}: output_path: {output_path}")
-        
-        # Get font settings
-        font_name = settings_obj.get("font_name", "Arial")
-        font_size = settings_obj.get("font_size", 24)
-        
-        logger.info(f"Job {job_id}: font_name: {font_name}")
-        logger.info(f"Job {job_id}: font_size: {font_size}")
-        
-        # Only include the parameters that the function accepts
-        add_subtitles_params = {
-            "video_path": downloaded_video_path,
-            "subtitle_path": subtitle_path,
-            "output_path": output_path,
-            "font_size": font_size,
-            "font_name": font_name
-        }
+            if settings_obj.get("delivery") == "soft":
+                # Mux the subtitles as a stream; styling, padding and positioning need a re-encode and are skipped
+                from services.v1.video.caption_video import mux_subtitles_into_video
+                logger.info(f"Job {job_id}: Soft subtitle delivery requested, muxing without re-encoding")
+                return mux_subtitles_into_video(
+                    video_path=video_path,
+                    subtitle_path=srt_path,
+                    output_path=output_path,
+                    language=language,
+                    job_id=job_id
+                )
+            return add_subtitles_to_video(**add_subtitles_params)
         
-        # Add positioning parameters
-        if "position" in settings_obj:
-            add_subtitles_params["position"] = settings_obj["position"]
-            logger.info(f"Job {job_id}: position: {settings_obj['position']}")
-            
-        # Extract custom positioning parameters before passing to add_subtitles_to_video
-        custom_x = None
-        custom_y = None
-        if "x" in add_subtitles_params:
-            custom_x = add_subtitles_params.pop("x")
-            logger.info(f"Job {job_id}: Extracted custom x coordinate: {custom_x}")
-        if "y" in add_subtitles_params:
-            custom_y = add_subtitles_params.pop("y")
-            logger.info(f"Job {job_id}: Extracted custom y coordinate: {custom_y}")
-            
-        # Log the final parameters
-        for key, value in add_subtitles_params.items():
-            logger.info(f"Job {job_id}: {key}: {value}")
+        pipeline.add_stage("burn", burn_stage, inputs=("video_path", "srt_path", "subtitle_path"), outputs=("caption_result",))
         
-        # Call add_subtitles_to_video with filtered parameters
-        from services.v1.video.caption_video import add_subtitles_to_video
-        caption_result = add_subtitles_to_video(**add_subtitles_params)
+        # Step 5: Upload the captioned video, falling back to the local path if the upload keeps failing
+        def upload_video_stage(caption_result):
+            if isinstance(caption_result, dict) and "file_url" in caption_result:
+                return caption_result["file_url"]
+            if not (isinstance(caption_result, str) and os.path.exists(caption_result)):
+                return ""
+            # Use a UUID for the filename to avoid collisions
+            cloud_path = f"captioned_videos/{uuid.uuid4()}_{os.path.basename(caption_result)}"
+            cloud_url = upload_to_cloud_storage(caption_result, cloud_path, job_id=job_id)
+            logger.info(f"Job {job_id}: Successfully uploaded video to cloud storage: {cloud_url}")
+            return cloud_url
         
-        # If we have custom coordinates and the caption was successful, modify the subtitle file
-        if caption_result and custom_x is not None and custom_y is not None:
-            logger.info(f"Job {job_id}: Applying custom coordinates (x={custom_x}, y={custom_y}) to subtitle file")
-            try:
-                # Check if the output is an ASS file
-                if caption_result.lower().endswith('.ass'):
-                    # Modify the ASS file to add custom positioning
-                    with open(caption_result, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Add positioning tags to dialogue lines
-                    if "Dialogue:" in content:
-                        # Replace any existing \pos tags or add our own
-                        if "\\pos(" in content:
-                            logger.debug("Found existing \\pos tag, replacing with custom coordinates")
-                            content = re.sub(r'\\pos\([^)]+\)', f"\\pos({custom_x},{custom_y})", content)
-                        else:
-                            logger.debug("No existing \\pos tag found, adding custom coordinates to dialogue lines")
-                            # Add \pos tag to each dialogue line
-                            content = re.sub(r'(Dialogue:[^,]*,[^,]*,[^,]*,[^,]*,[^,]*,[^,]*,[^,]*,[^,]*,[^,]*,)', 
-                                           f'\\1{{\\an5\\pos({custom_x},{custom_y})}}', content)
-                        
-                        # Write the modified content back
-                        with open(caption_result, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                        
-                        logger.info(f"Job {job_id}: Successfully applied custom coordinates to subtitle file")
-                    else:
-                        logger.warning(f"Job {job_id}: No dialogue lines found in ASS file, couldn't apply custom coordinates")
-                else:
-                    logger.warning(f"Job {job_id}: Output is not an ASS file, couldn't apply custom coordinates")
-            except Exception as e:
-                logger.error(f"Job {job_id}: Error applying custom coordinates: {str(e)}")
-                # Continue with the original file if modification fails
+        def upload_video_fallback(error):
+            logger.error(f"Job {job_id}: Failed to upload captioned video to cloud storage: {str(error)}")
+            return f"file://{os.path.join(temp_dir, f'captioned_{job_id}.mp4')}"
         
-        # Apply padding if requested
-        if "padding" in settings_obj or "padding_top" in settings_obj or "padding_bottom" in settings_obj or "padding_left" in settings_obj or "padding_right" in settings_obj:
-            logger.info(f"Job {job_id}: Applying padding to video")
-            
-            # If padding is specified as a single value, use it for all sides
-            if "padding" in settings_obj:
-                padding_top = padding_bottom = padding_left = padding_right = int(settings_obj["padding"])
-            else:
-                padding_top = int(settings_obj.get("padding_top", 0))
-                padding_bottom = int(settings_obj.get("padding_bottom", 0))
-                padding_left = int(settings_obj.get("padding_left", 0))
-                padding_right = int(settings_obj.get("padding_right", 0))
-            
-            # Create padded video
-            padded_video_path = apply_padding_to_video(
-                video_path=downloaded_video_path, 
-                padding_top=padding_top, 
-                padding_bottom=padding_bottom,
-                padding_left=padding_left,
-                padding_right=padding_right,
-                padding_color=settings_obj.get("padding_color", "white"),
-                job_id=job_id
-            )
-            
-            logger.info(f"Job {job_id}: Created padded video at {padded_video_path}")
+        pipeline.add_stage("upload_video", upload_video_stage, inputs=("caption_result",), outputs=("file_url",),
+                           retries=2, fallback=upload_video_fallback)
+        
+        # The SRT upload only needs the subtitles, so it runs while the video is being burned
+        if include_srt:
+            def upload_srt_stage(srt_path):
+                srt_cloud_path = f"subtitles/{uuid.uuid4()}_{os.path.basename(srt_path)}"
+                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path, job_id=job_id)
+                logger.info(f"Job {job_id}: Successfully uploaded SRT to cloud storage: {srt_cloud_url}")
+                return srt_cloud_url
             
-            # Use the padded video for subtitling
-            downloaded_video_path = padded_video_path
+            def upload_srt_fallback(error):
+                logger.error(f"Job {job_id}: Failed to upload SRT to cloud storage: {str(error)}")
+                return f"file://{os.path.join(temp_dir, 'subtitles.srt')}"
             
-            # Adjust y position for top padding if needed
-            if padding_top > 0 and custom_y is not None:
-                custom_y = int(custom_y) + padding_top
-                logger.info(f"Job {job_id}: Adjusted y position to {custom_y} due to top padding")
+            pipeline.add_stage("upload_srt", upload_srt_stage, inputs=("srt_path",), outputs=("srt_url",),
+                               retries=2, fallback=upload_srt_fallback)
+        
+        values = pipeline.run()
         
         # Calculate total processing time
         end_time = time.time()
@@ -794,83 +1023,32 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
             "message": "success",
             "response": [
                 {
-                    "file_url": ""
+                    "file_url": values["file_url"]
                 }
             ],
             "run_time": round(run_time, 3),
             "total_time": round(total_time, 3),
-            "transcription_tool": transcription_tool_used
+            "transcription_tool": values["transcription_tool_used"],
+            "artifact_id": values["artifact_id"],
+            "stages": pipeline.report()
         }
         
-        # Handle the caption_result which is a string path, not a dictionary
-        if isinstance(caption_result, str) and os.path.exists(caption_result):
-            # Always upload the captioned video to cloud storage
-            try:
-                from services.cloud_storage import upload_to_cloud_storage
-                # Use a UUID for the filename to avoid collisions
-                import uuid
-                file_uuid = str(uuid.uuid4())
-                cloud_path = f"captioned_videos/{file_uuid}_{os.path.basename(caption_result)}"
-                cloud_url = upload_to_cloud_storage(caption_result, cloud_path)
-                
-                # Log the upload success
-                logger.info(f"Job {job_id}: Successfully uploaded video to cloud storage: {cloud_url}")
-                
-                # Update the response with the cloud URL
-                response["response"][0]["file_url"] = cloud_url
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload captioned video to cloud storage: {str(e)}")
-                logger.error(traceback.format_exc())
-                # Fall back to local file path if upload fails
-                response["response"][0]["file_url"] = f"file://{caption_result}"
-        elif isinstance(caption_result, dict) and "file_url" in caption_result:
-            # Handle if caption_result is already a dictionary with file_url
-            response["response"][0]["file_url"] = caption_result["file_url"]
-        
         # Add SRT URL to the response only if explicitly requested
-        if srt_path and include_srt:
-            try:
-                from services.cloud_storage import upload_to_cloud_storage
-                # Use a UUID for the filename to avoid collisions
-                import uuid
-                file_uuid = str(uuid.uuid4())
-                srt_cloud_path = f"subtitles/{file_uuid}_{os.path.basename(srt_path)}"
-                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path)
-                logger.info(f"Job {job_id}: Successfully uploaded SRT to cloud storage: {srt_cloud_url}")
-                response["srt_url"] = srt_cloud_url
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload SRT to cloud storage: {str(e)}")
-                logger.error(traceback.format_exc())
-                # Fall back to local file path if upload fails
-                response["srt_url"] = f"file://{srt_path}"
-        
-        # Add optional metadata if available
-        if "metadata" in locals() and 'caption_result' in locals() and isinstance(caption_result, dict) and "metadata" in caption_result:
-            metadata = caption_result["metadata"]
-            if isinstance(metadata, dict):
-                # Extract specific metadata fields to match original format
-                if "format" in metadata:
-                    format_data = metadata["format"]
-                    if isinstance(format_data, dict):
-                        if "duration" in format_data:
-                            try:
-                                response["duration"] = float(format_data["duration"])
-                            except (ValueError, TypeError):
-                                response["duration"] = 0.0
-                        if "bit_rate" in format_data:
-                            try:
-                                response["bitrate"] = int(format_data["bit_rate"])
-                            except (ValueError, TypeError):
-                                response["bitrate"] = 0
-                        if "size" in format_data:
-                            try:
-                                response["filesize"] = int(format_data["size"])
-                            except (ValueError, TypeError):
-                                response["filesize"] = 0
-                
-                # Add thumbnail URL if available
-                if "thumbnail_url" in metadata:
-                    response["thumbnail"] = str(metadata["thumbnail_url"])
+        if include_srt:
+            response["srt_url"] = values["srt_url"]
+        
+        record_job(
+            job_id=job_id,
+            endpoint="/api/v1/video/script-enhanced-auto-caption",
+            status_code=200,
+            run_time=total_time,
+            pid=os.getpid(),
+            input_bytes=os.path.getsize(values["video_path"]),
+            output_bytes=os.path.getsize(values["caption_result"]) if isinstance(values["caption_result"], str) and os.path.exists(values["caption_result"]) else None,
+            stages=response["stages"]
+        )
+        
+        progress.finish(job_id, "succeeded", code=200, file_url=values["file_url"])
         
         # Send webhook if provided
         if webhook_url:
@@ -882,16 +1060,33 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
         return response
         
     except Exception as e:
-        logger.error(f"Error in script-enhanced auto-caption processing: {str(e)}")
-        logger.error(traceback.format_exc())
+        cancelled = cancellation.cancelled
+        status_code = CANCELLED_STATUS_CODE if cancelled else 500
+        if cancelled:
+            logger.info(f"Job {job_id}: Script-enhanced auto-caption cancelled: {str(e)}")
+        else:
+            logger.error(f"Error in script-enhanced auto-caption processing: {str(e)}")
+            logger.error(traceback.format_exc())
         
         error_response = {
-            "code": 500,
+            "code": status_code,
             "id": "script-enhanced-auto-caption",
             "job_id": job_id,
-            "message": "error",
-            "error": str(e)
+            "message": "cancelled" if cancelled else "error",
+            "error": cancellation.reason if cancelled else str(e),
+            "stages": pipeline.report()
         }
+        record_job(
+            job_id=job_id,
+            endpoint="/api/v1/video/script-enhanced-auto-caption",
+            status_code=status_code,
+            run_time=time.time() - process_start_time,
+            pid=os.getpid(),
+            stages=error_response["stages"],
+            error=error_response["error"]
+        )
+        
+        progress.finish(job_id, "cancelled" if cancelled else "failed", code=status_code, error=error_response["error"])
         
         # Send webhook with error if provided
         if webhook_url:
@@ -900,81 +1095,10 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
             except Exception as webhook_error:
                 logger.error(f"Failed to send error webhook: {str(webhook_error)}")
         
+        if cancelled:
+            raise JobCancelled(cancellation.reason) from e
         raise ValueError(f"Script-enhanced auto-caption processing error: {str(e)}")
         
     finally:
-        # Clean up temporary files
-        try:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    os.remove(os.path.join(root, file))
-                for dir in dirs:
-                    shutil.rmtree(os.path.join(root, dir), ignore_errors=True)
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            logger.info(f"Job {job_id}: Cleaned up temporary files")
-        except Exception as cleanup_error:
-            logger.warning(f"Job {job_id}: Error during cleanup: {str(cleanup_error)}")
-
-def apply_padding_to_video(video_path, padding_top=0, padding_bottom=0, padding_left=0, padding_right=0, padding_color="white", job_id=None):
-    """
-    Apply padding to a video.
-    
-    Args:
-        video_path: Path to the video file
-        padding_top: Top padding in pixels
-        padding_bottom: Bottom padding in pixels
-        padding_left: Left padding in pixels
-        padding_right: Right padding in pixels
-        padding_color: Color of the padding
-        job_id: Unique identifier for the job
-        
-    Returns:
-        Path to the padded video
-    """
-    logger.info(f"Job {job_id}: Applying padding to video: {video_path}")
-    logger.info(f"Job {job_id}: Padding values: Top={padding_top}, Bottom={padding_bottom}, Left={padding_left}, Right={padding_right}")
-    logger.info(f"Job {job_id}: Padding color: {padding_color}")
-    
-    # Create output path
-    output_path = f"/tmp/{uuid.uuid4()}_padded.mp4"
-    logger.info(f"Job {job_id}: Output path: {output_path}")
-    
-    # Get video dimensions
-    video_info = get_video_info(video_path)
-    width = int(video_info.get("width", 1280))
-    height = int(video_info.get("height", 720))
-    logger.info(f"Job {job_id}: Original video dimensions: {width}x{height}")
-    
-    # Calculate new dimensions
-    new_width = width + padding_left + padding_right
-    new_height = height + padding_top + padding_bottom
-    logger.info(f"Job {job_id}: New video dimensions: {new_width}x{new_height}")
-    
-    # Create FFmpeg command
-    ffmpeg_cmd = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-vf", f"pad={new_width}:{new_height}:{padding_left}:{padding_top}:color={padding_color}",
-        "-c:v", "libx264", "-crf", "18",
-        "-c:a", "copy",
-        output_path
-    ]
-    
-    # Execute FFmpeg command
-    logger.info(f"Job {job_id}: Executing FFmpeg command: {' '.join(ffmpeg_cmd)}")
-    try:
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
-        logger.info(f"Job {job_id}: FFmpeg command executed successfully")
-        logger.debug(f"Job {job_id}: FFmpeg stdout: {result.stdout}")
-        
-        # Check if output file exists
-        if os.path.exists(output_path):
-            logger.info(f"Job {job_id}: Padded video created successfully: {output_path}")
-            return output_path
-        else:
-            logger.error(f"Job {job_id}: Padded video was not created: {output_path}")
-            raise FileNotFoundError(f"Padded video was not created: {output_path}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Job {job_id}: Error executing FFmpeg command: {e}")
-        logger.error(f"Job {job_id}: FFmpeg stderr: {e.stderr}")
-        raise Exception(f"Error applying padding to video: {e.stderr}")
\ No newline at end of file
+        release_job(job_id)
+        remove_job_workspace(job_id)
@@ -1,8 +1,7 @@
 import os
 import subprocess
-from services.file_management import download_file
-
-STORAGE_PATH = "/tmp/"
+from services.file_management import download_file, job_workspace
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
 
 def get_duration(file_path):
     cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
@@ -10,9 +9,10 @@ def get_duration(file_path):
     return float(result.stdout)
 
 def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
-    video_path = download_file(video_url, STORAGE_PATH)
-    audio_path = download_file(audio_url, STORAGE_PATH)
-    output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
+    workspace = job_workspace(job_id)
+    video_path = download_file(video_url, workspace)
+    audio_path = download_file(audio_url, workspace)
+    output_path = os.path.join(workspace, f"{job_id}.mp4")
 
     video_duration = get_duration(video_path)
     audio_duration = get_duration(audio_path)
@@ -57,7 +57,7 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.append(output_path)
 
     # Run FFmpeg command
-    subprocess.run(cmd, check=True)
+    run_ffmpeg(cmd, operation="audio_mix", job_id=job_id)
 
     # Clean up input files
     os.remove(video_path)
@@ -0,0 +1,228 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from services.job_store import get_job_store
+
+logger = logging.getLogger(__name__)
+
+# Status code of cancelled jobs in job responses, webhooks and the job history
+CANCELLED_STATUS_CODE = 499
+
+# Job IDs chosen by callers; they name the job's workspace directory
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+# Seconds between checks for cancel requests made through other server workers
+CANCEL_POLL_INTERVAL = 1.0
+
+class JobCancelled(Exception):
+    """Raised inside a job when it notices that it was cancelled."""
+
+class CancellationToken:
+    """
+    Cancellation state of one job.
+
+    Services look the token up by job ID. Long waits use event (run_ffmpeg and
+    Pipeline take it as cancel_event), loops call raise_if_cancelled, and
+    remote work such as a Replicate prediction registers an on_cancel callback
+    that stops it at the provider.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.event = threading.Event()
+        self.reason = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self, reason="Job cancelled by user"):
+        """
+        Cancel the job and run its callbacks.
+
+        Returns:
+            False if the job was already cancelled
+        """
+        with self._lock:
+            if self.event.is_set():
+                return False
+            self.reason = reason
+            self.event.set()
+            callbacks = list(self._callbacks)
+        logger.info(f"Job {self.job_id}: Cancelling: {reason}")
+        for callback in callbacks:
+            self._run_callback(callback)
+        return True
+
+    def on_cancel(self, callback):
+        """
+        Call callback() when the job is cancelled, or right away if it already is.
+
+        Returns:
+            The callback, for remove_callback
+        """
+        with self._lock:
+            if not self.event.is_set():
+                self._callbacks.append(callback)
+                return callback
+        self._run_callback(callback)
+        return callback
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise JobCancelled(self.reason or "Job cancelled")
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds; returns True as soon as the job is cancelled."""
+        return self.event.wait(timeout)
+
+    def _run_callback(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Job {self.job_id}: Cancellation callback failed: {str(e)}")
+
+class CancellationRegistry:
+    """
+    Tokens of the jobs that are queued or running in this process.
+
+    A cancel request may reach any server worker. The worker that receives it
+    records it in the shared job store, and the worker running the job picks
+    it up within CANCEL_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, store=None):
+        self._store = store
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._poller_pid = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_job_store()
+        return self._store
+
+    def register(self, job_id):
+        """Get the token of a job, creating it if needed."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+            if token is None:
+                token = self._tokens[job_id] = CancellationToken(job_id)
+            self._start_poller()
+            return token
+
+    def _start_poller(self):
+        # One poller per process; a forked worker starts its own
+        if self._poller_pid == os.getpid():
+            return
+        self._poller_pid = os.getpid()
+        threading.Thread(target=self._poll, name="cancellation-poller", daemon=True).start()
+
+    def _poll(self):
+        while True:
+            time.sleep(CANCEL_POLL_INTERVAL)
+            with self._lock:
+                job_ids = [job_id for job_id, token in self._tokens.items() if not token.cancelled]
+            if not job_ids:
+                continue
+            try:
+                requests = self.store.cancel_requests(job_ids)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read cancel requests: {str(e)}")
+                continue
+            for job_id, reason in requests.items():
+                token = self.get(job_id)
+                if token is not None:
+                    token.cancel(reason or "Job cancelled by user")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._tokens.get(job_id)
+
+    def cancel(self, job_id, reason="Job cancelled by user"):
+        """
+        Cancel a job, whichever worker runs it.
+
+        Returns:
+            None if no worker runs the job, else whether this call cancelled it
+        """
+        token = self.get(job_id)
+        if token is not None:
+            return token.cancel(reason)
+        return self.store.request_cancel(job_id, reason)
+
+    def release(self, job_id):
+        """Forget a finished job."""
+        with self._lock:
+            self._tokens.pop(job_id, None)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_cancellation_registry():
+    """
+    Get the process-wide cancellation registry.
+
+    Returns:
+        CancellationRegistry instance
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CancellationRegistry()
+    return _registry
+
+def register_job(job_id):
+    """Register a queued or running job; returns its CancellationToken."""
+    return get_cancellation_registry().register(job_id)
+
+def claim_job_id(job_id):
+    """
+    Register a job under an ID chosen by the caller.
+
+    Args:
+        job_id: Requested job ID
+
+    Returns:
+        CancellationToken of the job
+
+    Raises:
+        ValueError: If the ID does not match JOB_ID_PATTERN or is already in use
+    """
+    if not isinstance(job_id, str) or not JOB_ID_PATTERN.match(job_id):
+        raise ValueError("job_id must be 8 to 128 letters, digits, '-' or '_'")
+    registry = get_cancellation_registry()
+    if registry.get(job_id) is not None or not registry.store.claim(job_id):
+        raise ValueError(f"job_id {job_id} is already in use")
+    return registry.register(job_id)
+
+def release_job(job_id):
+    get_cancellation_registry().release(job_id)
+
+def get_token(job_id):
+    """Token of a registered job, or None (also without a job ID)."""
+    if not job_id:
+        return None
+    return get_cancellation_registry().get(job_id)
+
+def cancel_event(job_id):
+    """threading.Event set when the job is cancelled, or None if it is not registered."""
+    token = get_token(job_id)
+    return token.event if token else None
+
+def raise_if_cancelled(job_id):
+    """Raise JobCancelled if the job was cancelled."""
+    token = get_token(job_id)
+    if token:
+        token.raise_if_cancelled()
@@ -3,10 +3,8 @@ import ffmpeg
 import logging
 import requests
 import subprocess
-from services.file_management import download_file
-
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
+from services.file_management import download_file, job_workspace
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg, FFmpegError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -88,13 +86,14 @@ def generate_style_line(options):
 
 def process_captioning(file_url, caption_srt, caption_type, options, job_id):
     """Process video captioning using FFmpeg."""
+    workspace = job_workspace(job_id)
     try:
         logger.info(f"Job {job_id}: Starting download of file from {file_url}")
-        video_path = download_file(file_url, STORAGE_PATH)
+        video_path = download_file(file_url, workspace)
         logger.info(f"Job {job_id}: File downloaded to {video_path}")
 
         subtitle_extension = '.' + caption_type
-        srt_path = os.path.join(STORAGE_PATH, f"{job_id}{subtitle_extension}")
+        srt_path = os.path.join(workspace, f"{job_id}{subtitle_extension}")
         options = convert_array_to_collection(options)
         caption_style = ""
 
@@ -132,7 +131,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                 srt_file.write(subtitle_content)
             logger.info(f"Job {job_id}: SRT file created at {srt_path}")
 
-        output_path = os.path.join(STORAGE_PATH, f"{job_id}_captioned.mp4")
+        output_path = os.path.join(workspace, f"{job_id}_captioned.mp4")
         logger.info(f"Job {job_id}: Output path set to {output_path}")
 
         # Ensure font_name is converted to the full font path
@@ -187,17 +186,17 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             logger.info(f"Job {job_id}: Running FFmpeg with filter: {subtitle_filter}")
 
             # Run FFmpeg to add subtitles to the video
-            ffmpeg.input(video_path).output(
+            run_ffmpeg(ffmpeg.input(video_path).output(
                 output_path,
                 vf=subtitle_filter,
                 acodec='copy'
-            ).run()
+            ).overwrite_output().compile(), operation="caption", job_id=job_id)
             logger.info(f"Job {job_id}: FFmpeg processing completed, output file at {output_path}")
             return {"file_url": output_path}
-        except ffmpeg.Error as e:
+        except FFmpegError as e:
             # Log the FFmpeg stderr output
             if e.stderr:
-                error_message = e.stderr.decode('utf8')
+                error_message = e.stderr
             else:
                 error_message = 'Unknown FFmpeg error'
             
@@ -4,20 +4,23 @@ from abc import ABC, abstractmethod
 from services.gcp_toolkit import upload_to_gcs
 from services.s3_toolkit import upload_to_s3
 from config import validate_env_vars
+from services import metrics
+from services.job_progress import byte_progress
+from services.cancellation import get_token
 
 logger = logging.getLogger(__name__)
 
 class CloudStorageProvider(ABC):
     @abstractmethod
-    def upload_file(self, file_path: str) -> str:
+    def upload_file(self, file_path: str, on_progress=None) -> str:
         pass
 
 class GCPStorageProvider(CloudStorageProvider):
     def __init__(self):
         self.bucket_name = os.getenv('GCP_BUCKET_NAME')
 
-    def upload_file(self, file_path: str) -> str:
-        return upload_to_gcs(file_path, self.bucket_name)
+    def upload_file(self, file_path: str, on_progress=None) -> str:
+        return upload_to_gcs(file_path, self.bucket_name, on_progress=on_progress)
 
 class S3CompatibleProvider(CloudStorageProvider):
     def __init__(self):
@@ -25,8 +28,8 @@ class S3CompatibleProvider(CloudStorageProvider):
         self.access_key = os.getenv('S3_ACCESS_KEY')
         self.secret_key = os.getenv('S3_SECRET_KEY')
 
-    def upload_file(self, file_path: str) -> str:
-        return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key)
+    def upload_file(self, file_path: str, on_progress=None) -> str:
+        return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key, on_progress=on_progress)
 
 def get_storage_provider() -> CloudStorageProvider:
     storage_path = os.getenv('STORAGE_PATH', 'GCP').upper()
@@ -43,45 +46,77 @@ def get_storage_provider() -> CloudStorageProvider:
         validate_env_vars('GCP')
         return GCPStorageProvider()
 
-def upload_file(file_path: str) -> str:
+def _provider_label(provider) -> str:
+    return "s3" if isinstance(provider, S3CompatibleProvider) else "gcp"
+
+def _observe_upload(provider, file_path: str, outcome: str):
+    label = _provider_label(provider)
+    metrics.UPLOADS.inc(provider=label, outcome=outcome)
+    if outcome == "ok" and os.path.exists(file_path):
+        metrics.BYTES_UPLOADED.inc(os.path.getsize(file_path), provider=label)
+
+def _upload_hook(job_id):
+    """on_progress callback publishing upload progress and aborting the upload if the job is cancelled."""
+    report = byte_progress(job_id, "upload")
+    cancellation = get_token(job_id)
+    if cancellation:
+        cancellation.raise_if_cancelled()
+    if report is None and cancellation is None:
+        return None
+
+    def hook(done, total):
+        if cancellation:
+            cancellation.raise_if_cancelled()
+        if report:
+            report(done, total)
+    return hook
+
+def upload_file(file_path: str, job_id: str = None) -> str:
     provider = get_storage_provider()
     try:
         logger.info(f"Uploading file to cloud storage: {file_path}")
-        url = provider.upload_file(file_path)
+        url = provider.upload_file(file_path, on_progress=_upload_hook(job_id))
         logger.info(f"File uploaded successfully: {url}")
+        _observe_upload(provider, file_path, "ok")
         return url
     except Exception as e:
         logger.error(f"Error uploading file to cloud storage: {e}")
+        _observe_upload(provider, file_path, "error")
         raise
 
-def upload_to_cloud_storage(file_path: str, destination_path: str = None) -> str:
+def upload_to_cloud_storage(file_path: str, destination_path: str = None, job_id: str = None) -> str:
     """
     Upload a file to cloud storage with a custom destination path.
     
     Args:
         file_path: Local path to the file to upload
         destination_path: Optional custom path in the cloud storage bucket
+        job_id: Optional job ID to publish upload progress under; the upload is
+                aborted with JobCancelled if the job is cancelled
         
     Returns:
         URL to the uploaded file
     """
     provider = get_storage_provider()
     try:
+        on_progress = _upload_hook(job_id)
         logger.info(f"Uploading file to cloud storage: {file_path} -> {destination_path}")
         
         if isinstance(provider, GCPStorageProvider):
             from services.gcp_toolkit import upload_to_gcs_with_path
-            url = upload_to_gcs_with_path(file_path, provider.bucket_name, destination_path)
+            url = upload_to_gcs_with_path(file_path, provider.bucket_name, destination_path, on_progress=on_progress)
         elif isinstance(provider, S3CompatibleProvider):
             from services.s3_toolkit import upload_to_s3_with_path
             url = upload_to_s3_with_path(file_path, provider.endpoint_url, provider.access_key, 
-                                        provider.secret_key, destination_path)
+                                        provider.secret_key, destination_path, on_progress=on_progress)
         else:
             # Fallback to regular upload if custom path not supported
-            url = provider.upload_file(file_path)
+            url = provider.upload_file(file_path, on_progress=on_progress)
             
         logger.info(f"File uploaded successfully: {url}")
+        _observe_upload(provider, file_path, "ok")
         return url
     except Exception as e:
         logger.error(f"Error uploading file to cloud storage: {e}")
+        _observe_upload(provider, file_path, "error")
         raise
\ No newline at end of file
@@ -2,8 +2,12 @@ import uuid
 import requests
 import os
 import time
+import shutil
 import logging
 from urllib.parse import urlparse, parse_qs
+from services import metrics
+from services.job_progress import byte_progress
+from services.cancellation import JobCancelled, get_token
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -11,7 +15,50 @@ logger = logging.getLogger(__name__)
 # Default storage path
 STORAGE_PATH = "/tmp"
 
-def download_file(url, target_path):
+# Parent of the per-job workspace directories; only job workspaces live here
+JOB_WORKSPACE_ROOT = os.environ.get("JOB_WORKSPACE_ROOT", os.path.join(STORAGE_PATH, "nca_jobs"))
+
+def _workspace_path(job_id):
+    job_id = str(job_id or "")
+    if not job_id or job_id in (".", "..") or os.path.basename(job_id) != job_id:
+        raise ValueError(f"Invalid job ID for a workspace: {job_id!r}")
+    return os.path.join(JOB_WORKSPACE_ROOT, job_id)
+
+def job_workspace(job_id):
+    """
+    Get the directory for the working files of a job, creating it if needed.
+
+    Everything a job downloads or renders goes here, so that removing the
+    directory removes all of the job's files and nothing else.
+
+    Args:
+        job_id: Job ID (generated, or validated with cancellation.claim_job_id)
+
+    Returns:
+        Path to the directory
+    """
+    path = _workspace_path(job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def remove_job_workspace(job_id):
+    """
+    Remove the workspace directory of a job.
+
+    Returns:
+        True if a workspace was removed
+    """
+    try:
+        path = _workspace_path(job_id)
+    except ValueError:
+        return False
+    if not os.path.isdir(path):
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    logger.info(f"Job {job_id}: Removed workspace {path}")
+    return True
+
+def download_file(url, target_path, job_id=None):
     """
     Download a file from a URL to a specific target path.
     
@@ -19,6 +66,8 @@ def download_file(url, target_path):
         url: The URL to download from
         target_path: The full path where the file should be saved or a directory
                     where the file should be saved with its original name
+        job_id: Optional job ID to publish download progress under; the download
+                stops with JobCancelled if the job is cancelled
     
     Returns:
         The path to the downloaded file
@@ -51,33 +100,52 @@ def download_file(url, target_path):
         os.makedirs(target_dir, exist_ok=True)
     
     # Download the file
+    cancellation = get_token(job_id)
     try:
+        if cancellation:
+            cancellation.raise_if_cancelled()
         logger.info(f"Starting download from {url}")
         response = requests.get(url, stream=True)
         response.raise_for_status()
         
         file_size = int(response.headers.get('content-length', 0))
         logger.info(f"File size: {file_size} bytes")
+        report_progress = byte_progress(job_id, "download", file_size)
         
         with open(full_path, 'wb') as f:
             downloaded = 0
             for chunk in response.iter_content(chunk_size=8192):
+                if cancellation:
+                    cancellation.raise_if_cancelled()
                 f.write(chunk)
                 downloaded += len(chunk)
+                metrics.BYTES_DOWNLOADED.inc(len(chunk))
+                if report_progress:
+                    report_progress(downloaded)
                 
                 # Log progress for large files
                 if file_size > 1000000 and downloaded % 10000000 == 0:  # Log every 10MB for files > 1MB
                     logger.info(f"Downloaded {downloaded/1000000:.1f}MB of {file_size/1000000:.1f}MB ({downloaded*100/file_size:.1f}%)")
         
         logger.info(f"Download completed: {full_path}")
+        if report_progress:
+            report_progress(downloaded, downloaded)
+        metrics.DOWNLOADS.inc(outcome="ok")
         return full_path
+    except JobCancelled:
+        logger.info(f"Job {job_id}: Download cancelled: {url}")
+        metrics.DOWNLOADS.inc(outcome="cancelled")
+        if os.path.exists(full_path):
+            os.remove(full_path)
+        raise
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}")
+        metrics.DOWNLOADS.inc(outcome="error")
         raise
 
 def delete_old_files():
     """
-    Delete files older than 1 hour from the storage directory
+    Delete files and job workspaces older than 1 hour from the storage directory
     """
     logger.info("Checking for old files to delete")
     now = time.time()
@@ -91,6 +159,14 @@ def delete_old_files():
                 os.remove(file_path)
                 deleted_count += 1
         
+        if os.path.isdir(JOB_WORKSPACE_ROOT):
+            for job_id in os.listdir(JOB_WORKSPACE_ROOT):
+                workspace = os.path.join(JOB_WORKSPACE_ROOT, job_id)
+                if os.path.isdir(workspace) and os.stat(workspace).st_mtime < now - 3600:
+                    logger.info(f"Deleting old job workspace: {workspace}")
+                    shutil.rmtree(workspace, ignore_errors=True)
+                    deleted_count += 1
+        
         logger.info(f"Deleted {deleted_count} old files")
     except Exception as e:
         logger.error(f"Error deleting old files: {str(e)}")
@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import mimetypes
 from google.oauth2 import service_account
 from google.cloud import storage
 from datetime import datetime, timedelta
@@ -146,13 +147,25 @@ validate_gcp_environment()
 # Initialize the GCS client
 gcs_client = initialize_gcp_client()
 
-def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
+def _upload_blob(blob, file_path, on_progress=None):
+    """Upload a file to a blob, reporting (bytes_sent, total_bytes) to on_progress as it is read."""
+    if on_progress is None:
+        blob.upload_from_filename(file_path)
+        return
+    from services.job_progress import ProgressReader
+    content_type = mimetypes.guess_type(file_path)[0]
+    with open(file_path, 'rb') as f:
+        reader = ProgressReader(f, on_progress)
+        blob.upload_from_file(reader, size=reader.total, content_type=content_type)
+
+def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME, on_progress=None):
     """
     Upload a file to Google Cloud Storage.
     
     Args:
         file_path: Local path to the file to upload
         bucket_name: GCS bucket name
+        on_progress: Optional function called with (bytes_sent, total_bytes)
         
     Returns:
         Public URL to the uploaded file
@@ -172,7 +185,7 @@ def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
         bucket = gcs_client.bucket(bucket_name)
         blob_name = os.path.basename(file_path)
         blob = bucket.blob(blob_name)
-        blob.upload_from_filename(file_path)
+        _upload_blob(blob, file_path, on_progress)
         
         # Return the public URL since the bucket is public
         logger.info(f"File uploaded successfully to GCS: {blob.public_url}")
@@ -181,7 +194,7 @@ def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
         logger.error(f"Failed to upload file to GCS: {e}")
         raise
 
-def upload_to_gcs_with_path(file_path, bucket_name=GCP_BUCKET_NAME, destination_path=None):
+def upload_to_gcs_with_path(file_path, bucket_name=GCP_BUCKET_NAME, destination_path=None, on_progress=None):
     """
     Upload a file to Google Cloud Storage with a custom destination path.
     
@@ -189,6 +202,7 @@ def upload_to_gcs_with_path(file_path, bucket_name=GCP_BUCKET_NAME, destination_
         file_path: Local path to the file to upload
         bucket_name: GCS bucket name
         destination_path: Custom path in the bucket (e.g., 'thumbnails/image.jpg')
+        on_progress: Optional function called with (bytes_sent, total_bytes)
         
     Returns:
         Public URL to the uploaded file
@@ -204,7 +218,7 @@ def upload_to_gcs_with_path(file_path, bucket_name=GCP_BUCKET_NAME, destination_
         blob_path = destination_path if destination_path else os.path.basename(file_path)
         blob = bucket.blob(blob_path)
         
-        blob.upload_from_filename(file_path)
+        _upload_blob(blob, file_path, on_progress)
         
         # Return the public URL since the bucket is public
         logger.info(f"File uploaded successfully to GCS: {blob.public_url}")
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# SQLite file holding one row per finished job; DATA_DIR must be on persistent storage
+JOB_HISTORY_DB = os.environ.get("JOB_HISTORY_DB", os.path.join(DATA_DIR, "job_history.sqlite3"))
+
+PERCENTILES = (50, 95, 99)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT,
+    endpoint TEXT,
+    status_code INTEGER,
+    queued INTEGER,
+    queue_id TEXT,
+    pid INTEGER,
+    finished_at REAL,
+    queue_time REAL,
+    run_time REAL,
+    total_time REAL,
+    input_bytes INTEGER,
+    output_bytes INTEGER,
+    request_bytes INTEGER,
+    response_bytes INTEGER,
+    stages TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+CREATE INDEX IF NOT EXISTS jobs_endpoint_finished_at ON jobs (endpoint, finished_at);
+"""
+
+COLUMNS = (
+    "job_id", "endpoint", "status_code", "queued", "queue_id", "pid", "finished_at",
+    "queue_time", "run_time", "total_time", "input_bytes", "output_bytes",
+    "request_bytes", "response_bytes", "stages", "error"
+)
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+def payload_size(payload):
+    """Size in bytes of a JSON payload, or None if it is not serializable."""
+    try:
+        return len(json.dumps(payload, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return None
+
+class JobHistory:
+    """
+    Append-only record of finished jobs for latency and throughput analytics.
+
+    Unlike the in-memory job status of the queue processor, rows are never
+    pruned, so percentiles can be compared across days for capacity planning.
+    """
+
+    def __init__(self, path=JOB_HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def record(self, job_id, endpoint, status_code, run_time, queue_time=0.0, total_time=None, queued=False,
+               queue_id=None, pid=None, input_bytes=None, output_bytes=None, request_bytes=None,
+               response_bytes=None, stages=None, error=None):
+        """
+        Append a finished job.
+
+        Recording never fails the job: errors are logged and the row is dropped.
+
+        Args:
+            job_id: Job ID
+            endpoint: Endpoint path of the job
+            status_code: HTTP-style status code of the result
+            run_time: Processing time in seconds
+            queue_time: Time spent waiting in the queue in seconds
+            total_time: Queue time plus run time; computed if not given
+            queued: Whether the job went through the queue
+            queue_id: ID of the worker queue
+            pid: Process ID of the worker
+            input_bytes: Size of the input media, where the route knows it
+            output_bytes: Size of the output media, where the route knows it
+            request_bytes: Size of the JSON request payload
+            response_bytes: Size of the JSON response payload
+            stages: Optional list of per-stage reports (see services.v1.video.pipeline)
+            error: Error message of failed jobs
+        """
+        if total_time is None:
+            total_time = (queue_time or 0.0) + (run_time or 0.0)
+        row = (
+            job_id, endpoint, status_code, int(bool(queued)), str(queue_id) if queue_id is not None else None, pid,
+            time.time(), queue_time, run_time, total_time, input_bytes, output_bytes,
+            request_bytes, response_bytes, json.dumps(stages) if stages else None, error
+        )
+        try:
+            with self._lock:
+                self._conn.execute(
+                    f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})", row
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Job {job_id}: Could not record job history: {str(e)}")
+
+    def jobs(self, since, endpoint=None, limit=None):
+        """
+        List recorded jobs, newest first.
+
+        Args:
+            since: Only jobs finished after this Unix time
+            endpoint: Optional endpoint filter
+            limit: Optional maximum number of rows
+
+        Returns:
+            List of dictionaries
+        """
+        query = f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE finished_at >= ?"
+        params = [since]
+        if endpoint:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        query += " ORDER BY finished_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(zip(COLUMNS, row))
+            job["stages"] = json.loads(job["stages"]) if job["stages"] else None
+            jobs.append(job)
+        return jobs
+
+    def stats(self, window=3600, endpoint=None, bucket=None):
+        """
+        Latency percentiles and throughput per endpoint.
+
+        Args:
+            window: Look-back window in seconds
+            endpoint: Optional endpoint filter
+            bucket: Optional bucket width in seconds to also return a time series
+
+        Returns:
+            Dictionary with the window and per-endpoint statistics
+        """
+        now = time.time()
+        since = now - window
+        query = "SELECT endpoint, finished_at, status_code, queue_time, run_time, total_time, stages FROM jobs WHERE finished_at >= ?"
+        params = [since]
+        if endpoint:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(row)
+
+        endpoints = {}
+        for name, jobs in grouped.items():
+            summary = summarize(jobs, window)
+            if bucket:
+                buckets = {}
+                for job in jobs:
+                    start = since + ((job[1] - since) // bucket) * bucket
+                    buckets.setdefault(start, []).append(job)
+                summary["series"] = [
+                    dict(summarize(buckets[start], bucket), start=round(start, 3))
+                    for start in sorted(buckets)
+                ]
+            endpoints[name] = summary
+
+        return {"window": window, "since": round(since, 3), "until": round(now, 3), "endpoints": endpoints}
+
+def summarize(jobs, window):
+    """Percentiles and throughput of (endpoint, finished_at, status_code, queue_time, run_time, total_time, stages) rows."""
+    summary = {
+        "count": len(jobs),
+        "errors": sum(1 for job in jobs if job[2] is not None and job[2] >= 400),
+        "throughput_per_minute": round(len(jobs) * 60.0 / window, 3) if window else None
+    }
+    for index, name in ((3, "queue_time"), (4, "run_time"), (5, "total_time")):
+        values = sorted(job[index] for job in jobs if job[index] is not None)
+        summary[name] = {f"p{p}": round(percentile(values, p), 3) if values else None for p in PERCENTILES}
+
+    stage_times = {}
+    for job in jobs:
+        for stage in json.loads(job[6]) if job[6] else ():
+            if stage.get("duration") is not None:
+                stage_times.setdefault(stage["name"], []).append(stage["duration"])
+    if stage_times:
+        summary["stages"] = {
+            name: {f"p{p}": round(percentile(sorted(values), p), 3) for p in PERCENTILES}
+            for name, values in stage_times.items()
+        }
+    return summary
+
+_job_history = None
+_job_history_lock = threading.Lock()
+
+def get_job_history():
+    """
+    Get the process-wide job history store.
+
+    Returns:
+        JobHistory instance
+    """
+    global _job_history
+    with _job_history_lock:
+        if _job_history is None:
+            _job_history = JobHistory()
+    return _job_history
+
+def record_job(**fields):
+    """Append a finished job to the process-wide history; see JobHistory.record."""
+    try:
+        get_job_history().record(**fields)
+    except Exception as e:
+        logger.warning(f"Job {fields.get('job_id')}: Could not record job history: {str(e)}")
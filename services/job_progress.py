@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from services.webhook import send_webhook
+from services.job_store import get_job_store
+
+logger = logging.getLogger(__name__)
+
+# Events kept per job; a subscriber that falls further behind skips the oldest ones
+PROGRESS_HISTORY = 200
+
+# Seconds between polls of the shared store by a stream
+STREAM_POLL_INTERVAL = 0.5
+
+# Seconds between removals of expired streams from the shared store
+PRUNE_INTERVAL = 300
+
+# Minimum seconds between two running progress events of the same job stage
+MIN_EVENT_INTERVAL = 0.5
+
+# Seconds a finished job's events stay available, and an abandoned one's are kept
+FINISHED_TTL = 3600
+IDLE_TTL = 24 * 3600
+
+# Comment lines sent to idle streams so proxies do not close them
+KEEPALIVE_INTERVAL = 15
+
+# Default maximum number of progress webhooks per job and minute
+PROGRESS_WEBHOOK_PER_MINUTE = int(os.environ.get("PROGRESS_WEBHOOK_PER_MINUTE", "6"))
+
+# Event types
+STATUS = "status"
+PROGRESS = "progress"
+DONE = "done"
+
+def format_sse(event):
+    """Format an event for a text/event-stream response."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+class ProgressReader:
+    """File wrapper reporting how much of a file has been read, for upload progress."""
+
+    def __init__(self, fileobj, callback, total=None):
+        self._fileobj = fileobj
+        self._callback = callback
+        self.total = total if total is not None else os.fstat(fileobj.fileno()).st_size
+        self.done = 0
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        if data:
+            self.done += len(data)
+            self._callback(self.done, self.total)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+class ProgressChannel:
+    """
+    Publisher side of one job's progress: throttling, webhooks and the shared event store.
+
+    The channel lives in the worker running the job; subscribers in any worker
+    read the events back from the job store.
+    """
+
+    def __init__(self, job_id, store):
+        self.job_id = job_id
+        self.closed = False
+        self.updated_at = time.time()
+        self.webhook_url = None
+        self.webhook_per_minute = PROGRESS_WEBHOOK_PER_MINUTE
+        self._store = store
+        self._published = 0
+        self._last_by_stage = {}
+        self._webhook_times = deque()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data, throttle=False):
+        """
+        Store an event for subscribers.
+
+        Args:
+            event_type: STATUS, PROGRESS or DONE
+            data: Event payload
+            throttle: Drop the event if the same stage published less than MIN_EVENT_INTERVAL ago
+
+        Returns:
+            The event, or None if it was dropped
+        """
+        now = time.time()
+        with self._lock:
+            if self.closed:
+                return None
+            stage = data.get("stage")
+            if throttle and now - self._last_by_stage.get(stage, 0) < MIN_EVENT_INTERVAL:
+                return None
+            self._last_by_stage[stage] = now
+            data = dict(data, job_id=self.job_id, time=round(now, 3))
+            self._published += 1
+            # Trim the stored history now and then rather than on every event
+            keep = PROGRESS_HISTORY if self._published % 50 == 0 else None
+            try:
+                event_id = self._store.append_event(self.job_id, event_type, data, closes=event_type == DONE, keep=keep)
+            except sqlite3.Error as e:
+                logger.warning(f"Job {self.job_id}: Could not store progress event: {str(e)}")
+                event_id = None
+            event = {"id": event_id, "event": event_type, "data": data}
+            self.updated_at = now
+            if event_type == DONE:
+                self.closed = True
+            webhook_url = self._take_webhook_slot(now, force=event_type == DONE)
+        if webhook_url:
+            threading.Thread(target=send_webhook, args=(webhook_url, event["data"]), daemon=True).start()
+        return event
+
+    def _take_webhook_slot(self, now, force=False):
+        # Sliding one-minute window; the final event is always delivered
+        if not self.webhook_url:
+            return None
+        while self._webhook_times and now - self._webhook_times[0] >= 60:
+            self._webhook_times.popleft()
+        if not force and len(self._webhook_times) >= self.webhook_per_minute:
+            return None
+        self._webhook_times.append(now)
+        return self.webhook_url
+
+class JobProgress:
+    """
+    Per-job progress channels.
+
+    Services publish download, ffmpeg, transcription and upload progress under
+    the job ID; clients follow it as Server-Sent Events from any server worker
+    and, optionally, as webhooks limited to a number per minute. Events are
+    kept in the shared job store, so a stream can be served by a worker other
+    than the one running the job.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_job_store()
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def channel(self, job_id):
+        """Get the publishing channel of a job run by this worker, creating it if needed."""
+        now = time.time()
+        with self._lock:
+            for key, channel in list(self._channels.items()):
+                ttl = FINISHED_TTL if channel.closed else IDLE_TTL
+                if now - channel.updated_at > ttl:
+                    del self._channels[key]
+            prune = now - self._last_prune > PRUNE_INTERVAL
+            if prune:
+                self._last_prune = now
+            channel = self._channels.get(job_id)
+            if channel is None:
+                channel = self._channels[job_id] = ProgressChannel(job_id, self.store)
+        if prune:
+            try:
+                self.store.prune(FINISHED_TTL, IDLE_TTL)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not prune job streams: {str(e)}")
+        return channel
+
+    def find(self, job_id):
+        """
+        Look a job up in the shared store without creating it.
+
+        Returns:
+            ChannelState with closed and updated_at, or None if no worker has published for the job
+        """
+        return self.store.channel_state(job_id)
+
+    def publish(self, job_id, stage, **fields):
+        """
+        Publish progress of a job stage.
+
+        Events with state "running" (the default) are throttled per stage;
+        state changes such as "start" and "end" are always published.
+
+        Args:
+            job_id: Job ID
+            stage: Stage or operation name, e.g. download, render, transcribe, upload
+            **fields: Progress fields such as percent, bytes, total_bytes, out_time, total, chunk, chunks
+        """
+        fields.setdefault("state", "running")
+        self.channel(job_id).publish(PROGRESS, dict(fields, stage=stage), throttle=fields["state"] == "running")
+
+    def status(self, job_id, status, **fields):
+        """Publish a job lifecycle change such as queued or started."""
+        self.channel(job_id).publish(STATUS, dict(fields, status=status))
+
+    def finish(self, job_id, status, **fields):
+        """Publish the final event of a job and close its stream."""
+        self.channel(job_id).publish(DONE, dict(fields, status=status))
+
+    def set_webhook(self, job_id, webhook_url, per_minute=None):
+        """
+        Post progress events of a job to a webhook.
+
+        Args:
+            job_id: Job ID
+            webhook_url: URL receiving each event payload
+            per_minute: Maximum number of webhooks per minute; PROGRESS_WEBHOOK_PER_MINUTE if None
+        """
+        channel = self.channel(job_id)
+        with channel._lock:
+            channel.webhook_url = webhook_url
+            channel.webhook_per_minute = per_minute or PROGRESS_WEBHOOK_PER_MINUTE
+
+    def stream(self, job_id, last_event_id=0):
+        """
+        Generate a text/event-stream of a job until its final event.
+
+        The shared store is polled every STREAM_POLL_INTERVAL seconds. Callers
+        check find() first; the stream ends if the job's events expire.
+
+        Args:
+            job_id: Job ID
+            last_event_id: ID of the last event the client received (Last-Event-ID header)
+
+        Yields:
+            Server-Sent Events chunks
+        """
+        yield "retry: 3000\n\n"
+        last_sent = time.time()
+        while True:
+            events = self.store.events(job_id, last_event_id, limit=PROGRESS_HISTORY)
+            for event in events:
+                last_event_id = event["id"]
+                yield format_sse(event)
+                if event["event"] == DONE:
+                    return
+            now = time.time()
+            if events:
+                last_sent = now
+            elif now - last_sent >= KEEPALIVE_INTERVAL:
+                if self.store.channel_state(job_id) is None:
+                    return
+                last_sent = now
+                yield ": keepalive\n\n"
+            time.sleep(STREAM_POLL_INTERVAL)
+
+_job_progress = None
+_job_progress_lock = threading.Lock()
+
+def get_job_progress():
+    """
+    Get the progress channels of this process.
+
+    Returns:
+        JobProgress instance
+    """
+    global _job_progress
+    with _job_progress_lock:
+        if _job_progress is None:
+            _job_progress = JobProgress()
+    return _job_progress
+
+def publish(job_id, stage, **fields):
+    """Publish progress of a job stage; a no-op without a job ID. See JobProgress.publish."""
+    if not job_id:
+        return
+    try:
+        get_job_progress().publish(job_id, stage, **fields)
+    except Exception as e:
+        logger.warning(f"Job {job_id}: Could not publish progress: {str(e)}")
+
+def byte_progress(job_id, stage, total=None):
+    """
+    Callback publishing transfer progress of a download or upload.
+
+    Args:
+        job_id: Job ID; without one no callback is returned
+        stage: Stage name, e.g. download or upload
+        total: Expected number of bytes if known up front
+
+    Returns:
+        Function called with (bytes_done, total_bytes), or None. The event
+        reaching the total is published as the end of the stage.
+    """
+    if not job_id:
+        return None
+
+    def report(done, total_bytes=None):
+        total_bytes = total_bytes or total
+        fields = {"bytes": done}
+        if total_bytes:
+            fields["total_bytes"] = total_bytes
+            fields["percent"] = round(min(done / total_bytes, 1.0) * 100, 1)
+            if done >= total_bytes:
+                fields["state"] = "end"
+        publish(job_id, stage, **fields)
+    return report
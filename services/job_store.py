@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by all server workers, holding the progress events and cancellation requests of running and recent jobs
+JOB_STORE_DB = os.environ.get("JOB_STORE_DB", os.path.join(DATA_DIR, "job_store.sqlite3"))
+
+# Seconds a worker waits for another worker's write lock before failing
+BUSY_TIMEOUT = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_channels (
+    job_id TEXT PRIMARY KEY,
+    closed INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job_id ON job_events (job_id, id);
+CREATE TABLE IF NOT EXISTS job_cancellations (
+    job_id TEXT PRIMARY KEY,
+    reason TEXT,
+    requested_at REAL NOT NULL
+);
+"""
+
+# Maximum number of job IDs per SQLite query parameter list
+QUERY_BATCH_SIZE = 500
+
+ChannelState = namedtuple("ChannelState", ("job_id", "closed", "updated_at"))
+
+class JobStore:
+    """
+    Job state that every server worker can read.
+
+    A job runs in the worker that received it, but its progress stream and
+    its cancellation may be requested from any worker, so events and cancel
+    requests are written here instead of being kept in process memory. Event
+    IDs are the row IDs, increasing across jobs.
+    """
+
+    def __init__(self, path=JOB_STORE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def claim(self, job_id):
+        """
+        Make a job known to all workers unless its ID is already in use.
+
+        Returns:
+            True if the ID was free
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO job_channels (job_id, closed, updated_at) VALUES (?, 0, ?)",
+                (job_id, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def append_event(self, job_id, event_type, data, closes=False, keep=None):
+        """
+        Append an event to a job's stream.
+
+        Args:
+            job_id: Job ID
+            event_type: Event type
+            data: JSON-serializable payload
+            closes: Whether this is the final event of the job
+            keep: Optional number of newest events of the job to keep; older ones are dropped
+
+        Returns:
+            The event ID
+        """
+        payload = json.dumps(data, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                event_id = self._conn.execute(
+                    "INSERT INTO job_events (job_id, event, data) VALUES (?, ?, ?)", (job_id, event_type, payload)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO job_channels (job_id, closed, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (job_id) DO UPDATE SET closed = MAX(closed, excluded.closed), updated_at = excluded.updated_at",
+                    (job_id, int(closes), now)
+                )
+                if keep:
+                    self._conn.execute(
+                        "DELETE FROM job_events WHERE job_id = ? AND id < "
+                        "(SELECT id FROM job_events WHERE job_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (job_id, job_id, keep - 1)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return event_id
+
+    def channel_state(self, job_id):
+        """
+        Get whether a job is known and finished.
+
+        Returns:
+            ChannelState, or None if no worker has published for the job
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, closed, updated_at FROM job_channels WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return ChannelState(row[0], bool(row[1]), row[2])
+
+    def events(self, job_id, after_id=0, limit=None):
+        """
+        List the events of a job newer than after_id, oldest first.
+
+        Args:
+            job_id: Job ID
+            after_id: ID of the last event the caller has seen
+            limit: Optional maximum number of events; the newest ones are returned
+
+        Returns:
+            List of {"id", "event", "data"} dictionaries
+        """
+        query = "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id DESC"
+        params = [job_id, after_id]
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"id": row[0], "event": row[1], "data": json.loads(row[2])} for row in reversed(rows)]
+
+    def request_cancel(self, job_id, reason):
+        """
+        Ask the worker running a job to cancel it.
+
+        Returns:
+            None if the job is unknown or finished, else whether this call made the request
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT closed FROM job_channels WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None or row[0]:
+                    requested = None
+                else:
+                    requested = self._conn.execute(
+                        "INSERT OR IGNORE INTO job_cancellations (job_id, reason, requested_at) VALUES (?, ?, ?)",
+                        (job_id, reason, time.time())
+                    ).rowcount == 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return requested
+
+    def cancel_requests(self, job_ids):
+        """
+        Get the pending cancel requests among the given jobs.
+
+        Returns:
+            Dictionary {job_id: reason}
+        """
+        job_ids = list(job_ids)
+        requests = {}
+        for start in range(0, len(job_ids), QUERY_BATCH_SIZE):
+            batch = job_ids[start:start + QUERY_BATCH_SIZE]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT job_id, reason FROM job_cancellations WHERE job_id IN ({', '.join('?' for _ in batch)})",
+                    batch
+                ).fetchall()
+            requests.update(rows)
+        return requests
+
+    def prune(self, finished_ttl, idle_ttl):
+        """
+        Remove finished jobs after finished_ttl seconds and abandoned ones after idle_ttl seconds.
+
+        Returns:
+            Number of removed jobs
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in self._conn.execute(
+                    "SELECT job_id FROM job_channels WHERE (closed = 1 AND updated_at < ?) OR updated_at < ?",
+                    (now - finished_ttl, now - idle_ttl)
+                )]
+                for job_id in expired:
+                    self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                    self._conn.execute("DELETE FROM job_cancellations WHERE job_id = ?", (job_id,))
+                    self._conn.execute("DELETE FROM job_channels WHERE job_id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if expired:
+            logger.info(f"Removed {len(expired)} expired job stream(s)")
+        return len(expired)
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def get_job_store():
+    """
+    Get the job store of this process.
+
+    Returns:
+        JobStore instance
+    """
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+    return _job_store
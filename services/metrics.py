@@ -0,0 +1,426 @@
+import os
+import json
+import time
+import atexit
+import functools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# With several server workers, each worker writes its metrics to this directory
+# and a scrape of any worker reports the sum over all of them. The directory
+# must be emptied before the server starts.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Seconds between metric snapshots of a worker in multiprocess mode
+MULTIPROC_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+
+# Histogram buckets in seconds, from sub-second API calls to hour-long renders
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Whisper real-time factor buckets (processing time / media duration)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base class of labelled metrics in the Prometheus text exposition format."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def snapshot(self):
+        """Values of this process as a JSON-serializable list of [label values, value]."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def _combine(self, current, value):
+        return (current or 0) + value
+
+    def _merged(self, others):
+        """Values of this process summed with the snapshots of other workers."""
+        with self._lock:
+            values = dict(self._values)
+        for _, snapshot in others:
+            for key, value in snapshot.get(self.name, ()):
+                key = tuple(key)
+                values[key] = self._combine(values.get(key), value)
+        return sorted(values.items())
+
+    def expose(self, others=()):
+        items = self._merged(others)
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Gauge set directly or, with a callback, read at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self):
+        if self.callback is not None:
+            try:
+                for labels, value in self.callback():
+                    self.set(value, **labels)
+            except Exception as e:
+                logger.warning(f"Could not collect metric {self.name}: {str(e)}")
+
+    def snapshot(self):
+        self.collect()
+        return super().snapshot()
+
+    def expose(self, others=None):
+        """
+        Render the gauge. With worker snapshots (multiprocess mode) gauge values
+        are not summed but reported per worker with a pid label.
+        """
+        self.collect()
+        if others is None:
+            return super().expose()
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key, [('pid', os.getpid())])} {_format_value(value)}")
+        for (pid, started), snapshot in others:
+            if not _worker_alive(pid, started):
+                continue
+            for key, value in sorted(snapshot.get(self.name, ())):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key, [('pid', pid)])} {_format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def _combine(self, current, value):
+        counts, total = value
+        if current is None:
+            return list(counts), total
+        return [a + b for a, b in zip(current[0], counts)], current[1] + total
+
+    def _merged(self, others):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for _, snapshot in others:
+            for key, value in snapshot.get(self.name, ()):
+                key = tuple(key)
+                values[key] = self._combine(values.get(key), value)
+        return sorted(values.items())
+
+    def expose(self, others=()):
+        items = self._merged(others)
+        lines = self.header()
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+def _process_start(pid):
+    """Start time of a process in clock ticks since boot, from /proc; None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _worker_alive(pid, started):
+    """
+    Whether the worker that wrote a snapshot still runs. The start time in the
+    snapshot name must match the live process, so a reused pid does not count.
+    """
+    if started.isdigit():
+        return _process_start(pid) == int(started)
+    # Without /proc the name carries the first snapshot time; only the pid can be checked
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+class Registry:
+    """
+    Metrics of this process, optionally merged with those of sibling workers.
+
+    In multiprocess mode every worker periodically writes a snapshot file named
+    after its pid and start time. Counters and histograms are summed over all
+    snapshot files, including those of exited workers so totals never go
+    backwards; gauges are reported per live worker with a pid label.
+    """
+
+    def __init__(self, multiproc_dir=None):
+        self.multiproc_dir = multiproc_dir
+        self._metrics = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._snapshot_name = None
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def _snapshot_path(self):
+        # Named after the process start so that a reused pid does not overwrite a dead worker's totals
+        if self._snapshot_name is None or not self._snapshot_name.startswith(f"{os.getpid()}_"):
+            started = _process_start(os.getpid())
+            started = str(started) if started is not None else f"t{int(time.time() * 1000)}"
+            self._snapshot_name = f"{os.getpid()}_{started}.json"
+        return os.path.join(self.multiproc_dir, self._snapshot_name)
+
+    def write_snapshot(self):
+        """Write the metrics of this process for the other workers to read."""
+        if not self.multiproc_dir:
+            return
+        with self._lock:
+            metrics = list(self._metrics)
+        path = self._snapshot_path()
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({metric.name: metric.snapshot() for metric in metrics}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {path}: {str(e)}")
+
+    def read_snapshots(self):
+        """Snapshots of the other workers as a list of ((pid, start time), {metric name: values})."""
+        own = os.path.basename(self._snapshot_path())
+        snapshots = []
+        try:
+            names = os.listdir(self.multiproc_dir)
+        except OSError as e:
+            logger.warning(f"Could not list metrics directory {self.multiproc_dir}: {str(e)}")
+            return snapshots
+        for name in names:
+            if not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, name), "r") as f:
+                    pid, started = name[:-len(".json")].split("_", 1)
+                    snapshots.append(((int(pid), started), json.load(f)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read metrics snapshot {name}: {str(e)}")
+        return snapshots
+
+    def start_flusher(self, interval=MULTIPROC_FLUSH_INTERVAL):
+        """Start writing snapshots of this process in the background (multiprocess mode only)."""
+        if not self.multiproc_dir or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        self.write_snapshot()
+        atexit.register(self.write_snapshot)
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                self.write_snapshot()
+
+        threading.Thread(target=flush, name="metrics-flusher", daemon=True).start()
+
+    def expose(self):
+        """Render all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        others = self.read_snapshots() if self.multiproc_dir else None
+        lines = []
+        for metric in metrics:
+            if others is None:
+                lines.extend(metric.expose())
+            else:
+                lines.extend(metric.expose(others))
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry(MULTIPROC_DIR)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+JOBS = REGISTRY.register(Counter(
+    "nca_jobs_total", "Finished jobs by endpoint and status code", ("endpoint", "code")))
+JOB_DURATION = REGISTRY.register(Histogram(
+    "nca_job_duration_seconds", "Job run time by endpoint", ("endpoint",)))
+JOB_QUEUE_TIME = REGISTRY.register(Histogram(
+    "nca_job_queue_seconds", "Time jobs waited in the queue by endpoint", ("endpoint",)))
+QUEUE_REJECTIONS = REGISTRY.register(Counter(
+    "nca_queue_rejections_total", "Jobs rejected because the queue was full", ("lane",)))
+
+FFMPEG_RUNS = REGISTRY.register(Counter(
+    "nca_ffmpeg_runs_total", "ffmpeg invocations by operation and outcome", ("operation", "outcome")))
+FFMPEG_WALL = REGISTRY.register(Histogram(
+    "nca_ffmpeg_wall_seconds", "ffmpeg wall-clock time by operation", ("operation",)))
+FFMPEG_CPU = REGISTRY.register(Counter(
+    "nca_ffmpeg_cpu_seconds_total", "ffmpeg user plus system CPU time by operation", ("operation",)))
+
+BYTES_DOWNLOADED = REGISTRY.register(Counter(
+    "nca_downloaded_bytes_total", "Bytes downloaded from input URLs", ()))
+DOWNLOADS = REGISTRY.register(Counter(
+    "nca_downloads_total", "Input downloads by outcome", ("outcome",)))
+BYTES_UPLOADED = REGISTRY.register(Counter(
+    "nca_uploaded_bytes_total", "Bytes uploaded to cloud storage by provider", ("provider",)))
+UPLOADS = REGISTRY.register(Counter(
+    "nca_uploads_total", "Cloud storage uploads by provider and outcome", ("provider", "outcome")))
+
+TRANSCRIPTION_RTF = REGISTRY.register(Histogram(
+    "nca_transcription_real_time_factor", "Transcription time divided by media duration", ("tool",), buckets=RTF_BUCKETS))
+TRANSCRIBED_SECONDS = REGISTRY.register(Counter(
+    "nca_transcribed_media_seconds_total", "Seconds of media transcribed", ("tool",)))
+
+WEBHOOK_DURATION = REGISTRY.register(Histogram(
+    "nca_webhook_duration_seconds", "Webhook delivery latency", ()))
+WEBHOOKS = REGISTRY.register(Counter(
+    "nca_webhooks_total", "Webhook deliveries by outcome", ("outcome",)))
+
+def register_gauge(name, documentation, labelnames, callback):
+    """
+    Register a gauge whose values are collected at scrape time.
+
+    Args:
+        name: Metric name
+        documentation: Help text
+        labelnames: Label names
+        callback: Function returning an iterable of (labels dict, value)
+
+    Returns:
+        The Gauge
+    """
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback=callback))
+
+def _cache_stats():
+    # Imported lazily so the metrics module stays importable without the video stack
+    from services.v1.video import render_cache
+    from services.v1.fonts import font_cache
+    from services.v1.subtitles import thai_tokenizer
+    sources = [("font", font_cache.get_cache_stats), ("token", thai_tokenizer.get_cache_stats)]
+    # A scrape must not create the render cache (its directory, index scan and sweeper)
+    # in a worker that has not rendered yet
+    if render_cache._render_cache is not None:
+        sources.insert(0, ("render", render_cache._render_cache.stats))
+    for cache, get_stats in sources:
+        try:
+            yield cache, get_stats()
+        except Exception as e:
+            logger.warning(f"Could not read {cache} cache stats: {str(e)}")
+
+def _cache_ratios():
+    for cache, stats in _cache_stats():
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        yield {"cache": cache}, stats.get("hits", 0) / lookups if lookups else 0.0
+
+def _cache_lookups():
+    for cache, stats in _cache_stats():
+        yield {"cache": cache, "result": "hit"}, stats.get("hits", 0)
+        yield {"cache": cache, "result": "miss"}, stats.get("misses", 0)
+
+register_gauge("nca_cache_hit_ratio", "Hit ratio of the render, font and token caches", ("cache",), _cache_ratios)
+register_gauge("nca_cache_lookups", "Cache lookups since start or the last clear", ("cache", "result"), _cache_lookups)
+
+def observe_job(endpoint, code, run_time, queue_time=None):
+    """Record a finished job."""
+    JOBS.inc(endpoint=endpoint, code=code)
+    JOB_DURATION.observe(run_time, endpoint=endpoint)
+    if queue_time is not None:
+        JOB_QUEUE_TIME.observe(queue_time, endpoint=endpoint)
+
+def observe_ffmpeg(operation, wall_seconds, cpu_seconds=None, outcome="ok"):
+    """Record one ffmpeg invocation."""
+    FFMPEG_RUNS.inc(operation=operation, outcome=outcome)
+    FFMPEG_WALL.observe(wall_seconds, operation=operation)
+    if cpu_seconds is not None:
+        FFMPEG_CPU.inc(max(cpu_seconds, 0.0), operation=operation)
+
+def observe_transcription(tool, elapsed_seconds, media_seconds):
+    """Record the real-time factor of a transcription; media_seconds is the transcribed duration."""
+    if not media_seconds or media_seconds <= 0:
+        return
+    TRANSCRIPTION_RTF.observe(elapsed_seconds / media_seconds, tool=tool)
+    TRANSCRIBED_SECONDS.inc(media_seconds, tool=tool)
+
+def timed_transcription(tool):
+    """Decorator recording the real-time factor of a function that returns transcription segments."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            segments = func(*args, **kwargs)
+            try:
+                observe_transcription(tool, time.time() - start, segments_duration(segments))
+            except Exception as e:
+                logger.warning(f"Could not record transcription metrics: {str(e)}")
+            return segments
+        return wrapper
+    return decorator
+
+def segments_duration(segments):
+    """Media duration covered by transcription segments."""
+    ends = [segment.get("end", 0) for segment in segments or () if isinstance(segment, dict)]
+    return max(ends) if ends else 0.0
@@ -20,7 +20,19 @@ def parse_s3_url(s3_url):
     
     return bucket_name, region, endpoint_url
 
-def upload_to_s3(file_path, s3_url, access_key, secret_key):
+def _transfer_callback(file_path, on_progress):
+    """boto3 Callback adapter: boto3 reports bytes per chunk, on_progress expects running totals."""
+    if on_progress is None:
+        return None
+    total = os.path.getsize(file_path)
+    state = {"done": 0}
+
+    def callback(bytes_amount):
+        state["done"] += bytes_amount
+        on_progress(state["done"], total)
+    return callback
+
+def upload_to_s3(file_path, s3_url, access_key, secret_key, on_progress=None):
     # Parse the S3 URL into bucket, region, and endpoint
     bucket_name, region, endpoint_url = parse_s3_url(s3_url)
     
@@ -35,7 +47,8 @@ def upload_to_s3(file_path, s3_url, access_key, secret_key):
     try:
         # Upload the file to the specified S3 bucket
         with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'})
+            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'},
+                                  Callback=_transfer_callback(file_path, on_progress))
 
         file_url = f"{endpoint_url}/{bucket_name}/{os.path.basename(file_path)}"
         return file_url
@@ -43,7 +56,7 @@ def upload_to_s3(file_path, s3_url, access_key, secret_key):
         logger.error(f"Error uploading file to S3: {e}")
         raise
 
-def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destination_path=None):
+def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destination_path=None, on_progress=None):
     """
     Upload a file to S3-compatible storage with a custom destination path.
     
@@ -53,6 +66,7 @@ def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destinatio
         access_key: S3 access key
         secret_key: S3 secret key
         destination_path: Custom path in the bucket (e.g., 'thumbnails/image.jpg')
+        on_progress: Optional function called with (bytes_sent, total_bytes)
         
     Returns:
         Public URL to the uploaded file
@@ -76,7 +90,8 @@ def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destinatio
         
         # Upload the file to the specified S3 bucket with the custom path
         with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, object_key, ExtraArgs={'ACL': 'public-read'})
+            client.upload_fileobj(data, bucket_name, object_key, ExtraArgs={'ACL': 'public-read'},
+                                  Callback=_transfer_callback(file_path, on_progress))
 
         file_url = f"{endpoint_url}/{bucket_name}/{object_key}"
         logger.info(f"File uploaded successfully to S3: {file_url}")
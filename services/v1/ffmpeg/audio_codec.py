@@ -0,0 +1,94 @@
+import os
+import json
+import logging
+import subprocess
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Audio codecs that can be stream-copied into each output container without
+# re-encoding. Anything not listed here falls back to AAC. Opus and FLAC are
+# left out of MP4 because older ffmpeg builds only mux them with -strict -2.
+CONTAINER_AUDIO_CODECS = {
+    '.mp4': {'aac', 'mp3', 'ac3', 'eac3', 'alac'},
+    '.m4v': {'aac', 'mp3', 'ac3', 'eac3', 'alac'},
+    '.mov': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    '.mkv': {'aac', 'mp3', 'ac3', 'eac3', 'opus', 'vorbis', 'flac', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    '.webm': {'opus', 'vorbis'},
+}
+
+# Encoder to use when the source audio cannot be copied into the container
+FALLBACK_AUDIO_ENCODERS = {
+    '.webm': 'libopus',
+}
+
+def probe_audio_codec(media_path):
+    """
+    Get the codec name of the first audio stream in a media file.
+
+    Args:
+        media_path: Path to the media file
+
+    Returns:
+        Codec name (e.g. 'aac'), an empty string if the file has no audio stream,
+        or None if ffprobe failed
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name",
+                "-of", "json",
+                media_path
+            ],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            logger.error(f"FFprobe error while probing audio codec: {result.stderr}")
+            return None
+
+        streams = json.loads(result.stdout).get('streams', [])
+        if not streams:
+            return ""
+        return streams[0].get('codec_name', "")
+    except Exception as e:
+        logger.error(f"Error probing audio codec for {media_path}: {str(e)}")
+        return None
+
+def get_audio_codec_args(input_path, output_path, audio_codec=None):
+    """
+    Choose the ffmpeg audio codec arguments for a job that only filters video.
+
+    The source audio is stream-copied whenever the output container can hold it,
+    which avoids a pointless re-encode and the generational quality loss that
+    comes with it. Otherwise the audio is re-encoded with a codec the container
+    supports.
+
+    Args:
+        input_path: Path to the input media file
+        output_path: Path to the output media file (the extension selects the container)
+        audio_codec: Already probed codec name of the input audio (optional)
+
+    Returns:
+        List of ffmpeg arguments, e.g. ["-c:a", "copy"]
+    """
+    if audio_codec is None:
+        audio_codec = probe_audio_codec(input_path)
+
+    ext = os.path.splitext(output_path)[1].lower()
+    fallback_encoder = FALLBACK_AUDIO_ENCODERS.get(ext, 'aac')
+
+    if audio_codec == "":
+        # No audio stream, nothing to encode
+        logger.info(f"No audio stream found in {input_path}")
+        return ["-c:a", "copy"]
+
+    if audio_codec and audio_codec in CONTAINER_AUDIO_CODECS.get(ext, set()):
+        logger.info(f"Stream-copying {audio_codec} audio into {ext} output")
+        return ["-c:a", "copy"]
+
+    logger.info(f"Audio codec {audio_codec or 'unknown'} cannot be copied into {ext} output, re-encoding with {fallback_encoder}")
+    return ["-c:a", fallback_encoder]
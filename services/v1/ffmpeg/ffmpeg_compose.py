@@ -3,15 +3,13 @@ import subprocess
 import json
 import logging
 import uuid
-import glob
-from services.file_management import download_file
+from services.file_management import download_file, job_workspace
+from services.v1.fonts import font_registry
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Define storage path without trailing slash
-STORAGE_PATH = "/tmp"
-
 def get_extension_from_format(format_name):
     # Mapping of common format names to file extensions
     format_to_extension = {
@@ -47,7 +45,7 @@ def get_metadata(filename, metadata_requests, job_id):
             thumbnail_filename
         ]
         try:
-            subprocess.run(thumbnail_command, check=True, capture_output=True, text=True)
+            run_ffmpeg(thumbnail_command, operation="thumbnail", job_id=job_id)
             if os.path.exists(thumbnail_filename):
                 metadata['thumbnail'] = thumbnail_filename  # Return local path instead of URL
         except subprocess.CalledProcessError as e:
@@ -88,67 +86,19 @@ def find_thai_font():
     Find an available Thai font on the system.
     Returns the path to the font file if found, or None if not found.
     """
-    # Common paths for Thai fonts
-    possible_paths = [
-        # Thai-specific fonts
-        "/usr/share/fonts/truetype/thai-tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/truetype/tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/TTF/Sarabun*.ttf",
-        "/usr/share/fonts/thai-tlwg/Sarabun*.ttf",
-        # General font directories
-        "/usr/share/fonts/truetype/*/Sarabun*.ttf",
-        "/usr/share/fonts/*/Sarabun*.ttf",
-        # Noto Sans Thai (alternative)
-        "/usr/share/fonts/truetype/noto/NotoSansThai*.ttf",
-        "/usr/share/fonts/noto-cjk/NotoSansThai*.ttf",
-        # Fallback to any Thai font
-        "/usr/share/fonts/**/Thai*.ttf",
-        "/usr/share/fonts/**/*Thai*.ttf"
-    ]
-    
-    # Try to find a Thai font
-    for path_pattern in possible_paths:
-        try:
-            matches = glob.glob(path_pattern, recursive=True)
-            if matches:
-                logger.info(f"Found Thai font: {matches[0]}")
-                return matches[0]
-        except Exception as e:
-            logger.warning(f"Error checking font path {path_pattern}: {str(e)}")
-    
-    # If glob doesn't work, try using find command
-    try:
-        result = subprocess.run(
-            ["find", "/usr/share/fonts", "-name", "*Thai*", "-o", "-name", "*Sarabun*", "-type", "f"],
-            capture_output=True, text=True, check=False
-        )
-        if result.stdout.strip():
-            font_path = result.stdout.strip().split("\n")[0]
-            logger.info(f"Found Thai font using find command: {font_path}")
-            return font_path
-    except Exception as e:
-        logger.warning(f"Error using find command to locate Thai font: {str(e)}")
-    
-    # Last resort - check if we can list any fonts
-    try:
-        result = subprocess.run(["fc-list"], capture_output=True, text=True, check=False)
-        if "Thai" in result.stdout or "Sarabun" in result.stdout:
-            for line in result.stdout.split("\n"):
-                if "Thai" in line or "Sarabun" in line:
-                    font_path = line.split(":")[0]
-                    logger.info(f"Found Thai font using fc-list: {font_path}")
-                    return font_path
-    except Exception as e:
-        logger.warning(f"Error using fc-list to locate Thai font: {str(e)}")
-    
-    logger.error("No Thai font found on the system")
-    return None
+    font_path = font_registry.find_thai_font()
+    if not font_path:
+        logger.error("No Thai font found on the system")
+    return font_path
 
 def process_ffmpeg_compose(data, job_id):
     output_filenames = []
     
     logger.info(f"Job {job_id}: Starting FFmpeg compose process")
-    logger.info(f"Job {job_id}: Using storage path: {STORAGE_PATH}")
+    
+    # Inputs and outputs live in the job's workspace, removed when the request ends
+    workspace = job_workspace(job_id)
+    logger.info(f"Job {job_id}: Using workspace: {workspace}")
     
     # Check for Thai font
     thai_font_path = find_thai_font()
@@ -157,9 +107,6 @@ def process_ffmpeg_compose(data, job_id):
     else:
         logger.warning(f"Job {job_id}: No Thai font found, text rendering may be affected")
     
-    # Create temp directory if it doesn't exist
-    os.makedirs(STORAGE_PATH, exist_ok=True)
-    
     # Build FFmpeg command
     command = ["ffmpeg"]
     
@@ -186,12 +133,12 @@ def process_ffmpeg_compose(data, job_id):
             file_ext = ".mp4"  # Default extension if none is found
         
         unique_filename = f"{job_id}_input_{i}{file_ext}"
-        input_file_path = os.path.join(STORAGE_PATH, unique_filename)
+        input_file_path = os.path.join(workspace, unique_filename)
         
         logger.info(f"Job {job_id}: Downloading input file to {input_file_path}")
         try:
             # Download the file to the specific path
-            download_file(input_data["file_url"], input_file_path)
+            download_file(input_data["file_url"], input_file_path, job_id=job_id)
             logger.info(f"Job {job_id}: Successfully downloaded input file to {input_file_path}")
             
             # Verify the file exists
@@ -234,7 +181,7 @@ def process_ffmpeg_compose(data, job_id):
                 break
         
         extension = get_extension_from_format(format_name) if format_name else 'mp4'
-        output_filename = os.path.join(STORAGE_PATH, f"{job_id}_output_{i}.{extension}")
+        output_filename = os.path.join(workspace, f"{job_id}_output_{i}.{extension}")
         logger.info(f"Job {job_id}: Setting output {i+1} to {output_filename}")
         output_filenames.append(output_filename)
         
@@ -247,7 +194,7 @@ def process_ffmpeg_compose(data, job_id):
     # Execute FFmpeg command
     logger.info(f"Job {job_id}: Executing FFmpeg command: {' '.join(command)}")
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        result = run_ffmpeg(command, operation="compose", job_id=job_id)
         logger.info(f"Job {job_id}: FFmpeg command completed successfully")
         logger.debug(f"Job {job_id}: FFmpeg stdout: {result.stdout}")
     except subprocess.CalledProcessError as e:
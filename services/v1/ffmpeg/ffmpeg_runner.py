@@ -0,0 +1,401 @@
+import os
+import re
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+from services import metrics
+from services import job_progress
+from services.cancellation import cancel_event as job_cancel_event
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Default limits for a single ffmpeg run, in seconds; 0 disables the limit
+FFMPEG_TIMEOUT = float(os.environ.get("FFMPEG_TIMEOUT", str(4 * 3600)))
+FFMPEG_CPU_TIMEOUT = float(os.environ.get("FFMPEG_CPU_TIMEOUT", "0"))
+
+# Lines of stderr kept for error reports; older lines are dropped
+STDERR_TAIL_LINES = 200
+
+# How often the runner checks timeouts and cancellation
+POLL_INTERVAL = 0.25
+
+# Seconds between progress log lines
+PROGRESS_LOG_INTERVAL = 10.0
+
+# Grace period between SIGTERM and SIGKILL
+TERMINATE_GRACE = 5.0
+
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None
+
+class FFmpegError(subprocess.CalledProcessError):
+    """ffmpeg exited with an error. stderr holds the tail of its output."""
+
+    def __init__(self, returncode, cmd, stderr="", result=None):
+        super().__init__(returncode, cmd, output=None, stderr=stderr)
+        self.result = result
+
+    def __str__(self):
+        tail = (self.stderr or "").strip().splitlines()[-5:]
+        return f"{super().__str__()} {' | '.join(tail)}".strip()
+
+class FFmpegTimeout(FFmpegError):
+    """ffmpeg was stopped because it exceeded its wall-clock or CPU time limit."""
+
+class FFmpegCancelled(FFmpegError):
+    """ffmpeg was stopped because its job was cancelled."""
+
+@dataclass
+class FFmpegResult:
+    """Outcome and resource usage of an ffmpeg run."""
+    returncode: int
+    wall_seconds: float
+    cpu_seconds: Optional[float] = None
+    max_rss_kb: Optional[int] = None
+    stderr: str = ""
+    stdout: str = ""
+    progress: dict = field(default_factory=dict)
+
+def _progress_args(cmd):
+    """ffmpeg arguments that stream machine-readable progress to stdout, unless stdout carries media."""
+    if os.path.basename(cmd[0]) != "ffmpeg" or "-progress" in cmd:
+        return None
+    if any(arg in ("-", "pipe:", "pipe:1") for arg in cmd[1:]):
+        return None
+    return ["-progress", "pipe:1", "-nostats"]
+
+def _process_cpu_seconds(pid):
+    """CPU time used so far by a running process, from /proc; None where unavailable."""
+    if not CLOCK_TICKS:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Fields after the parenthesised command name; utime and stime are fields 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _parse_out_time(values):
+    if "out_time_us" in values:
+        return int(values["out_time_us"]) / 1e6
+    if "out_time_ms" in values:
+        # Despite its name ffmpeg reports this one in microseconds as well
+        return int(values["out_time_ms"]) / 1e6
+    return None
+
+def _stop_reason(pid, start, timeout, cpu_timeout, cancel_event):
+    """Why a running ffmpeg process must be stopped, or None."""
+    if cancel_event is not None and cancel_event.is_set():
+        return "cancelled"
+    if timeout and time.time() - start > timeout:
+        return f"exceeded wall-clock limit of {timeout:.0f}s"
+    if cpu_timeout:
+        cpu_seconds = _process_cpu_seconds(pid)
+        if cpu_seconds is not None and cpu_seconds > cpu_timeout:
+            return f"exceeded CPU limit of {cpu_timeout:.0f}s"
+    return None
+
+def _supervise(process, operation, job_id, start, timeout, cpu_timeout, cancel_event):
+    """
+    Wait for a process, stopping it on cancellation or when a limit is exceeded.
+
+    The process is reaped here with wait4 to get its resource usage.
+
+    Returns:
+        Tuple (wait status, rusage, stop reason or None)
+    """
+    stop_reason = None
+    stopped_at = None
+    # Poll quickly at first so short commands are not slowed down
+    delay = 0.005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if stop_reason is None:
+            stop_reason = _stop_reason(process.pid, start, timeout, cpu_timeout, cancel_event)
+            if stop_reason:
+                logger.warning(f"Job {job_id}: Stopping {operation}: {stop_reason}")
+                process.terminate()
+                stopped_at = time.time()
+        elif time.time() - stopped_at > TERMINATE_GRACE:
+            process.kill()
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_INTERVAL)
+
+    # The process was reaped by wait4, so Popen must not wait for it again
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return status, rusage, stop_reason
+
+def _finish(cmd, operation, job_id, process, rusage, start, stop_reason, stderr, stdout="", progress=None, check=True):
+    """Record metrics for a finished run and return its FFmpegResult, raising on failure."""
+    wall_seconds = time.time() - start
+    result = FFmpegResult(
+        returncode=process.returncode,
+        wall_seconds=wall_seconds,
+        cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+        max_rss_kb=rusage.ru_maxrss,
+        stderr=stderr,
+        stdout=stdout,
+        progress=progress or {}
+    )
+
+    if stop_reason == "cancelled":
+        outcome = "cancelled"
+    elif stop_reason:
+        outcome = "timeout"
+    else:
+        outcome = "ok" if result.returncode == 0 else "error"
+    metrics.observe_ffmpeg(operation, wall_seconds, result.cpu_seconds, outcome)
+    logger.debug(f"Job {job_id}: {operation} finished in {wall_seconds:.2f}s, CPU {result.cpu_seconds:.2f}s, "
+                 f"max RSS {result.max_rss_kb} KB, exit code {result.returncode}")
+
+    if stop_reason == "cancelled":
+        raise FFmpegCancelled(result.returncode, cmd, result.stderr, result)
+    if stop_reason:
+        raise FFmpegTimeout(result.returncode, cmd, f"{result.stderr}\n{operation} {stop_reason}", result)
+    if check and result.returncode != 0:
+        raise FFmpegError(result.returncode, cmd, result.stderr, result)
+    return result
+
+def run_ffmpeg(cmd, operation="ffmpeg", job_id=None, duration=None, timeout=None, cpu_timeout=None,
+               cancel_event=None, on_progress=None, stderr_lines=STDERR_TAIL_LINES, check=True,
+               capture_stdout=False):
+    """
+    Run an ffmpeg (or ffprobe) command with progress, limits and resource accounting.
+
+    Progress is streamed with -progress pipe:1 and reported as out_time,
+    percent and ETA. Only the last stderr_lines lines of stderr are kept.
+    The run is stopped when it exceeds timeout seconds of wall-clock time or
+    cpu_timeout seconds of CPU time, or when cancel_event is set.
+
+    Args:
+        cmd: Command as a list of arguments
+        operation: Name of the operation for logs and metrics
+        job_id: Job ID for logging; progress is also published to the job's progress channel
+        duration: Expected output duration in seconds for percent and ETA; read from ffmpeg's log if None
+        timeout: Wall-clock limit in seconds; FFMPEG_TIMEOUT if None, 0 for no limit
+        cpu_timeout: CPU time limit in seconds; FFMPEG_CPU_TIMEOUT if None, 0 for no limit
+        cancel_event: Optional threading.Event that cancels the run when set; defaults to the job's cancellation token
+        on_progress: Optional function called with each progress dictionary
+        stderr_lines: Number of stderr lines to keep
+        check: Raise FFmpegError if ffmpeg fails
+        capture_stdout: Return stdout (only when no progress is streamed to it)
+
+    Returns:
+        FFmpegResult
+
+    Raises:
+        FFmpegError: ffmpeg exited with a non-zero code and check is True
+        FFmpegTimeout: A time limit was exceeded
+        FFmpegCancelled: cancel_event was set
+    """
+    timeout = FFMPEG_TIMEOUT if timeout is None else timeout
+    cpu_timeout = FFMPEG_CPU_TIMEOUT if cpu_timeout is None else cpu_timeout
+    if cancel_event is None:
+        cancel_event = job_cancel_event(job_id)
+    cmd = [str(arg) for arg in cmd]
+    progress_args = _progress_args(cmd)
+    if progress_args:
+        cmd = [cmd[0]] + progress_args + cmd[1:]
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled(-1, cmd, f"{operation} cancelled before it started")
+
+    stderr_tail = deque(maxlen=stderr_lines)
+    stdout_chunks = []
+    progress = {}
+    state = {"duration": duration, "last_log": 0.0}
+    start = time.time()
+
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace"
+    )
+
+    def read_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip("\n"))
+            if state["duration"] is None:
+                match = DURATION_PATTERN.search(line)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    state["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def read_stdout():
+        if not progress_args:
+            for chunk in iter(lambda: process.stdout.read(65536), ""):
+                if capture_stdout:
+                    stdout_chunks.append(chunk)
+            return
+        values = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if not key:
+                continue
+            values[key] = value
+            if key != "progress":
+                continue
+            snapshot = {"operation": operation, "state": value}
+            out_time = _parse_out_time(values)
+            elapsed = time.time() - start
+            if out_time is not None:
+                snapshot["out_time"] = round(out_time, 3)
+                total = state["duration"]
+                if total:
+                    snapshot["total"] = round(total, 3)
+                    snapshot["percent"] = round(min(out_time / total, 1.0) * 100, 1)
+                    if out_time > 0:
+                        snapshot["eta"] = round(max(total - out_time, 0) * elapsed / out_time, 1)
+            if values.get("speed", "N/A") != "N/A":
+                snapshot["speed"] = values["speed"].strip()
+            progress.clear()
+            progress.update(snapshot)
+            fields = {name: snapshot[name] for name in snapshot if name not in ("operation", "state")}
+            job_progress.publish(job_id, operation, state="end" if value == "end" else "running", **fields)
+            if on_progress is not None:
+                try:
+                    on_progress(dict(snapshot))
+                except Exception as e:
+                    logger.warning(f"Job {job_id}: Progress callback failed: {str(e)}")
+            if elapsed - state["last_log"] >= PROGRESS_LOG_INTERVAL and "percent" in snapshot:
+                state["last_log"] = elapsed
+                logger.info(f"Job {job_id}: {operation} {snapshot['percent']}% (ETA {snapshot.get('eta', '?')}s)")
+
+    readers = [threading.Thread(target=read_stderr, daemon=True), threading.Thread(target=read_stdout, daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    status, rusage, stop_reason = _supervise(process, operation, job_id, start, timeout, cpu_timeout, cancel_event)
+    for reader in readers:
+        reader.join(timeout=5)
+
+    return _finish(
+        cmd, operation, job_id, process, rusage, start, stop_reason,
+        stderr="\n".join(stderr_tail), stdout="".join(stdout_chunks), progress=dict(progress), check=check
+    )
+
+class FFmpegPipe:
+    """
+    An ffmpeg process whose stdin or stdout carries raw media, under the limits of run_ffmpeg.
+
+    The caller reads frames from stdout or writes them to stdin while a
+    watchdog thread stops the process on cancellation or when a time limit
+    is exceeded, and reaps it. Only the last stderr_lines lines of stderr are
+    kept. Call wait() once the pipes are done with, or use the pipe as a
+    context manager so it is stopped if the caller fails.
+    """
+
+    def __init__(self, cmd, operation="ffmpeg", job_id=None, read=False, write=False, timeout=None,
+                 cpu_timeout=None, cancel_event=None, stderr_lines=STDERR_TAIL_LINES):
+        """
+        Start the process.
+
+        Args:
+            cmd: Command as a list of arguments
+            operation: Name of the operation for logs and metrics
+            job_id: Job ID for logging and cancellation
+            read: Open a pipe from the process' stdout
+            write: Open a pipe to the process' stdin
+            timeout: Wall-clock limit in seconds; FFMPEG_TIMEOUT if None, 0 for no limit
+            cpu_timeout: CPU time limit in seconds; FFMPEG_CPU_TIMEOUT if None, 0 for no limit
+            cancel_event: Optional threading.Event that stops the process when set; defaults to the job's cancellation token
+            stderr_lines: Number of stderr lines to keep
+
+        Raises:
+            FFmpegCancelled: cancel_event was already set
+        """
+        self.cmd = [str(arg) for arg in cmd]
+        self.operation = operation
+        self.job_id = job_id
+        timeout = FFMPEG_TIMEOUT if timeout is None else timeout
+        cpu_timeout = FFMPEG_CPU_TIMEOUT if cpu_timeout is None else cpu_timeout
+        if cancel_event is None:
+            cancel_event = job_cancel_event(job_id)
+        if cancel_event is not None and cancel_event.is_set():
+            raise FFmpegCancelled(-1, self.cmd, f"{operation} cancelled before it started")
+
+        self._stderr_tail = deque(maxlen=stderr_lines)
+        self._start = time.time()
+        self.process = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE if write else subprocess.DEVNULL,
+            stdout=subprocess.PIPE if read else subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        self.stdin = self.process.stdin
+        self.stdout = self.process.stdout
+        self._outcome = None
+        self._waited = False
+        self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_reader.start()
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(timeout, cpu_timeout, cancel_event), name=f"{operation}-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.decode("utf-8", "replace").rstrip("\n"))
+
+    def _watch(self, timeout, cpu_timeout, cancel_event):
+        _, rusage, stop_reason = _supervise(
+            self.process, self.operation, self.job_id, self._start, timeout, cpu_timeout, cancel_event
+        )
+        self._outcome = (rusage, stop_reason)
+
+    def _close_pipes(self):
+        for pipe in (self.stdin, self.stdout):
+            if pipe is None:
+                continue
+            try:
+                pipe.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def wait(self, check=True):
+        """
+        Close the pipes and wait for the process to exit.
+
+        Returns:
+            FFmpegResult
+
+        Raises:
+            FFmpegError: ffmpeg exited with a non-zero code and check is True
+            FFmpegTimeout: A time limit was exceeded
+            FFmpegCancelled: The job was cancelled
+        """
+        self._waited = True
+        self._close_pipes()
+        self._watchdog.join()
+        self._stderr_reader.join(timeout=5)
+        rusage, stop_reason = self._outcome
+        return _finish(
+            self.cmd, self.operation, self.job_id, self.process, rusage, self._start, stop_reason,
+            stderr="\n".join(self._stderr_tail), check=check
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None and not self._waited:
+            # Closing the pipes ends the process; its own errors would hide the caller's
+            try:
+                self.wait(check=False)
+            except FFmpegError:
+                pass
+        return False
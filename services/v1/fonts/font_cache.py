@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import ImageFont, features
+    PIL_AVAILABLE = True
+    RAQM_AVAILABLE = features.check("raqm")
+except ImportError:
+    PIL_AVAILABLE = False
+    RAQM_AVAILABLE = False
+    logger.warning("Pillow not available. Font cache is disabled.")
+
+# Maximum number of loaded (path, size, layout engine) fonts kept in memory
+FONT_CACHE_SIZE = int(os.environ.get("FONT_CACHE_SIZE", "128"))
+
+_font_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def default_layout_engine():
+    """Get the best available layout engine: Raqm shapes Thai vowels and tone marks correctly."""
+    if not PIL_AVAILABLE:
+        return None
+    return ImageFont.Layout.RAQM if RAQM_AVAILABLE else ImageFont.Layout.BASIC
+
+def load_font(font_path, font_size, layout_engine=None):
+    """
+    Load a TrueType font, reusing an already parsed font object when possible.
+
+    Font objects are shared between threads and jobs, so a font file is parsed
+    once per size instead of once per frame or per image.
+
+    Args:
+        font_path: Path to the font file
+        font_size: Font size in pixels
+        layout_engine: PIL layout engine (defaults to Raqm when available)
+
+    Returns:
+        PIL FreeTypeFont object
+
+    Raises:
+        OSError: If the font file cannot be loaded
+    """
+    if layout_engine is None:
+        layout_engine = default_layout_engine()
+    key = (font_path, int(font_size), layout_engine)
+
+    with _cache_lock:
+        font = _font_cache.get(key)
+        if font is not None:
+            _font_cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return font
+        _cache_stats["misses"] += 1
+
+    # Parse outside the lock so slow font files do not block other lookups
+    font = ImageFont.truetype(font_path, int(font_size), layout_engine=layout_engine)
+
+    with _cache_lock:
+        _font_cache[key] = font
+        _font_cache.move_to_end(key)
+        while len(_font_cache) > FONT_CACHE_SIZE:
+            _font_cache.popitem(last=False)
+    return font
+
+def get_cache_stats():
+    """
+    Get font cache statistics.
+
+    Returns:
+        Dictionary with hits, misses, size and max_size
+    """
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "size": len(_font_cache),
+            "max_size": FONT_CACHE_SIZE
+        }
+
+def clear_cache():
+    """Drop all loaded fonts."""
+    with _cache_lock:
+        _font_cache.clear()
+        _cache_stats["hits"] = 0
+        _cache_stats["misses"] = 0
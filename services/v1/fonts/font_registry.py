@@ -0,0 +1,296 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow not available. Font registry cannot read font names.")
+
+# Bundled fonts directory (project root /fonts)
+FONTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "fonts")
+
+# Directories scanned for fonts, bundled fonts first
+FONT_DIRECTORIES = [
+    FONTS_DIR,
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    "C:/Windows/Fonts",
+    "/System/Library/Fonts",
+    "/Library/Fonts",
+]
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+# The index is persisted so restarts skip opening every font file again
+FONT_INDEX_PATH = os.environ.get("FONT_INDEX_PATH", os.path.join(tempfile.gettempdir(), "font_index.json"))
+
+FONT_INDEX_VERSION = 1
+
+# Thai families in order of preference for Thai text
+PREFERRED_THAI_FAMILIES = ["sarabun", "notosansthai", "garuda", "thsarabunnew", "loma", "waree", "norasi", "kinnari"]
+
+# Thai character and a private-use character that no font maps, to detect Thai coverage
+THAI_PROBE = "\u0e01"
+MISSING_PROBE = "\U000f0000"
+
+def _normalize(name):
+    """Normalize a font or family name for lookups: lowercase without spaces, dashes or underscores."""
+    return "".join(ch for ch in name.lower() if ch.isalnum())
+
+def _scan_directory_mtimes(directories):
+    """Collect the mtime of every directory below the font roots."""
+    mtimes = {}
+    for root_dir in directories:
+        if not os.path.isdir(root_dir):
+            continue
+        for dirpath, _, _ in os.walk(root_dir):
+            try:
+                mtimes[dirpath] = os.path.getmtime(dirpath)
+            except OSError:
+                continue
+    return mtimes
+
+def _read_font_file(path):
+    """
+    Read the family, style and Thai coverage of a font file.
+
+    Returns:
+        Dictionary with family, style and thai, or None if the font cannot be read
+    """
+    if not PIL_AVAILABLE:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        family, _, style = stem.partition("-")
+        return {"family": family, "style": style or "Regular", "thai": "thai" in stem.lower() or "sarabun" in stem.lower()}
+
+    try:
+        font = ImageFont.truetype(path, 24)
+        family, style = font.getname()
+        # Unmapped characters render as .notdef, so a Thai glyph that matches it means no coverage
+        thai_mask = font.getmask(THAI_PROBE)
+        missing_mask = font.getmask(MISSING_PROBE)
+        thai = thai_mask.size != missing_mask.size or bytes(thai_mask) != bytes(missing_mask)
+        return {"family": family or "", "style": style or "Regular", "thai": bool(thai)}
+    except Exception as e:
+        logger.debug(f"Could not read font {path}: {str(e)}")
+        return None
+
+class FontRegistry:
+    """
+    Index of the fonts installed on the system and bundled with the project.
+
+    The font directories are scanned once and each font is opened once to read
+    its family, style and Thai coverage. The index is persisted to disk and
+    reused as long as no font directory has changed; after that every lookup is
+    a dictionary access.
+    """
+
+    def __init__(self, directories=None, index_path=FONT_INDEX_PATH):
+        self.directories = list(directories or FONT_DIRECTORIES)
+        self.index_path = index_path
+        self.fonts = []
+        self._by_name = {}
+        self._by_family = {}
+        self._thai_fonts = []
+        self._thai_set = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load_index(self, dir_mtimes):
+        """
+        Load the persisted index.
+
+        Returns:
+            Tuple of (fonts, up_to_date). up_to_date is False when a font directory
+            changed since the index was written; its entries can still be reused
+            for unchanged files.
+        """
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None, False
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read font index {self.index_path}: {str(e)}")
+            return None, False
+        if index.get("version") != FONT_INDEX_VERSION:
+            return None, False
+        return index.get("fonts"), index.get("directories") == dir_mtimes
+
+    def _save_index(self, dir_mtimes):
+        if not self.index_path:
+            return
+        try:
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": FONT_INDEX_VERSION, "directories": dir_mtimes, "fonts": self.fonts}, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not write font index {self.index_path}: {str(e)}")
+
+    def _scan(self, previous_fonts):
+        """Scan the font directories, reusing entries of unchanged files from a previous index."""
+        previous = {entry["path"]: entry for entry in previous_fonts or []}
+        fonts = []
+        seen = set()
+        for root_dir in self.directories:
+            if not os.path.isdir(root_dir):
+                continue
+            bundled = os.path.abspath(root_dir) == os.path.abspath(FONTS_DIR)
+            for dirpath, _, filenames in os.walk(root_dir):
+                for filename in sorted(filenames):
+                    if not filename.lower().endswith(FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    real_path = os.path.realpath(path)
+                    if real_path in seen:
+                        continue
+                    seen.add(real_path)
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except OSError:
+                        continue
+                    entry = previous.get(path)
+                    if entry is None or entry.get("mtime") != mtime:
+                        info = _read_font_file(path)
+                        if info is None:
+                            continue
+                        entry = dict(info, path=path, mtime=mtime, bundled=bundled)
+                    fonts.append(entry)
+        return fonts
+
+    def _build_lookups(self):
+        by_name = {}
+        by_family = {}
+        for entry in self.fonts:
+            stem = os.path.splitext(os.path.basename(entry["path"]))[0]
+            family = _normalize(entry["family"])
+            # First font wins, so bundled fonts shadow system fonts with the same name
+            by_name.setdefault(os.path.basename(entry["path"]).lower(), entry["path"])
+            by_name.setdefault(_normalize(stem), entry["path"])
+            by_name.setdefault(family + _normalize(entry["style"]), entry["path"])
+            by_family.setdefault(family, []).append(entry)
+
+        # Regular style first within each family
+        for entries in by_family.values():
+            entries.sort(key=lambda entry: _normalize(entry["style"]) not in ("regular", "book", "normal"))
+        for family, entries in by_family.items():
+            by_name.setdefault(family, entries[0]["path"])
+
+        def thai_rank(entry):
+            family = _normalize(entry["family"])
+            preferred = PREFERRED_THAI_FAMILIES.index(family) if family in PREFERRED_THAI_FAMILIES else len(PREFERRED_THAI_FAMILIES)
+            regular = _normalize(entry["style"]) in ("regular", "book", "normal")
+            return (not entry["bundled"], preferred, not regular, entry["path"])
+
+        self._by_name = by_name
+        self._by_family = by_family
+        self._thai_fonts = [entry["path"] for entry in sorted((e for e in self.fonts if e["thai"]), key=thai_rank)]
+        self._thai_set = set(self._thai_fonts)
+
+    def load(self, force=False):
+        """
+        Build the index, from disk if the font directories are unchanged.
+
+        Args:
+            force: Rescan even if the index is already loaded
+        """
+        with self._lock:
+            if self._loaded and not force:
+                return
+            dir_mtimes = _scan_directory_mtimes(self.directories)
+            cached_fonts, up_to_date = (None, False) if force else self._load_index(dir_mtimes)
+            if up_to_date:
+                self.fonts = cached_fonts
+                logger.info(f"Loaded font index with {len(self.fonts)} fonts from {self.index_path}")
+            else:
+                self.fonts = self._scan(cached_fonts)
+                self._save_index(dir_mtimes)
+                logger.info(f"Indexed {len(self.fonts)} fonts in {len(dir_mtimes)} directories")
+            self._build_lookups()
+            self._loaded = True
+
+    def find(self, name, style=None):
+        """
+        Find the font file for a font name.
+
+        Args:
+            name: Font file path, file name (e.g. 'Sarabun-Bold.ttf'), file stem or family name
+                  (e.g. 'Noto Sans Thai')
+            style: Optional style name (e.g. 'Bold') for family lookups
+
+        Returns:
+            Path to the font file, or None if no font matches
+        """
+        if not name:
+            return None
+        if os.path.isfile(name):
+            return name
+        self.load()
+        key = _normalize(name)
+        if style:
+            path = self._by_name.get(key + _normalize(style))
+            if path:
+                return path
+        return self._by_name.get(name.lower()) or self._by_name.get(key)
+
+    def has_thai(self, font_path):
+        """Check whether an indexed font covers the Thai script."""
+        self.load()
+        return font_path in self._thai_set
+
+    def thai_fonts(self):
+        """
+        List the fonts that cover the Thai script, best choice first.
+
+        Returns:
+            List of font file paths
+        """
+        self.load()
+        return list(self._thai_fonts)
+
+    def default_thai_font(self):
+        """
+        Get the preferred Thai font.
+
+        Returns:
+            Path to the font file, or None if no Thai font is installed
+        """
+        self.load()
+        return self._thai_fonts[0] if self._thai_fonts else None
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_font_registry():
+    """
+    Get the process-wide font registry.
+
+    Returns:
+        FontRegistry instance
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = FontRegistry()
+    return _registry
+
+def find_font(name, style=None):
+    """Find the font file for a font name, see FontRegistry.find."""
+    return get_font_registry().find(name, style)
+
+def find_thai_fonts():
+    """List the fonts that cover the Thai script, best choice first."""
+    return get_font_registry().thai_fonts()
+
+def find_thai_font():
+    """Get the preferred Thai font file, or None if no Thai font is installed."""
+    return get_font_registry().default_thai_font()
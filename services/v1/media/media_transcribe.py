@@ -1,4 +1,5 @@
 import os
+import time
 import whisper
 import srt
 import json
@@ -6,7 +7,11 @@ import unicodedata
 import re
 from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
-from services.file_management import download_file
+from services.file_management import download_file, job_workspace
+from services.v1.subtitles.script_aligner import time_script_spans
+from services import metrics
+from services.job_progress import publish
+from services.cancellation import raise_if_cancelled
 import logging
 from typing import Dict, List, Optional, Union, Any
 
@@ -14,9 +19,6 @@ from typing import Dict, List, Optional, Union, Any
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
-
 # Thai language specific constants
 THAI_CONSONANTS = 'กขฃคฅฆงจฉชซฌญฎฏฐฑฒณดตถทธนบปผฝพฟภมยรลวศษสหฬอฮ'
 THAI_VOWELS = 'ะัาำิีึืุูเแโใไๅ'
@@ -157,8 +159,9 @@ def postprocess_thai_text(text):
 
 def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id):
     """Transcribe or translate media and return the transcript/translation, SRT or VTT file path."""
+    workspace = job_workspace(job_id)
     logger.info(f"Starting {task} for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    input_filename = download_file(media_url, os.path.join(workspace, 'input_media'), job_id=job_id)
     
     if not input_filename:
         raise ValueError("Failed to download media file")
@@ -183,6 +186,8 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if word_timestamps:
             options["word_timestamps"] = True
         
+        inference_start = time.time()
+        
         # For Thai language, optimize processing to prevent timeouts
         if is_thai:
             logger.info("Thai language detected - using optimized processing settings")
@@ -218,7 +223,10 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
             full_text = ""
             
             for i, chunk_file in enumerate(chunk_files):
+                raise_if_cancelled(job_id)
                 logger.info(f"Processing chunk {i+1}/{len(chunk_files)}")
+                publish(job_id, "transcribe", state="start" if i == 0 else "running", chunk=i + 1, chunks=len(chunk_files),
+                        percent=round(i * 100 / len(chunk_files), 1))
                 chunk_result = model.transcribe(chunk_file, **options)
                 
                 # Adjust timestamps for this chunk
@@ -270,8 +278,12 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
             
         else:
             # For non-Thai languages, use the standard approach
+            publish(job_id, "transcribe", state="start", chunk=1, chunks=1, percent=0.0)
             result = model.transcribe(input_filename, **options)
         
+        metrics.observe_transcription("local_whisper", time.time() - inference_start, metrics.segments_duration(result['segments']))
+        publish(job_id, "transcribe", state="end", percent=100.0)
+        
         # Process Thai text to ensure proper encoding and spacing
         if is_thai:
             logger.info("Processing Thai text to ensure proper encoding")
@@ -293,14 +305,14 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         
         if include_text:
             # Generate text file
-            text_file = os.path.join(STORAGE_PATH, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}.txt")
+            text_file = os.path.join(workspace, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}.txt")
             with open(text_file, 'w', encoding='utf-8') as f:
                 f.write(result['text'])
             output_files['text'] = text_file
         
         if include_srt:
             # Generate SRT file
-            srt_file = os.path.join(STORAGE_PATH, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}.srt")
+            srt_file = os.path.join(workspace, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}.srt")
             
             # Ensure segments are sorted by start time
             sorted_segments = sorted(result['segments'], key=lambda x: x['start'])
@@ -338,7 +350,7 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         
         if include_segments:
             # Generate segments JSON file
-            segments_file = os.path.join(STORAGE_PATH, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}_segments.json")
+            segments_file = os.path.join(workspace, f"{os.path.splitext(os.path.basename(input_filename))[0]}_{task}_segments.json")
             with open(segments_file, 'w', encoding='utf-8') as f:
                 json.dump(result['segments'], f, ensure_ascii=False, indent=2)
             output_files['segments'] = segments_file
@@ -417,11 +429,60 @@ def format_timestamp(seconds):
     milliseconds = int((seconds - int(seconds)) * 1000)
     return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
 
+def retime_script_segments(script_segments, words, is_thai=False, min_duration=0.5):
+    """
+    Time script segments from Whisper word-level timestamps.
+    
+    Every script token is mapped to a timed transcript word (see
+    script_aligner.time_script_tokens); a segment runs from its first to its
+    last token. Segments are kept in order and never overlap.
+    
+    Args:
+        script_segments: List of script segments (sentences)
+        words: Whisper words with word, start and end
+        is_thai: Whether the script is Thai
+        min_duration: Minimum subtitle duration in seconds
+    
+    Returns:
+        List of srt.Subtitle
+    """
+    script_text = ""
+    spans = []
+    for segment in script_segments:
+        if script_text:
+            script_text += "\n"
+        spans.append((len(script_text), len(script_text) + len(segment)))
+        script_text += segment
+    
+    timings = time_script_spans(script_text, spans, words, is_thai=is_thai)
+    
+    subtitles = []
+    previous_end = float(words[0]['start'])
+    for segment, timing in zip(script_segments, timings):
+        start_time, end_time = timing if timing else (previous_end, previous_end)
+        start_time = max(start_time, previous_end)
+        end_time = max(end_time, start_time + min_duration)
+        subtitles.append(
+            srt.Subtitle(
+                index=len(subtitles) + 1,
+                start=timedelta(seconds=start_time),
+                end=timedelta(seconds=end_time),
+                content=segment
+            )
+        )
+        previous_end = end_time
+    
+    return subtitles
+
 def align_script_with_segments(script_text, segments, output_srt_path, language="th"):
     """
     Align a pre-written script with the timing information from transcription segments.
     Optimized for Thai language with character-level alignment.
     
+    When the segments carry word-level timestamps, each script segment is timed
+    from the words it matches; otherwise timing is estimated from segment
+    boundaries and the speaking rate.
+    
     Args:
         script_text: The pre-written script text
         segments: The transcription segments with timing information
@@ -456,9 +517,15 @@ def align_script_with_segments(script_text, segments, output_srt_path, language=
     # Prepare the SRT content
     srt_content = []
     
+    # Word-level timestamps (word_timestamps=True) give every script segment its spoken time
+    words = [word for segment in segments for word in segment.get('words') or [] if 'start' in word and 'end' in word]
+    
+    if words:
+        logger.info(f"Timing script segments from {len(words)} word-level timestamps")
+        srt_content = retime_script_segments(script_segments, words, is_thai=language.lower() in ['th', 'thai'])
     # If we have very few script segments compared to transcription segments,
     # we might need to further split the script segments
-    if len(script_segments) < len(segments) / 2:
+    elif len(script_segments) < len(segments) / 2:
         logger.info("Script has fewer segments than transcription, performing character-level alignment")
         # Character-level alignment approach
         
@@ -2,7 +2,6 @@ import os
 import json
 import srt
 import logging
-import difflib
 import unicodedata
 import datetime
 from datetime import timedelta
@@ -11,13 +10,9 @@ from services.cloud_storage import upload_to_cloud_storage
 import re
 import tempfile
 
-# Import PyThaiNLP for better Thai word segmentation
-try:
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logging.warning("PyThaiNLP not available. Thai word segmentation will be limited.")
+# Shared Thai word segmentation with a memoized tokenizer
+from services.v1.subtitles.thai_tokenizer import PYTHAINLP_AVAILABLE, tokenize as thai_tokenize
+from services.v1.subtitles.script_aligner import CueAlignment, align_script_to_cues
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -146,8 +141,8 @@ def segment_thai_text(text: str) -> List[str]:
     """
     if PYTHAINLP_AVAILABLE:
         try:
-            # Use PyThaiNLP's neural network model for better segmentation
-            words = word_tokenize(text, engine="newmm")
+            # Use PyThaiNLP's dictionary-based newmm segmentation (memoized)
+            words = thai_tokenize(text)
             return words
         except Exception as e:
             logger.warning(f"Error using PyThaiNLP for word segmentation: {str(e)}")
@@ -155,10 +150,21 @@ def segment_thai_text(text: str) -> List[str]:
     # Fallback to simple character segmentation (not ideal but better than nothing)
     return list(text)
 
+def _align_subtitles(script_text: str, subtitles: List[srt.Subtitle], is_thai: bool) -> List[Tuple[srt.Subtitle, CueAlignment]]:
+    """Align the whole script with all subtitles in one pass."""
+    cue_texts = [unicodedata.normalize('NFC', sub.content.strip()) for sub in subtitles]
+    alignments = align_script_to_cues(script_text, cue_texts, is_thai=is_thai)
+    matched = sum(1 for alignment in alignments if alignment.text)
+    logger.info(f"Matched {matched} of {len(subtitles)} subtitles with the script")
+    return list(zip(subtitles, alignments))
+
 def align_thai_text(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt.Subtitle]:
     """
     Align Thai script text with subtitles using improved Thai-specific alignment.
     
+    The script and the subtitles are segmented once and aligned globally (see
+    script_aligner), so long scripts align in linear time.
+    
     Args:
         script_text: The Thai script text
         subtitles: List of subtitle objects
@@ -166,115 +172,24 @@ def align_thai_text(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt
     Returns:
         List of aligned subtitle objects
     """
-    # Create a list to store the aligned subtitles
     aligned_subtitles = []
-    
-    # Current position in the script text
-    script_pos = 0
-    
-    # Pre-segment the script text for better alignment
-    segmented_script = segment_thai_text(script_text)
-    script_with_markers = " ".join(segmented_script)
-    
-    # Process each subtitle
-    for i, sub in enumerate(subtitles):
-        # Skip empty subtitles
+    for sub, alignment in _align_subtitles(script_text, subtitles, is_thai=True):
         if not sub.content.strip():
             aligned_subtitles.append(sub)
             continue
         
-        # Normalize and clean the subtitle content
-        sub_content = unicodedata.normalize('NFC', sub.content.strip())
-        
-        # Segment the subtitle content
-        segmented_sub = segment_thai_text(sub_content)
-        
-        # Find the best match for this subtitle in the script
-        best_match = ""
-        best_score = 0
-        best_pos = script_pos
-        
-        # Try different window sizes around the current position
-        # Use a larger window for better context
-        window_size = max(len(sub_content) * 10, 200)  # Increased window size
-        start_pos = max(0, script_pos - window_size)
-        end_pos = min(len(script_text), script_pos + len(sub_content) + window_size)
-        
-        search_text = script_text[start_pos:end_pos]
-        
-        # Use a combination of approaches for better matching
-        
-        # 1. First try exact matching for short segments
-        if len(sub_content) < 20:
-            exact_match_pos = search_text.find(sub_content)
-            if exact_match_pos >= 0:
-                best_match = sub_content
-                best_score = 1.0
-                best_pos = start_pos + exact_match_pos
-        
-        # 2. If no exact match, use difflib with higher threshold
-        if not best_match:
-            # Use difflib to find the best match with improved algorithm
-            matcher = difflib.SequenceMatcher(None, sub_content, search_text)
-            match = matcher.find_longest_match(0, len(sub_content), 0, len(search_text))
-            
-            if match.size > 0:
-                match_score = match.size / len(sub_content)
-                if match_score > 0.5:  # Increased threshold from default
-                    best_match = search_text[match.b:match.b + match.size]
-                    best_score = match_score
-                    best_pos = start_pos + match.b
-        
-        # 3. If still no good match, try word-level matching
-        if not best_match or best_score < 0.7:
-            # Try matching individual words
-            best_word_matches = []
-            for word in segmented_sub:
-                if word in search_text:
-                    word_pos = search_text.find(word)
-                    best_word_matches.append((word, start_pos + word_pos))
-            
-            if best_word_matches:
-                # Use the script text between the first and last matched word
-                if len(best_word_matches) > 1:
-                    first_match = min(best_word_matches, key=lambda x: x[1])
-                    last_match = max(best_word_matches, key=lambda x: x[1])
-                    first_pos = first_match[1]
-                    last_pos = last_match[1] + len(last_match[0])
-                    
-                    if last_pos - first_pos < len(sub_content) * 2:  # Reasonable length check
-                        best_match = script_text[first_pos:last_pos]
-                        best_score = 0.8  # Consider this a good match
-                        best_pos = first_pos
-        
-        # If we found a good match, use it
-        if best_match and best_score >= 0.5:
-            # Create a new subtitle with the matched script text but keep the timing
-            new_sub = srt.Subtitle(
-                index=sub.index,
-                start=sub.start,
-                end=sub.end,
-                content=best_match
-            )
-            aligned_subtitles.append(new_sub)
-            
-            # Update the position for the next search
-            script_pos = best_pos + len(best_match)
+        if alignment.text:
+            # Use the matched script text but keep the timing
+            content = alignment.text
         else:
             # If no good match found, keep the original subtitle
             # But try to clean it up a bit
-            cleaned_content = sub_content
+            content = unicodedata.normalize('NFC', sub.content.strip())
             # Remove common hallucination patterns
-            cleaned_content = re.sub(r'minecraft', '', cleaned_content)
-            cleaned_content = re.sub(r'and\s*$', '', cleaned_content)
-            
-            new_sub = srt.Subtitle(
-                index=sub.index,
-                start=sub.start,
-                end=sub.end,
-                content=cleaned_content
-            )
-            aligned_subtitles.append(new_sub)
+            content = re.sub(r'minecraft', '', content)
+            content = re.sub(r'and\s*$', '', content)
+        
+        aligned_subtitles.append(srt.Subtitle(index=sub.index, start=sub.start, end=sub.end, content=content))
     
     return aligned_subtitles
 
@@ -289,63 +204,13 @@ def align_standard_text(script_text: str, subtitles: List[srt.Subtitle]) -> List
     Returns:
         List of aligned subtitle objects
     """
-    # Create a list to store the aligned subtitles
     aligned_subtitles = []
-    
-    # Split the script into words
-    script_words = script_text.split()
-    
-    # Current position in the script words
-    script_pos = 0
-    
-    # Process each subtitle
-    for sub in subtitles:
-        # Skip empty subtitles
-        if not sub.content.strip():
-            aligned_subtitles.append(sub)
-            continue
-        
-        # Split the subtitle content into words
-        sub_words = sub.content.split()
-        
-        # Find the best match for this subtitle in the script
-        best_match = ""
-        best_score = 0
-        best_pos = script_pos
-        
-        # Try different positions in the script
-        for pos in range(max(0, script_pos - 10), min(len(script_words), script_pos + len(sub_words) + 10)):
-            # Don't go past the end of the script
-            if pos + len(sub_words) > len(script_words):
-                break
-                
-            # Get the potential match
-            potential_match = ' '.join(script_words[pos:pos + len(sub_words)])
-            
-            # Calculate the similarity score
-            matcher = difflib.SequenceMatcher(None, sub.content.lower(), potential_match.lower())
-            score = matcher.ratio()
-            
-            # Update the best match if this is better
-            if score > best_score:
-                best_match = potential_match
-                best_score = score
-                best_pos = pos
-        
-        # If we found a good match, use it
-        if best_score > 0.6:
-            new_sub = srt.Subtitle(
-                index=sub.index,
-                start=sub.start,
-                end=sub.end,
-                content=best_match
-            )
-            aligned_subtitles.append(new_sub)
-            script_pos = best_pos + len(sub_words)
+    for sub, alignment in _align_subtitles(script_text, subtitles, is_thai=False):
+        if alignment.text:
+            aligned_subtitles.append(srt.Subtitle(index=sub.index, start=sub.start, end=sub.end, content=alignment.text))
         else:
             # If no good match, keep the original subtitle
             aligned_subtitles.append(sub)
-            # Don't advance script_pos in this case
     
     return aligned_subtitles
 
@@ -1,12 +1,15 @@
 import os
 import json
 import logging
-import subprocess
 import tempfile
 from typing import List, Dict, Tuple, Optional
+from services import metrics
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
+from services.job_progress import publish
 
 logger = logging.getLogger(__name__)
 
+@metrics.timed_transcription("openai_whisper")
 def transcribe_with_whisper(video_path: str, language: str = "en", job_id: str = None) -> List[Dict]:
     """
     Transcribe a video using OpenAI's Whisper API.
@@ -34,7 +37,7 @@ def transcribe_with_whisper(video_path: str, language: str = "en", job_id: str =
         ]
         
         logger.info(f"Extracting audio with command: {' '.join(extract_cmd)}")
-        subprocess.run(extract_cmd, check=True)
+        run_ffmpeg(extract_cmd, operation="audio_extract", job_id=job_id)
         
         try:
             # Import OpenAI here to avoid loading it unless needed
@@ -53,6 +56,7 @@ def transcribe_with_whisper(video_path: str, language: str = "en", job_id: str =
             with open(audio_path, "rb") as audio_file:
                 # Call the OpenAI Whisper API
                 logger.info("Calling OpenAI Whisper API")
+                publish(job_id, "transcribe", state="start", chunk=1, chunks=1, percent=0.0)
                 response = openai.Audio.transcribe(
                     model="whisper-1",
                     file=audio_file,
@@ -77,6 +81,7 @@ def transcribe_with_whisper(video_path: str, language: str = "en", job_id: str =
                 })
                 
             logger.info(f"Transcription completed with {len(formatted_segments)} segments")
+            publish(job_id, "transcribe", state="end", chunk=1, chunks=1, percent=100.0)
             
             # Clean up temporary files
             os.remove(audio_path)
@@ -95,7 +100,8 @@ def transcribe_with_whisper(video_path: str, language: str = "en", job_id: str =
             segments = transcribe_with_replicate(
                 audio_url=audio_path,  # Pass the local file path
                 language=language,
-                batch_size=64
+                batch_size=64,
+                job_id=job_id
             )
             
             # Clean up temporary files
@@ -1,25 +1,26 @@
 import os
 import ffmpeg
 import requests
-from services.file_management import download_file
-
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
+from services.file_management import download_file, job_workspace
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
 
 def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
     """Convert media to MP3 format with specified bitrate."""
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input"))
+    workspace = job_workspace(job_id)
+    input_filename = download_file(media_url, os.path.join(workspace, f"{job_id}_input"), job_id=job_id)
     output_filename = f"{job_id}.mp3"
-    output_path = os.path.join(STORAGE_PATH, output_filename)
+    output_path = os.path.join(workspace, output_filename)
 
     try:
         # Convert media file to MP3 with specified bitrate
-        (
+        run_ffmpeg(
             ffmpeg
             .input(input_filename)
             .output(output_path, acodec='libmp3lame', audio_bitrate=bitrate)
             .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+            .compile(),
+            operation="media_to_mp3",
+            job_id=job_id
         )
         os.remove(input_filename)
         print(f"Conversion successful: {output_path} with bitrate {bitrate}")
@@ -36,19 +37,20 @@ def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
 
 def process_video_combination(media_urls, job_id, webhook_url=None):
     """Combine multiple videos into one."""
+    workspace = job_workspace(job_id)
     input_files = []
     output_filename = f"{job_id}.mp4"
-    output_path = os.path.join(STORAGE_PATH, output_filename)
+    output_path = os.path.join(workspace, output_filename)
 
     try:
         # Download all media files
         for i, media_item in enumerate(media_urls):
             url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
+            input_filename = download_file(url, os.path.join(workspace, f"{job_id}_input_{i}"))
             input_files.append(input_filename)
 
         # Generate an absolute path concat list file for FFmpeg
-        concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
+        concat_file_path = os.path.join(workspace, f"{job_id}_concat_list.txt")
         with open(concat_file_path, 'w') as concat_file:
             for input_file in input_files:
                 # Write absolute paths to the concat list
@@ -0,0 +1,234 @@
+import re
+import logging
+from itertools import islice
+from services.v1.subtitles.thai_tokenizer import PYTHAINLP_AVAILABLE, tokenize_batch as thai_tokenize_batch
+from services.v1.subtitles.thai_line_breaker import PIL_AVAILABLE, wrap_text_to_width
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cues are tokenized and written in batches of this size, which bounds memory for long transcripts
+CUE_BATCH_SIZE = 2000
+
+# Output is written through a large buffer instead of one small write per line
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Thai lines default to 40 characters and at least 10 words per line
+THAI_MAX_WIDTH = 40
+THAI_MIN_WORDS_PER_LINE = 10
+
+_TIMING_RE = re.compile(
+    r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+
+ASS_EVENTS_FORMAT = "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+
+def _timestamp_ms(hours, minutes, seconds, millis):
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis.ljust(3, "0"))
+
+def iter_srt_cues(srt_path):
+    """
+    Lazily read cues from an SRT file.
+
+    The file is read line by line and each cue is yielded as soon as its block
+    ends, so the whole file is never held in memory.
+
+    Args:
+        srt_path: Path to the SRT file
+
+    Yields:
+        Tuples of (start_ms, end_ms, text)
+    """
+    with open(srt_path, "r", encoding="utf-8-sig") as f:
+        timing = None
+        text_lines = []
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                if timing and text_lines:
+                    yield timing[0], timing[1], "\n".join(text_lines)
+                timing = None
+                text_lines = []
+                continue
+            if timing is None:
+                match = _TIMING_RE.search(line)
+                if match:
+                    groups = match.groups()
+                    timing = (_timestamp_ms(*groups[:4]), _timestamp_ms(*groups[4:]))
+                # Lines before the timing line are the cue number
+                continue
+            text_lines.append(line)
+        if timing and text_lines:
+            yield timing[0], timing[1], "\n".join(text_lines)
+
+def format_ass_time(milliseconds):
+    """Format milliseconds as an ASS timestamp (h:mm:ss.cc)."""
+    centiseconds = int(milliseconds) // 10
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
+
+def to_ass_color(color, default_alpha="00", named=None):
+    """
+    Convert a #RRGGBB or #AARRGGBB colour to ASS &HAABBGGRR.
+
+    ASS colours are returned unchanged; named colours are looked up in `named`.
+    """
+    if not color:
+        return color
+    if color.startswith("&H"):
+        return color
+    if color.startswith("#"):
+        value = color.lstrip("#")
+        if len(value) == 8:
+            a, r, g, b = value[0:2], value[2:4], value[4:6], value[6:8]
+            return f"&H{a}{b}{g}{r}"
+        if len(value) == 6:
+            r, g, b = value[0:2], value[2:4], value[4:6]
+            return f"&H{default_alpha}{b}{g}{r}"
+        return color
+    return (named or {}).get(color.lower(), color)
+
+def build_thai_ass_header(font_name, font_size=24, primary_color="white", outline_color="black",
+                          back_color=None, alignment=2, margin_v=30):
+    """
+    Build the script info, style and events header of a Thai ASS file.
+
+    Args:
+        font_name: Font name
+        font_size: Font size in PlayRes (1920x1080) pixels
+        primary_color: Text colour
+        outline_color: Outline colour
+        back_color: Box colour (defaults to semi-transparent black)
+        alignment: ASS alignment (numpad layout)
+        margin_v: Vertical margin
+
+    Returns:
+        Header text, ending with the events format line
+    """
+    primary_color = to_ass_color(primary_color, named={"white": "&H00FFFFFF"})
+    outline_color = to_ass_color(outline_color, named={"black": "&H00000000"})
+    # Semi-transparent box unless a colour is given; colours without alpha get 50% transparency
+    back_color = to_ass_color(back_color, default_alpha="80") if back_color else "&H80000000"
+
+    # BorderStyle 4 draws a box behind the text, the outline is thicker and text is bold for Thai
+    border_style = 4
+    outline_size = 3.5
+
+    return (
+        "[Script Info]\n"
+        "Title: Auto-generated Thai subtitles\n"
+        "ScriptType: v4.00+\n"
+        "WrapStyle: 0\n"
+        "ScaledBorderAndShadow: yes\n"
+        "YCbCr Matrix: TV.601\n"
+        "PlayResX: 1920\n"
+        "PlayResY: 1080\n\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{font_name},{font_size},{primary_color},{primary_color},{outline_color},{back_color},1,0,0,0,100,100,0,0,{border_style},{outline_size},2,{alignment},20,20,{margin_v},1\n\n"
+        "[Events]\n"
+        + ASS_EVENTS_FORMAT
+    )
+
+def break_words_into_lines(words, max_width, max_words_per_line):
+    """
+    Greedily break tokens into lines by character count and word count.
+
+    Args:
+        words: List of tokens
+        max_width: Maximum characters per line (falsy for no limit)
+        max_words_per_line: Maximum tokens per line (falsy for no limit)
+
+    Returns:
+        List of lines
+    """
+    lines = []
+    current_line = ""
+    current_word_count = 0
+    for word in words:
+        if (max_width and len(current_line) + len(word) > max_width) or \
+           (max_words_per_line and current_word_count >= max_words_per_line):
+            lines.append(current_line)
+            current_line = word
+            current_word_count = 1
+        else:
+            current_line += word
+            current_word_count += 1
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+def transcode_srt_to_ass(srt_path, ass_path, font_name, font_size=24, primary_color="white", outline_color="black",
+                         back_color=None, alignment=2, margin_v=30, max_words_per_line=7, max_width=None,
+                         max_width_px=None, measure_font_path=None, batch_size=CUE_BATCH_SIZE):
+    """
+    Stream an SRT file into a Thai-styled ASS file.
+
+    Cues are parsed lazily and handled in batches: each batch is tokenized with
+    one tokenize_batch call, formatted, and written through a buffered file. The
+    header and wrapping parameters are computed once.
+
+    Args:
+        srt_path: Path to the SRT file
+        ass_path: Path to the ASS file to write
+        font_name: Font name for the ASS style
+        font_size: Font size in PlayRes pixels
+        primary_color: Text colour
+        outline_color: Outline colour
+        back_color: Box colour
+        alignment: ASS alignment
+        margin_v: Vertical margin
+        max_words_per_line: Maximum words per line
+        max_width: Maximum characters per line
+        max_width_px: Maximum line width in PlayRes pixels (needs measure_font_path)
+        measure_font_path: Font file used to measure lines for max_width_px
+        batch_size: Number of cues tokenized and written at a time
+
+    Returns:
+        Number of cues written
+    """
+    pixel_wrap = bool(max_width_px and measure_font_path and PIL_AVAILABLE)
+    if PYTHAINLP_AVAILABLE and not pixel_wrap:
+        # Thai needs a conservative width and more words per line to show the whole text
+        max_width = max_width or THAI_MAX_WIDTH
+        if max_words_per_line < THAI_MIN_WORDS_PER_LINE:
+            max_words_per_line = THAI_MIN_WORDS_PER_LINE
+    elif not PYTHAINLP_AVAILABLE:
+        logger.warning("PyThaiNLP not available, using original text without word segmentation")
+
+    # Box border, shadow and bold for better visibility of Thai text
+    override = "{\\bord3.5\\shad2\\b1}"
+    cues = iter_srt_cues(srt_path)
+    count = 0
+
+    with open(ass_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(build_thai_ass_header(font_name, font_size, primary_color, outline_color, back_color, alignment, margin_v))
+
+        while True:
+            batch = list(islice(cues, batch_size))
+            if not batch:
+                break
+
+            if PYTHAINLP_AVAILABLE:
+                tokenized = thai_tokenize_batch([text for _, _, text in batch])
+            else:
+                tokenized = [None] * len(batch)
+
+            output = []
+            for (start_ms, end_ms, text), words in zip(batch, tokenized):
+                if pixel_wrap:
+                    # Break at word boundaries so every line fits the pixel width
+                    text = "\\N".join(wrap_text_to_width(text, measure_font_path, font_size, max_width_px, tokens=words))
+                elif words is not None:
+                    text = "\\N".join(break_words_into_lines(words, max_width, max_words_per_line))
+                # Multi-line cues would otherwise end the dialogue line early
+                text = text.replace("\n", "\\N")
+                output.append(f"Dialogue: 0,{format_ass_time(start_ms)},{format_ass_time(end_ms)},Default,,0,0,{margin_v},,{override}{text}\n")
+
+            f.writelines(output)
+            count += len(batch)
+            logger.debug(f"Wrote {count} subtitle events to {ass_path}")
+
+    return count
@@ -0,0 +1,338 @@
+import re
+import bisect
+import difflib
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+from services.v1.subtitles.thai_tokenizer import tokenize as thai_tokenize, tokenize_batch as thai_tokenize_batch
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Anchors are n-grams of this many tokens that occur exactly once in both sequences
+ANCHOR_NGRAM = 3
+
+# Gaps between anchors at most this large (script tokens x transcript tokens) are aligned with a local diff
+LOCAL_ALIGN_MAX_CELLS = 4096
+
+# Cues with fewer matched tokens than this fraction keep their transcribed text
+MIN_CONFIDENCE = 0.5
+
+THAI_PATTERN = re.compile(r'[\u0E00-\u0E7F]')
+_WORD_RE = re.compile(r'\S+')
+_PUNCTUATION_RE = re.compile(r'[^\w\u0E00-\u0E7F]+')
+
+@dataclass
+class CueAlignment:
+    """
+    The part of the script that matches one transcript cue.
+
+    char_start and char_end index the script text; they are None when the cue
+    could not be placed in the script.
+    """
+    index: int
+    char_start: Optional[int]
+    char_end: Optional[int]
+    text: Optional[str]
+    confidence: float
+
+def normalize_token(token):
+    """Normalize a token for matching: NFC, lower case, no punctuation."""
+    return _PUNCTUATION_RE.sub('', unicodedata.normalize('NFC', token).lower())
+
+def _token_spans(text, tokens):
+    """Locate tokens in text, skipping whitespace and tokens that are only punctuation."""
+    spans = []
+    position = 0
+    for token in tokens:
+        start = text.find(token, position)
+        if start < 0:
+            continue
+        position = start + len(token)
+        normalized = normalize_token(token)
+        if normalized:
+            spans.append((normalized, start, position))
+    return spans
+
+def tokenize_with_spans(text, is_thai=None):
+    """
+    Split text into normalized tokens with their character offsets.
+
+    Thai text is segmented with the shared Thai tokenizer, other text on whitespace.
+
+    Args:
+        text: Text to tokenize
+        is_thai: Force Thai segmentation on or off (detected from the text by default)
+
+    Returns:
+        List of (normalized_token, char_start, char_end) tuples
+    """
+    if is_thai is None:
+        is_thai = bool(THAI_PATTERN.search(text))
+    if is_thai:
+        return _token_spans(text, thai_tokenize(text))
+    return _token_spans(text, [match.group(0) for match in _WORD_RE.finditer(text)])
+
+def _unique_ngrams(tokens, lo, hi, n):
+    """Map each n-gram occurring exactly once in tokens[lo:hi] to its position."""
+    positions = {}
+    for i in range(lo, hi - n + 1):
+        gram = tuple(tokens[i:i + n])
+        positions[gram] = -1 if gram in positions else i
+    return {gram: i for gram, i in positions.items() if i >= 0}
+
+def _longest_increasing_chain(pairs):
+    """
+    Keep the longest chain of (a, b) pairs increasing in both a and b.
+
+    Pairs must be sorted by a. Runs in O(k log k) (patience sorting on b).
+    """
+    tails = []
+    tail_index = []
+    previous = [-1] * len(pairs)
+    for i, (_, b) in enumerate(pairs):
+        k = bisect.bisect_left(tails, b)
+        if k > 0:
+            previous[i] = tail_index[k - 1]
+        if k == len(tails):
+            tails.append(b)
+            tail_index.append(i)
+        else:
+            tails[k] = b
+            tail_index[k] = i
+
+    chain = []
+    i = tail_index[-1] if tail_index else -1
+    while i >= 0:
+        chain.append(pairs[i])
+        i = previous[i]
+    chain.reverse()
+    return chain
+
+def align_token_sequences(source, target, anchor_ngram=ANCHOR_NGRAM, max_local_cells=LOCAL_ALIGN_MAX_CELLS):
+    """
+    Monotonically align two token sequences in near-linear time.
+
+    N-grams that occur exactly once in both sequences are used as anchors; the
+    longest chain of anchors in order on both sides fixes the alignment. The
+    gaps between anchors are aligned again the same way (where rare n-grams
+    become unique), down to single tokens, and gaps small enough are aligned
+    with a local diff. Each token is visited a small number of times, so long
+    scripts align in a single pass instead of one search per cue.
+
+    Args:
+        source: List of normalized tokens (e.g. the script)
+        target: List of normalized tokens (e.g. the transcript)
+        anchor_ngram: Size of the n-grams tried first as anchors
+        max_local_cells: Largest gap (len x len) aligned with a local diff
+
+    Returns:
+        List of (source_index, target_index) pairs of matched tokens, increasing in both
+    """
+    matches = []
+    # Each entry is a gap to align: source range, target range and the anchor size to try
+    stack = [(0, len(source), 0, len(target), anchor_ngram)]
+    while stack:
+        s_lo, s_hi, t_lo, t_hi, n = stack.pop()
+        if s_lo >= s_hi or t_lo >= t_hi:
+            continue
+
+        if (s_hi - s_lo) * (t_hi - t_lo) <= max_local_cells:
+            matcher = difflib.SequenceMatcher(None, source[s_lo:s_hi], target[t_lo:t_hi], autojunk=False)
+            for a, b, size in matcher.get_matching_blocks():
+                matches.extend((s_lo + a + k, t_lo + b + k) for k in range(size))
+            continue
+
+        source_grams = _unique_ngrams(source, s_lo, s_hi, n)
+        target_grams = _unique_ngrams(target, t_lo, t_hi, n)
+        pairs = sorted((i, target_grams[gram]) for gram, i in source_grams.items() if gram in target_grams)
+        chain = _longest_increasing_chain(pairs)
+        if not chain:
+            if n > 1:
+                stack.append((s_lo, s_hi, t_lo, t_hi, n - 1))
+            continue
+
+        # Anchored n-grams are matched; the gaps between them are aligned on their own
+        previous_s, previous_t = s_lo, t_lo
+        for s, t in chain:
+            if s < previous_s or t < previous_t:
+                # Overlaps the previous anchor
+                continue
+            stack.append((previous_s, s, previous_t, t, n))
+            matches.extend((s + k, t + k) for k in range(n))
+            previous_s, previous_t = s + n, t + n
+        stack.append((previous_s, s_hi, previous_t, t_hi, n))
+
+    matches.sort()
+    return matches
+
+def align_script_to_cues(script_text, cue_texts, is_thai=None, min_confidence=MIN_CONFIDENCE):
+    """
+    Find the span of the script spoken in each transcript cue.
+
+    The script and all cues are tokenized once and aligned globally with
+    align_token_sequences. Each cue gets the script text from its first to its
+    last matched token; script words that were not transcribed are attached to
+    the cue before them, so consecutive cues cover the script without gaps.
+
+    Args:
+        script_text: The accurate script
+        cue_texts: List of transcribed cue texts, in time order
+        is_thai: Force Thai segmentation on or off (detected from the script by default)
+        min_confidence: Cues with a smaller fraction of matched tokens get no span
+
+    Returns:
+        List of CueAlignment, one per cue
+    """
+    if is_thai is None:
+        is_thai = bool(THAI_PATTERN.search(script_text))
+
+    script_tokens = tokenize_with_spans(script_text, is_thai)
+    if is_thai:
+        tokenized_cues = [_token_spans(text, tokens) for text, tokens in zip(cue_texts, thai_tokenize_batch(cue_texts))]
+    else:
+        tokenized_cues = [tokenize_with_spans(text, False) for text in cue_texts]
+
+    transcript = []
+    token_cue = []
+    for cue_index, tokens in enumerate(tokenized_cues):
+        transcript.extend(token for token, _, _ in tokens)
+        token_cue.extend([cue_index] * len(tokens))
+
+    matches = align_token_sequences([token for token, _, _ in script_tokens], transcript)
+    logger.info(f"Aligned {len(matches)} of {len(transcript)} transcript tokens with {len(script_tokens)} script tokens")
+
+    first = [None] * len(cue_texts)
+    last = [None] * len(cue_texts)
+    matched = [0] * len(cue_texts)
+    for script_index, transcript_index in matches:
+        cue_index = token_cue[transcript_index]
+        if first[cue_index] is None:
+            first[cue_index] = script_index
+        last[cue_index] = script_index
+        matched[cue_index] += 1
+
+    accepted = [
+        bool(tokens) and first[i] is not None and matched[i] / len(tokens) >= min_confidence
+        for i, tokens in enumerate(tokenized_cues)
+    ]
+
+    alignments = []
+    for i, tokens in enumerate(tokenized_cues):
+        confidence = matched[i] / len(tokens) if tokens else 0.0
+        if not accepted[i]:
+            alignments.append(CueAlignment(i, None, None, None, confidence))
+            continue
+
+        char_start = script_tokens[first[i]][1]
+        end_token = last[i]
+        # Untranscribed script words up to the next placed cue belong to this cue
+        if i + 1 < len(cue_texts) and accepted[i + 1]:
+            end_token = first[i + 1] - 1
+        char_end = script_tokens[end_token][2]
+        alignments.append(CueAlignment(i, char_start, char_end, script_text[char_start:char_end].strip(), confidence))
+
+    return alignments
+
+def _interpolate_run(times, spans, lo, hi, start, end):
+    """Spread unmatched tokens lo..hi-1 evenly by character length over [start, end]."""
+    total = sum(spans[i][2] - spans[i][1] for i in range(lo, hi)) or 1
+    position = start
+    for i in range(lo, hi):
+        duration = (end - start) * (spans[i][2] - spans[i][1]) / total
+        times[i] = (position, position + duration)
+        position += duration
+
+def time_script_tokens(script_text, words, is_thai=None):
+    """
+    Time every script token from word-level transcription timestamps.
+
+    The transcript words are joined and tokenized like the script, aligned
+    with align_token_sequences, and each matched script token takes the time
+    of the transcribed word it matched. Unmatched script tokens are spread over
+    the time between their matched neighbours, so timing never drifts beyond
+    the nearest matched word.
+
+    Args:
+        script_text: The accurate script
+        words: Whisper words, dictionaries with word, start and end (seconds)
+        is_thai: Force Thai segmentation on or off (detected from the script by default)
+
+    Returns:
+        Tuple (script_tokens, times): the (normalized_token, char_start, char_end)
+        tokens of the script and a (start, end) pair for each of them
+    """
+    if is_thai is None:
+        is_thai = bool(THAI_PATTERN.search(script_text))
+
+    # Join the words and remember which word each character belongs to
+    parts = []
+    word_starts = []
+    length = 0
+    for word in words:
+        text = word.get("word", "")
+        word_starts.append(length)
+        parts.append(text)
+        length += len(text)
+    transcript_text = "".join(parts)
+
+    script_tokens = tokenize_with_spans(script_text, is_thai)
+    transcript_tokens = tokenize_with_spans(transcript_text, is_thai)
+    token_word = [bisect.bisect_right(word_starts, start) - 1 for _, start, _ in transcript_tokens]
+
+    matches = align_token_sequences([token for token, _, _ in script_tokens], [token for token, _, _ in transcript_tokens])
+    logger.info(f"Timed {len(matches)} of {len(script_tokens)} script tokens from {len(words)} transcribed words")
+
+    times = [None] * len(script_tokens)
+    for script_index, transcript_index in matches:
+        word = words[token_word[transcript_index]]
+        times[script_index] = (float(word["start"]), float(word["end"]))
+
+    if not script_tokens:
+        return script_tokens, times
+    if not matches:
+        if words:
+            _interpolate_run(times, script_tokens, 0, len(times), float(words[0]["start"]), float(words[-1]["end"]))
+        return script_tokens, times
+
+    # Fill unmatched runs between matched tokens, and before the first and after the last
+    run_start = 0
+    previous_end = min(float(words[0]["start"]), times[matches[0][0]][0])
+    for i, timing in enumerate(times + [None]):
+        if i < len(times) and timing is None:
+            continue
+        if i > run_start:
+            next_start = timing[0] if timing else max(float(words[-1]["end"]), previous_end)
+            _interpolate_run(times, script_tokens, run_start, i, previous_end, max(next_start, previous_end))
+        if timing:
+            previous_end = max(previous_end, timing[1])
+        run_start = i + 1
+
+    return script_tokens, times
+
+def time_script_spans(script_text, spans, words, is_thai=None):
+    """
+    Time spans of the script (sentences, subtitle lines) from word-level timestamps.
+
+    Args:
+        script_text: The accurate script
+        spans: List of (char_start, char_end) ranges of script_text
+        words: Whisper words, dictionaries with word, start and end (seconds)
+        is_thai: Force Thai segmentation on or off (detected from the script by default)
+
+    Returns:
+        List of (start, end) seconds per span, or None for spans without any token
+    """
+    script_tokens, times = time_script_tokens(script_text, words, is_thai)
+    token_starts = [start for _, start, _ in script_tokens]
+
+    timings = []
+    for char_start, char_end in spans:
+        lo = bisect.bisect_left(token_starts, char_start)
+        hi = bisect.bisect_left(token_starts, char_end)
+        if lo >= hi or times[lo] is None:
+            timings.append(None)
+            continue
+        timings.append((times[lo][0], max(times[i][1] for i in range(lo, hi))))
+    return timings
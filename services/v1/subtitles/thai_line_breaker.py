@@ -0,0 +1,202 @@
+import logging
+import threading
+import unicodedata
+from services.v1.subtitles.thai_tokenizer import tokenize as thai_tokenize
+from services.v1.fonts.font_cache import PIL_AVAILABLE, load_font
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+if not PIL_AVAILABLE:
+    logger.warning("Pillow not available. Pixel-accurate line breaking is disabled.")
+
+# Advance tables are kept per (font path, size); a handful of styles is typical per deployment
+MAX_FONT_METRICS = 32
+
+_metrics_cache = {}
+_metrics_lock = threading.Lock()
+
+class FontMetrics:
+    """
+    Cached text advances for one font at one size.
+
+    Single characters and whole tokens are measured once with FreeType (through
+    Raqm when available, so Thai vowels and tone marks are shaped correctly) and
+    then looked up from the advance tables.
+    """
+
+    def __init__(self, font_path, font_size):
+        self.font_path = font_path
+        self.font_size = font_size
+        self.font = load_font(font_path, font_size)
+        self._char_advances = {}
+        self._token_advances = {}
+        self._lock = threading.Lock()
+
+    def char_advance(self, char):
+        advance = self._char_advances.get(char)
+        if advance is None:
+            # Combining vowels and tone marks sit on the previous glyph and take no width
+            if unicodedata.combining(char) or unicodedata.category(char) == "Mn":
+                advance = 0.0
+            else:
+                advance = self.font.getlength(char)
+            with self._lock:
+                self._char_advances[char] = advance
+        return advance
+
+    def token_advance(self, token):
+        advance = self._token_advances.get(token)
+        if advance is None:
+            advance = self.font.getlength(token) if token else 0.0
+            with self._lock:
+                self._token_advances[token] = advance
+        return advance
+
+def get_font_metrics(font_path, font_size):
+    """
+    Get the cached advance tables for a font and size.
+
+    Args:
+        font_path: Path to the font file
+        font_size: Font size in pixels
+
+    Returns:
+        FontMetrics instance
+    """
+    key = (font_path, int(font_size))
+    with _metrics_lock:
+        metrics = _metrics_cache.get(key)
+        if metrics is None:
+            if len(_metrics_cache) >= MAX_FONT_METRICS:
+                _metrics_cache.pop(next(iter(_metrics_cache)))
+            metrics = FontMetrics(font_path, int(font_size))
+            _metrics_cache[key] = metrics
+            logger.info(f"Loaded font metrics for {font_path} at {font_size}px")
+    return metrics
+
+def _split_graphemes(token):
+    """Split a token into clusters of a base character plus its combining marks."""
+    clusters = []
+    for char in token:
+        if clusters and (unicodedata.combining(char) or unicodedata.category(char) == "Mn"):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+def _fit_tokens(tokens, metrics, max_width):
+    """Break tokens that are wider than a whole line into grapheme clusters."""
+    fitted = []
+    for token in tokens:
+        if metrics.token_advance(token) <= max_width:
+            fitted.append(token)
+            continue
+        piece = ""
+        piece_width = 0.0
+        for cluster in _split_graphemes(token):
+            cluster_width = sum(metrics.char_advance(char) for char in cluster)
+            if piece and piece_width + cluster_width > max_width:
+                fitted.append(piece)
+                piece = cluster
+                piece_width = cluster_width
+            else:
+                piece += cluster
+                piece_width += cluster_width
+        if piece:
+            fitted.append(piece)
+    return fitted
+
+def break_tokens(tokens, widths, max_width):
+    """
+    Break a token sequence into lines with minimum raggedness.
+
+    Uses dynamic programming over break positions. Every line except the last
+    costs the square of its unused width, and no line may exceed max_width.
+    Spaces at line ends are free, so they never force a break.
+
+    Args:
+        tokens: List of tokens
+        widths: Advance width of each token
+        max_width: Maximum line width in pixels
+
+    Returns:
+        List of (start, end) token index ranges, one per line
+    """
+    n = len(tokens)
+    if n == 0:
+        return []
+
+    infinity = float("inf")
+    best = [infinity] * (n + 1)
+    previous = [0] * (n + 1)
+    best[n] = 0.0
+
+    # Solve from the end so the last line is free
+    for i in range(n - 1, -1, -1):
+        if tokens[i].isspace():
+            # Never start a line with a space: it belongs to the previous line
+            best[i] = best[i + 1]
+            previous[i] = -1
+            continue
+        line_width = 0.0
+        for j in range(i, n):
+            line_width += widths[j]
+            # Trailing spaces do not take up visible width
+            visible_width = line_width
+            k = j
+            while k > i and tokens[k].isspace():
+                visible_width -= widths[k]
+                k -= 1
+            if visible_width > max_width and j > i:
+                break
+            if j + 1 == n:
+                cost = 0.0
+            else:
+                cost = (max_width - visible_width) ** 2 + best[j + 1]
+            if cost < best[i]:
+                best[i] = cost
+                previous[i] = j + 1
+
+    ranges = []
+    i = 0
+    while i < n:
+        if previous[i] == -1:
+            i += 1
+            continue
+        ranges.append((i, previous[i]))
+        i = previous[i]
+    return ranges
+
+def wrap_text_to_width(text, font_path, font_size, max_width, tokens=None):
+    """
+    Wrap text so each line fits into a pixel width for a given font and size.
+
+    Thai text is broken only at word boundaries from the shared tokenizer;
+    words wider than a whole line are split between grapheme clusters.
+
+    Args:
+        text: Text to wrap
+        font_path: Path to the font file used to render the text
+        font_size: Font size in pixels
+        max_width: Maximum line width in pixels
+        tokens: Optional pre-tokenized text (e.g. from tokenize_batch)
+
+    Returns:
+        List of lines
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    metrics = get_font_metrics(font_path, font_size)
+    lines = []
+    for paragraph in text.split("\n"):
+        paragraph_tokens = tokens if tokens is not None and "\n" not in text else thai_tokenize(paragraph)
+        paragraph_tokens = _fit_tokens(paragraph_tokens, metrics, max_width)
+        widths = [metrics.token_advance(token) for token in paragraph_tokens]
+        for start, end in break_tokens(paragraph_tokens, widths, max_width):
+            line = "".join(paragraph_tokens[start:end]).strip()
+            if line:
+                lines.append(line)
+    return lines
@@ -5,25 +5,27 @@ import re
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Import PyThaiNLP for Thai word segmentation if available
-try:
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logger.warning("PyThaiNLP not available. Using fallback method for Thai word segmentation.")
+# Shared Thai word segmentation with a memoized tokenizer
+from services.v1.subtitles.thai_tokenizer import PYTHAINLP_AVAILABLE, tokenize as thai_tokenize, tokenize_batch as thai_tokenize_batch
+from services.v1.subtitles.thai_line_breaker import PIL_AVAILABLE, wrap_text_to_width
 
 def is_thai_text(text):
     """Check if text contains Thai characters."""
     return any('\u0E00' <= c <= '\u0E7F' for c in text)
 
-def wrap_thai_text(text, max_chars_per_line=30):
+def wrap_thai_text(text, max_chars_per_line=30, font_path=None, font_size=None, max_width_px=None):
     """
     Wrap Thai text to fit within a specified character limit.
     
+    If a font file, font size and pixel width are given, the text is wrapped by
+    measured glyph widths instead, which is exact for Thai vowels and tone marks.
+    
     Args:
         text (str): The text to wrap
         max_chars_per_line (int): Maximum characters per line
+        font_path (str): Font file used to render the text (optional)
+        font_size (int): Font size in pixels (optional)
+        max_width_px (int): Maximum line width in pixels (optional)
         
     Returns:
         list: List of wrapped text lines
@@ -31,6 +33,13 @@ def wrap_thai_text(text, max_chars_per_line=30):
     text = text.strip()
     wrapped_text = []
     
+    if font_path and font_size and max_width_px and PIL_AVAILABLE:
+        try:
+            wrapped_text = wrap_text_to_width(text, font_path, font_size, max_width_px)
+            return wrapped_text or [text]
+        except Exception as e:
+            logger.error(f"Error in pixel-accurate wrapping, falling back to character count: {str(e)}")
+    
     # Check if text contains Thai characters
     is_thai = is_thai_text(text)
     
@@ -57,7 +66,7 @@ def wrap_thai_text(text, max_chars_per_line=30):
                     if len(part) > max_chars_per_line:
                         # Try to use PyThaiNLP for word segmentation if available
                         if PYTHAINLP_AVAILABLE:
-                            words = word_tokenize(part, engine="newmm")
+                            words = thai_tokenize(part)
                             segment_line = ""
                             
                             for word in words:
@@ -98,7 +107,7 @@ def wrap_thai_text(text, max_chars_per_line=30):
             # If PyThaiNLP is available, use it for word segmentation
             if PYTHAINLP_AVAILABLE:
                 try:
-                    words = word_tokenize(text, engine="newmm")
+                    words = thai_tokenize(text)
                     current_line = ""
                     
                     for word in words:
@@ -155,7 +164,7 @@ def wrap_thai_text(text, max_chars_per_line=30):
     
     return wrapped_text
 
-def create_srt_file(path, segments, delay_seconds=0, max_chars_per_line=30):
+def create_srt_file(path, segments, delay_seconds=0, max_chars_per_line=30, font_path=None, font_size=None, max_width_px=None):
     """
     Create an SRT subtitle file from segments with delay and text wrapping.
     
@@ -164,6 +173,9 @@ def create_srt_file(path, segments, delay_seconds=0, max_chars_per_line=30):
         segments: List of segments with start, end, and text
         delay_seconds: Number of seconds to delay all subtitles
         max_chars_per_line: Maximum characters per line for text wrapping
+        font_path: Font file for pixel-accurate wrapping (optional)
+        font_size: Font size in pixels for pixel-accurate wrapping (optional)
+        max_width_px: Maximum line width in pixels for pixel-accurate wrapping (optional)
     
     Returns:
         str: Path to the created SRT file
@@ -176,6 +188,10 @@ def create_srt_file(path, segments, delay_seconds=0, max_chars_per_line=30):
         milliseconds = int((seconds - int(seconds)) * 1000)
         return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
     
+    # Segment all Thai lines in one batch so wrapping hits the tokenizer cache
+    if PYTHAINLP_AVAILABLE:
+        thai_tokenize_batch([segment['text'].strip() for segment in segments if is_thai_text(segment['text'])])
+    
     with open(path, 'w', encoding='utf-8') as f:
         for i, segment in enumerate(segments):
             # Apply delay to start and end times
@@ -188,7 +204,7 @@ def create_srt_file(path, segments, delay_seconds=0, max_chars_per_line=30):
             
             # Wrap text to fit within video frame
             text = segment['text'].strip()
-            wrapped_text = wrap_thai_text(text, max_chars_per_line)
+            wrapped_text = wrap_thai_text(text, max_chars_per_line, font_path=font_path, font_size=font_size, max_width_px=max_width_px)
             
             # Write SRT entry
             f.write(f"{i+1}\n")
@@ -0,0 +1,192 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Import PyThaiNLP for Thai word segmentation if available
+try:
+    from pythainlp.tokenize import word_tokenize
+    PYTHAINLP_AVAILABLE = True
+except ImportError:
+    PYTHAINLP_AVAILABLE = False
+    logger.warning("PyThaiNLP not available. Using fallback method for Thai word segmentation.")
+
+DEFAULT_ENGINE = "newmm"
+
+# Maximum number of distinct (text, engine, dictionary) entries kept in memory
+TOKEN_CACHE_SIZE = int(os.environ.get("THAI_TOKEN_CACHE_SIZE", "50000"))
+
+# Batches with at least this many uncached lines may be split across a process pool
+PROCESS_POOL_THRESHOLD = int(os.environ.get("THAI_TOKEN_POOL_THRESHOLD", "2000"))
+
+_token_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Dictionary tries are expensive to build, so each one is built once per process
+_dict_tries = {}
+_trie_lock = threading.Lock()
+
+def _get_dict_trie(custom_dict=None):
+    """
+    Get the dictionary trie for a custom word list, building it on first use.
+
+    Args:
+        custom_dict: Optional iterable of extra words; None uses the PyThaiNLP default dictionary
+
+    Returns:
+        Tuple of (dict_key, trie). The trie is None for the default dictionary.
+    """
+    if not custom_dict:
+        return None, None
+
+    dict_key = frozenset(custom_dict)
+    with _trie_lock:
+        trie = _dict_tries.get(dict_key)
+        if trie is None:
+            from pythainlp.corpus.common import thai_words
+            from pythainlp.util import dict_trie
+            # Custom words extend the default dictionary rather than replace it
+            trie = dict_trie(dict_source=set(thai_words()) | set(dict_key))
+            _dict_tries[dict_key] = trie
+            logger.info(f"Built Thai dictionary trie with {len(dict_key)} custom words")
+    return dict_key, trie
+
+def _fallback_tokenize(text):
+    """Split on whitespace while keeping the spaces, used when PyThaiNLP is missing."""
+    tokens = []
+    for i, part in enumerate(text.split(" ")):
+        if i > 0:
+            tokens.append(" ")
+        if part:
+            tokens.append(part)
+    return tokens
+
+def _tokenize_uncached(text, engine, trie):
+    if not PYTHAINLP_AVAILABLE:
+        return _fallback_tokenize(text)
+    if trie is not None:
+        return word_tokenize(text, custom_dict=trie, engine=engine)
+    return word_tokenize(text, engine=engine)
+
+def _cache_get(key):
+    with _cache_lock:
+        tokens = _token_cache.get(key)
+        if tokens is None:
+            _cache_stats["misses"] += 1
+            return None
+        _token_cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return tokens
+
+def _cache_put(key, tokens):
+    with _cache_lock:
+        _token_cache[key] = tokens
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+def tokenize(text, engine=DEFAULT_ENGINE, custom_dict=None):
+    """
+    Tokenize Thai text into words, memoizing the result.
+
+    Args:
+        text: Text to tokenize
+        engine: PyThaiNLP tokenizer engine
+        custom_dict: Optional iterable of extra dictionary words
+
+    Returns:
+        List of tokens
+    """
+    if not text:
+        return []
+
+    dict_key, trie = _get_dict_trie(custom_dict)
+    key = (text, engine, dict_key)
+
+    tokens = _cache_get(key)
+    if tokens is None:
+        tokens = tuple(_tokenize_uncached(text, engine, trie))
+        _cache_put(key, tokens)
+    return list(tokens)
+
+def _tokenize_chunk(args):
+    """Process pool worker: tokenize a chunk of lines in a child process."""
+    texts, engine, custom_dict = args
+    _, trie = _get_dict_trie(custom_dict)
+    return [tuple(_tokenize_uncached(text, engine, trie)) for text in texts]
+
+def tokenize_batch(texts, engine=DEFAULT_ENGINE, custom_dict=None, processes=None):
+    """
+    Tokenize all lines of a job in one call.
+
+    Duplicate lines are tokenized once, cached lines are not tokenized again, and
+    very long transcripts can be spread over a process pool.
+
+    Args:
+        texts: Iterable of strings
+        engine: PyThaiNLP tokenizer engine
+        custom_dict: Optional iterable of extra dictionary words
+        processes: Number of worker processes for large batches (None or 1 tokenizes in-process)
+
+    Returns:
+        List of token lists, in the same order as texts
+    """
+    texts = list(texts)
+    dict_key, trie = _get_dict_trie(custom_dict)
+
+    results = {}
+    pending = []
+    for text in dict.fromkeys(texts):
+        if not text:
+            results[text] = ()
+            continue
+        tokens = _cache_get((text, engine, dict_key))
+        if tokens is None:
+            pending.append(text)
+        else:
+            results[text] = tokens
+
+    if pending:
+        if processes and processes > 1 and PYTHAINLP_AVAILABLE and len(pending) >= PROCESS_POOL_THRESHOLD:
+            chunk_size = (len(pending) + processes - 1) // processes
+            chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+            logger.info(f"Tokenizing {len(pending)} lines across {len(chunks)} processes")
+            custom_words = list(dict_key) if dict_key else None
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                chunk_results = executor.map(_tokenize_chunk, [(chunk, engine, custom_words) for chunk in chunks])
+                tokenized = [tokens for chunk in chunk_results for tokens in chunk]
+        else:
+            tokenized = [tuple(_tokenize_uncached(text, engine, trie)) for text in pending]
+
+        for text, tokens in zip(pending, tokenized):
+            results[text] = tokens
+            _cache_put((text, engine, dict_key), tokens)
+
+    return [list(results[text]) for text in texts]
+
+def get_cache_stats():
+    """
+    Get tokenization cache statistics.
+
+    Returns:
+        Dictionary with hits, misses, size and max_size
+    """
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "size": len(_token_cache),
+            "max_size": TOKEN_CACHE_SIZE
+        }
+
+def clear_cache():
+    """Drop all memoized tokenizations."""
+    with _cache_lock:
+        _token_cache.clear()
+        _cache_stats["hits"] = 0
+        _cache_stats["misses"] = 0
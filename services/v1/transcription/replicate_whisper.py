@@ -2,11 +2,14 @@ import os
 import json
 import logging
 import tempfile
-import subprocess
 import requests
 import time
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
+from services import metrics
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
+from services.job_progress import publish
+from services.cancellation import JobCancelled, get_token, raise_if_cancelled
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +34,24 @@ LANGUAGE_CODE_MAP = {
     "th": "thai"
 }
 
-def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size: int = 64) -> List[Dict]:
+def cancel_prediction(prediction_id: str, headers: Dict) -> None:
+    """
+    Cancel a running Replicate prediction so it stops being billed.
+    
+    Args:
+        prediction_id (str): ID of the prediction
+        headers (dict): Headers with the Replicate authorization
+    """
+    cancel_url = f"https://api.replicate.com/v1/predictions/{prediction_id}/cancel"
+    logger.info(f"Cancelling Replicate prediction {prediction_id}")
+    try:
+        response = requests.post(cancel_url, headers={"Authorization": headers["Authorization"]}, timeout=10)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not cancel Replicate prediction {prediction_id}: {str(e)}")
+
+@metrics.timed_transcription("replicate_whisper")
+def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size: int = 64, job_id: str = None) -> List[Dict]:
     """
     Transcribe audio using Replicate Whisper API.
     
@@ -39,6 +59,8 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         audio_url (str): URL to the audio file
         language (str, optional): Language code. Defaults to "th".
         batch_size (int, optional): Batch size for processing. Defaults to 64.
+        job_id (str, optional): Job ID to publish transcription progress under. If the
+            job is cancelled, its prediction is cancelled on Replicate and JobCancelled is raised.
         
     Returns:
         list: List of transcription segments with start and end times
@@ -118,7 +140,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
                     ]
                     
                     logger.info(f"Extracting audio with command: {' '.join(ffmpeg_command)}")
-                    subprocess.run(ffmpeg_command, check=True, capture_output=True)
+                    run_ffmpeg(ffmpeg_command, operation="audio_extract", job_id=job_id)
                     
                     if os.path.exists(extracted_audio_path):
                         logger.info(f"Successfully extracted audio to {extracted_audio_path}")
@@ -174,7 +196,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
                     ]
                     
                     logger.info(f"Extracting audio with command: {' '.join(ffmpeg_command)}")
-                    subprocess.run(ffmpeg_command, check=True, capture_output=True)
+                    run_ffmpeg(ffmpeg_command, operation="audio_extract", job_id=job_id)
                     
                     if os.path.exists(extracted_audio_path):
                         logger.info(f"Successfully extracted audio to {extracted_audio_path}")
@@ -237,6 +259,9 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         logger.info(f"Request data: {json.dumps(request_data, indent=2)}")
         
         try:
+            # Do not start a billed prediction for a job that is already cancelled
+            raise_if_cancelled(job_id)
+            
             # Make the API request
             response = requests.post(api_url, json=request_data, headers=headers)
             
@@ -266,56 +291,74 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
             # Get the prediction ID
             prediction_id = result.get("id")
             logger.info(f"Prediction ID: {prediction_id}")
+            publish(job_id, "transcribe", state="start", prediction_id=prediction_id, prediction_status=result.get("status"))
             
-            # Check if we need to poll for results
-            status = result.get("status")
-            output = result.get("output")
+            # Cancelling the job cancels the prediction on Replicate
+            cancellation = get_token(job_id)
+            on_cancel = None
+            if cancellation and prediction_id:
+                on_cancel = cancellation.on_cancel(lambda: cancel_prediction(prediction_id, headers))
+            
+            # The callback is removed however polling ends, so a retry or fallback
+            # after a failed poll does not cancel this stale prediction
+            try:
+                # Check if we need to poll for results
+                status = result.get("status")
+                output = result.get("output")
             
-            # If the prediction is still processing, poll for results
-            if status == "processing" or output is None:
-                logger.info("Prediction is still processing, polling for results...")
+                # If the prediction is still processing, poll for results
+                if status == "processing" or output is None:
+                    logger.info("Prediction is still processing, polling for results...")
                 
-                # Set up polling parameters
-                max_polls = 60  # Maximum number of polling attempts
-                poll_interval = 5  # Seconds between polls
-                polls = 0
+                    # Set up polling parameters
+                    max_polls = 60  # Maximum number of polling attempts
+                    poll_interval = 5  # Seconds between polls
+                    polls = 0
                 
-                # Poll for results
-                while polls < max_polls:
-                    # Wait before polling
-                    time.sleep(poll_interval)
-                    polls += 1
+                    # Poll for results
+                    while polls < max_polls:
+                        # Wait before polling, waking up early if the job is cancelled
+                        if cancellation:
+                            if cancellation.wait(poll_interval):
+                                cancellation.raise_if_cancelled()
+                        else:
+                            time.sleep(poll_interval)
+                        polls += 1
                     
-                    # Make a GET request to check the status
-                    poll_url = f"https://api.replicate.com/v1/predictions/{prediction_id}"
-                    poll_response = requests.get(poll_url, headers=headers)
+                        # Make a GET request to check the status
+                        poll_url = f"https://api.replicate.com/v1/predictions/{prediction_id}"
+                        poll_response = requests.get(poll_url, headers=headers)
                     
-                    # Check if the request was successful
-                    poll_response.raise_for_status()
+                        # Check if the request was successful
+                        poll_response.raise_for_status()
                     
-                    # Parse the response
-                    poll_result = poll_response.json()
-                    status = poll_result.get("status")
-                    output = poll_result.get("output")
+                        # Parse the response
+                        poll_result = poll_response.json()
+                        status = poll_result.get("status")
+                        output = poll_result.get("output")
                     
-                    logger.info(f"Poll {polls}/{max_polls}: Status = {status}")
+                        logger.info(f"Poll {polls}/{max_polls}: Status = {status}")
+                        publish(job_id, "transcribe", prediction_id=prediction_id, prediction_status=status, polls=polls)
                     
-                    # If the prediction is complete, break the loop
-                    if status == "succeeded" and output is not None:
-                        logger.info("Prediction completed successfully")
-                        result = poll_result
-                        break
+                        # If the prediction is complete, break the loop
+                        if status == "succeeded" and output is not None:
+                            logger.info("Prediction completed successfully")
+                            result = poll_result
+                            break
                     
-                    # If the prediction failed, raise an error
-                    if status == "failed":
-                        error = poll_result.get("error")
-                        logger.error(f"Prediction failed: {error}")
-                        raise ValueError(f"Replicate prediction failed: {error}")
+                        # If the prediction failed, raise an error
+                        if status == "failed":
+                            error = poll_result.get("error")
+                            logger.error(f"Prediction failed: {error}")
+                            raise ValueError(f"Replicate prediction failed: {error}")
                 
-                # If we've exhausted our polling attempts, raise an error
-                if polls >= max_polls and (status != "succeeded" or output is None):
-                    logger.error("Exceeded maximum polling attempts")
-                    raise ValueError("Exceeded maximum polling attempts for Replicate prediction")
+                    # If we've exhausted our polling attempts, raise an error
+                    if polls >= max_polls and (status != "succeeded" or output is None):
+                        logger.error("Exceeded maximum polling attempts")
+                        raise ValueError("Exceeded maximum polling attempts for Replicate prediction")
+            finally:
+                if on_cancel:
+                    cancellation.remove_callback(on_cancel)
             
             # Process the output
             if output is None:
@@ -424,6 +467,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
                 raise ValueError(f"Unexpected output format from Replicate: {type(output)}")
             
             logger.info(f"Processed {len(segments)} segments from Replicate output")
+            publish(job_id, "transcribe", state="end", prediction_id=prediction_id, percent=100.0)
             
             # Return the segments
             return segments
@@ -465,6 +509,9 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         # If not a version error, just raise the original error
         raise ValueError(f"Replicate API error: {str(e)}")
         
+    except JobCancelled:
+        logger.info(f"Job {job_id}: Replicate transcription cancelled")
+        raise
     except Exception as e:
         logger.error(f"Error in Replicate transcription: {str(e)}")
         raise ValueError(f"Replicate API error: {str(e)}")
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from services.v1.video.render_cache import make_cache_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Intermediate artifacts (downloaded media, segments, subtitles) and their manifests
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "caption_artifacts"))
+
+# Artifacts and manifests not used for this long are removed by the sweeper
+ARTIFACT_MAX_AGE = int(os.environ.get("ARTIFACT_MAX_AGE", str(7 * 24 * 3600)))
+
+# Least recently used artifacts are evicted once the store grows beyond this size
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", str(10 * 1024 ** 3)))
+
+# Artifacts used more recently than this are never evicted for size, since a running job may still read them
+ARTIFACT_MIN_AGE = int(os.environ.get("ARTIFACT_MIN_AGE", "3600"))
+
+# How often the background sweeper runs, in seconds
+ARTIFACT_SWEEP_INTERVAL = int(os.environ.get("ARTIFACT_SWEEP_INTERVAL", "3600"))
+
+MANIFEST_DIR = "manifests"
+
+def _path_size(path):
+    """Total size of the files in a directory, or the size of a file."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+def new_artifact_id():
+    """Generate an ID for the artifacts of a captioning run."""
+    return uuid.uuid4().hex
+
+class ArtifactStore:
+    """
+    Content-addressed store for the intermediate outputs of captioning pipelines.
+
+    Each stage output is a directory named after a key derived from the content
+    of the stage inputs and its options (see render_cache.make_cache_key), so a
+    stage is only run again when one of its inputs changed, like a make rule.
+    A manifest per artifact ID records the request inputs and the stage keys of
+    a run, so later requests can reference the run by ID and only restyle it.
+
+    Stage outputs are evicted least recently used first once the store exceeds
+    max_bytes; a run whose download was evicted simply downloads it again.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR, max_age=ARTIFACT_MAX_AGE, max_bytes=ARTIFACT_MAX_BYTES,
+                 min_age=ARTIFACT_MIN_AGE):
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        os.makedirs(os.path.join(root, MANIFEST_DIR), exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._stage_outputs())
+
+    def stage_dir(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def stage_key(self, stage, input_paths, options):
+        """
+        Build the key of a stage from the content of its input files and its options.
+
+        Args:
+            stage: Stage name
+            input_paths: Paths to the files the stage reads
+            options: Dictionary of everything else the output depends on
+
+        Returns:
+            Hex key
+        """
+        return make_cache_key(stage, input_paths, options)
+
+    def lookup(self, stage, key):
+        """
+        Get the output directory of a stage if it has been built.
+
+        Returns:
+            Path to the directory, or None
+        """
+        path = self.stage_dir(stage, key)
+        if not os.path.isdir(path):
+            return None
+        # Keep the access time so the sweeper only removes unused outputs
+        os.utime(path)
+        return path
+
+    def build(self, stage, key, builder, job_id=None):
+        """
+        Get the output of a stage, running builder only if it has not been built yet.
+
+        Args:
+            stage: Stage name
+            key: Stage key from stage_key
+            builder: Function called with an empty directory to write the stage outputs into
+            job_id: Job ID for logging
+
+        Returns:
+            Path to the output directory
+        """
+        path = self.lookup(stage, key)
+        if path:
+            logger.info(f"Job {job_id}: Reusing {stage} artifact {key[:12]}")
+            return path
+
+        logger.info(f"Job {job_id}: Building {stage} artifact {key[:12]}")
+        path = self.stage_dir(stage, key)
+        os.makedirs(os.path.join(self.root, stage), exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f"{key}.", suffix=".tmp", dir=os.path.join(self.root, stage))
+        try:
+            builder(work_dir)
+            size = _path_size(work_dir)
+            try:
+                os.rename(work_dir, path)
+            except OSError:
+                # Built concurrently by another job; both outputs are equivalent
+                shutil.rmtree(work_dir, ignore_errors=True)
+                size = 0
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        with self._lock:
+            self._total_bytes += size
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.prune()
+        return path
+
+    def import_file(self, stage, source_path, name, job_id=None):
+        """
+        Move a file into the store under a key derived from its content.
+
+        Args:
+            stage: Stage name
+            source_path: File to move (it is removed from its location)
+            name: File name inside the stage directory
+            job_id: Job ID for logging
+
+        Returns:
+            Tuple (key, stored_path)
+        """
+        key = self.stage_key(stage, [source_path], {"name": name})
+        path = self.build(stage, key, lambda work_dir: shutil.move(source_path, os.path.join(work_dir, name)), job_id=job_id)
+        if os.path.exists(source_path):
+            os.remove(source_path)
+        return key, os.path.join(path, name)
+
+    def _manifest_path(self, artifact_id):
+        if not artifact_id or not all(c.isalnum() or c in "-_" for c in artifact_id):
+            raise ValueError(f"Invalid artifact ID: {artifact_id}")
+        return os.path.join(self.root, MANIFEST_DIR, f"{artifact_id}.json")
+
+    def save_manifest(self, artifact_id, manifest):
+        """
+        Record the inputs and stage keys of a run.
+
+        Args:
+            artifact_id: Artifact ID of the run
+            manifest: Dictionary with "inputs" and "stages" ({stage: key})
+        """
+        path = self._manifest_path(artifact_id)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(manifest, artifact_id=artifact_id, created_at=time.time()), f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def load_manifest(self, artifact_id):
+        """
+        Load the manifest of a previous run.
+
+        Returns:
+            Manifest dictionary, or None if the artifact ID is unknown or expired
+        """
+        path = self._manifest_path(artifact_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return manifest
+
+    def _stage_outputs(self):
+        """List (last use, size, path) of every built stage output, excluding manifests and builds in progress."""
+        outputs = []
+        for stage in os.listdir(self.root):
+            stage_path = os.path.join(self.root, stage)
+            if stage == MANIFEST_DIR or not os.path.isdir(stage_path):
+                continue
+            for name in os.listdir(stage_path):
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(stage_path, name)
+                try:
+                    outputs.append((os.path.getmtime(path), _path_size(path), path))
+                except OSError:
+                    continue
+        return outputs
+
+    def _remove(self, path):
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not remove artifact {path}: {str(e)}")
+            return False
+
+    def prune(self):
+        """
+        Remove expired stage outputs and manifests, then the least recently
+        used stage outputs until the store fits max_bytes.
+
+        Returns:
+            Number of removed entries
+        """
+        with self._prune_lock:
+            now = time.time()
+            removed = 0
+
+            manifest_path = os.path.join(self.root, MANIFEST_DIR)
+            for name in os.listdir(manifest_path):
+                path = os.path.join(manifest_path, name)
+                try:
+                    expired = os.path.getmtime(path) < now - self.max_age
+                except OSError:
+                    continue
+                if expired and self._remove(path):
+                    removed += 1
+
+            outputs = sorted(self._stage_outputs())
+            total_bytes = sum(size for _, size, _ in outputs)
+            for last_use, size, path in outputs:
+                expired = now - last_use > self.max_age
+                over_budget = total_bytes > self.max_bytes and now - last_use > self.min_age
+                if not expired and not over_budget:
+                    continue
+                if self._remove(path):
+                    total_bytes -= size
+                    removed += 1
+
+            with self._lock:
+                self._total_bytes = total_bytes
+        if removed:
+            logger.info(f"Removed {removed} artifact(s), {total_bytes} bytes remain")
+        if total_bytes > self.max_bytes:
+            logger.warning(f"Artifact store holds {total_bytes} bytes, over its limit of {self.max_bytes}, in artifacts that are still in use")
+        return removed
+
+    def start_sweeper(self, interval=ARTIFACT_SWEEP_INTERVAL):
+        """Start the background thread that periodically removes expired and excess artifacts."""
+        if self._sweeper is not None:
+            return
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.prune()
+                except Exception as e:
+                    logger.warning(f"Artifact sweep failed: {str(e)}")
+
+        self._sweeper = threading.Thread(target=sweep, name="artifact-sweeper", daemon=True)
+        self._sweeper.start()
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+def get_artifact_store():
+    """
+    Get the process-wide artifact store, starting its sweeper on first use.
+
+    Returns:
+        ArtifactStore instance
+    """
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore()
+            _artifact_store.start_sweeper()
+    return _artifact_store
+
+def write_json(path, data):
+    """Write JSON stage output."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def read_json(path):
+    """Read JSON stage output."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,319 @@
+import os
+import re
+import logging
+import tempfile
+import subprocess
+import threading
+import srt
+from PIL import Image, ImageDraw, ImageFont, ImageColor
+from services.v1.ffmpeg.audio_codec import get_audio_codec_args
+from services.v1.fonts import font_registry
+from services.v1.fonts.font_cache import load_font
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
+from services.v1.video.render_cache import RenderCache, make_cache_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rendered subtitle sprites are shared between jobs and workers, keyed by text and style
+SPRITE_CACHE_DIR = os.environ.get("SPRITE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "subtitle_sprites"))
+
+# Least recently used sprites are evicted once the cache grows beyond this size
+SPRITE_CACHE_MAX_BYTES = int(os.environ.get("SPRITE_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+
+# Beyond this many distinct events the overlay chain gets slower than libass
+MAX_OVERLAY_INPUTS = 400
+
+_sprite_cache = None
+_sprite_cache_lock = threading.Lock()
+
+def get_sprite_cache():
+    """
+    Get the process-wide sprite cache, starting its sweeper on first use.
+
+    Returns:
+        RenderCache instance over SPRITE_CACHE_DIR
+    """
+    global _sprite_cache
+    with _sprite_cache_lock:
+        if _sprite_cache is None:
+            _sprite_cache = RenderCache(SPRITE_CACHE_DIR, max_bytes=SPRITE_CACHE_MAX_BYTES)
+            _sprite_cache.start_sweeper()
+    return _sprite_cache
+
+def _to_rgba(color, default=(255, 255, 255, 255)):
+    """
+    Convert a colour to an RGBA tuple.
+
+    Accepts anything PIL understands (names, #RRGGBB, #RRGGBBAA) as well as
+    ASS colours in &HAABBGGRR form, where alpha 00 is opaque.
+    """
+    if not color:
+        return default
+    color = str(color).strip()
+    if color.upper().startswith("&H"):
+        value = color[2:].rstrip("&")
+        try:
+            value = value.rjust(8, "0")
+            alpha = 255 - int(value[0:2], 16)
+            blue = int(value[2:4], 16)
+            green = int(value[4:6], 16)
+            red = int(value[6:8], 16)
+            return (red, green, blue, alpha)
+        except ValueError:
+            logger.warning(f"Invalid ASS colour: {color}")
+            return default
+    try:
+        rgba = ImageColor.getcolor(color, "RGBA")
+        return rgba
+    except ValueError:
+        logger.warning(f"Invalid colour: {color}")
+        return default
+
+def _resolve_font_path(font_name, text):
+    """Find a font file for the subtitle text, falling back to a Thai font when the font lacks Thai glyphs."""
+    from services.v1.video.caption_video import contains_thai
+    registry = font_registry.get_font_registry()
+    font_path = registry.find(font_name)
+    if font_path is None or (contains_thai(text) and not registry.has_thai(font_path)):
+        font_path = registry.default_thai_font() or font_path
+    return font_path
+
+def _load_font(font_path, font_size):
+    if not font_path:
+        return ImageFont.load_default()
+    # Raqm is used when available, it shapes Thai combining vowels and tone marks correctly
+    return load_font(font_path, font_size)
+
+def render_subtitle_sprite(text, font_path, font_size, output_dir, line_color="white", outline_color="black",
+                           outline_width=2, back_color=None, padding=10):
+    """
+    Render one subtitle event to a transparent PNG.
+
+    Sprites are kept in the sprite cache by text and style, so repeated lines
+    and repeated jobs only pay for rasterization once. The returned file is a
+    copy owned by the caller, so cache eviction cannot remove it while ffmpeg
+    reads it. The caller runs the cache's eviction pass after a batch.
+
+    Args:
+        text: Subtitle text (may contain newlines)
+        font_path: Path to the font file
+        font_size: Font size in pixels
+        output_dir: Directory the sprite is written to
+        line_color: Text colour
+        outline_color: Outline colour
+        outline_width: Outline width in pixels
+        back_color: Optional box colour behind the text
+        padding: Space around the text in pixels
+
+    Returns:
+        Path to the PNG file
+    """
+    cache = get_sprite_cache()
+    key = make_cache_key("subtitle_sprite", [font_path] if font_path else [], {
+        "text": text, "font_size": font_size, "line_color": line_color, "outline_color": outline_color,
+        "outline_width": outline_width, "back_color": back_color, "padding": padding
+    })
+    sprite_path = os.path.join(output_dir, key + ".png")
+    if cache.get(key, sprite_path):
+        return sprite_path
+
+    font = _load_font(font_path, font_size)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), text, font=font, stroke_width=outline_width, align="center"
+    )
+
+    width = (right - left) + padding * 2
+    height = (bottom - top) + padding * 2
+    background = _to_rgba(back_color, (0, 0, 0, 0)) if back_color else (0, 0, 0, 0)
+    sprite = Image.new("RGBA", (max(width, 1), max(height, 1)), background)
+    draw = ImageDraw.Draw(sprite)
+    draw.multiline_text(
+        (padding - left, padding - top),
+        text,
+        font=font,
+        fill=_to_rgba(line_color),
+        stroke_width=outline_width,
+        stroke_fill=_to_rgba(outline_color, (0, 0, 0, 255)),
+        align="center"
+    )
+
+    sprite.save(sprite_path, format="PNG")
+    cache.put(key, sprite_path, evict=False)
+    return sprite_path
+
+def _strip_ass_text(text):
+    """Remove ASS override tags and convert ASS line breaks."""
+    text = re.sub(r"\{[^}]*\}", "", text)
+    return text.replace("\\N", "\n").replace("\\n", "\n").replace("\\h", " ").strip()
+
+def _parse_ass_time(value):
+    h, m, s = value.strip().split(':')
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+def read_subtitle_events(subtitle_path):
+    """
+    Read subtitle events from an SRT or ASS file.
+
+    Args:
+        subtitle_path: Path to the subtitle file
+
+    Returns:
+        List of (start_seconds, end_seconds, text) tuples
+    """
+    events = []
+    with open(subtitle_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    if subtitle_path.lower().endswith('.ass'):
+        for line in content.splitlines():
+            if not line.startswith("Dialogue:"):
+                continue
+            fields = line.split(':', 1)[1].split(',', 9)
+            if len(fields) < 10:
+                continue
+            text = _strip_ass_text(fields[9])
+            if text:
+                events.append((_parse_ass_time(fields[1]), _parse_ass_time(fields[2]), text))
+    else:
+        for sub in srt.parse(content):
+            text = sub.content.strip()
+            if text:
+                events.append((sub.start.total_seconds(), sub.end.total_seconds(), text))
+
+    return events
+
+def _overlay_position(position, margin_v):
+    """Get overlay x/y expressions for a subtitle position."""
+    x = "(main_w-overlay_w)/2"
+    if position == "top":
+        y = str(margin_v)
+    elif position == "middle":
+        y = "(main_h-overlay_h)/2"
+    else:
+        y = f"main_h-overlay_h-{margin_v}"
+    return x, y
+
+def burn_subtitles_with_overlays(video_path, subtitle_path, output_path, font_size=24, font_name="Arial",
+                                 position="bottom", margin_v=30, line_color="white", outline_color="black",
+                                 back_color=None, outline_width=2, pre_filters=None, crf=23, job_id=None):
+    """
+    Burn in subtitles by overlaying pre-rendered subtitle sprites.
+
+    Each distinct subtitle event is rendered once to an RGBA PNG and composited
+    with an overlay filter that is only enabled while the event is on screen, so
+    no per-frame text layout is done.
+
+    Args:
+        video_path: Path to the input video
+        subtitle_path: Path to the subtitle file (SRT or ASS)
+        output_path: Path to the output video
+        font_size: Font size in pixels, relative to a 1080p frame
+        font_name: Font name to use for subtitles
+        position: Position of subtitles (bottom, middle, top)
+        margin_v: Vertical margin in pixels
+        line_color: Color of subtitle text
+        outline_color: Color of subtitle outline
+        back_color: Color of subtitle background box
+        outline_width: Outline width in pixels
+        pre_filters: Optional filter chain applied to the video before the overlays (e.g. padding)
+        crf: x264 constant rate factor
+        job_id: Job ID for logging
+
+    Returns:
+        Path to the output video, or None if the subtitles have too many distinct
+        events for the overlay engine
+    """
+    from services.v1.video.caption_video import get_video_info
+
+    events = read_subtitle_events(subtitle_path)
+    logger.info(f"Job {job_id}: Read {len(events)} subtitle events from {subtitle_path}")
+
+    # Scale the font like libass scales a 1080p PlayRes script
+    video_info = get_video_info(video_path) or {}
+    scale = int(video_info.get('height', 1080)) / 1080.0
+    scaled_font_size = max(8, int(round(font_size * scale)))
+    scaled_outline = max(0, int(round(outline_width * scale)))
+    scaled_margin_v = int(round(margin_v * scale))
+
+    # Group the time windows of each distinct event; the style is the same for all
+    # events, so each distinct text is one sprite. Too many fall back before rendering.
+    windows_by_text = {}
+    for start, end, text in events:
+        windows_by_text.setdefault(text, []).append((start, end))
+
+    if len(windows_by_text) > MAX_OVERLAY_INPUTS:
+        logger.warning(f"Job {job_id}: {len(windows_by_text)} distinct subtitle events exceed the overlay limit of {MAX_OVERLAY_INPUTS}")
+        return None
+
+    # Sprites are copied next to the output for the duration of the render
+    sprite_root = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(prefix="overlay_sprites_", dir=sprite_root) as sprite_dir:
+        sprites = {}
+        for text, windows in windows_by_text.items():
+            sprite_path = render_subtitle_sprite(
+                text, _resolve_font_path(font_name, text), scaled_font_size, sprite_dir,
+                line_color=line_color,
+                outline_color=outline_color,
+                outline_width=scaled_outline,
+                back_color=back_color
+            )
+            sprites[sprite_path] = windows
+        try:
+            get_sprite_cache().evict()
+        except OSError as e:
+            logger.warning(f"Job {job_id}: Sprite cache eviction failed: {str(e)}")
+
+        x, y = _overlay_position(position, scaled_margin_v)
+
+        # Build the overlay chain: one input per sprite, enabled for all of its windows
+        filter_parts = []
+        current = "[0:v]"
+        if pre_filters:
+            filter_parts.append(f"[0:v]{pre_filters}[base]")
+            current = "[base]"
+
+        input_args = []
+        for index, (sprite_path, windows) in enumerate(sprites.items(), start=1):
+            input_args.extend(["-i", sprite_path])
+            enable = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in windows)
+            label = f"[v{index}]"
+            filter_parts.append(f"{current}[{index}:v]overlay=x={x}:y={y}:enable='{enable}'{label}")
+            current = label
+
+        ffmpeg_cmd = ["ffmpeg", "-y", "-i", video_path] + input_args
+
+        # Long chains go through a script file to stay under the argument length limit
+        filter_script = None
+        if filter_parts:
+            filter_script = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8")
+            filter_script.write(";\n".join(filter_parts))
+            filter_script.close()
+            ffmpeg_cmd.extend(["-filter_complex_script", filter_script.name, "-map", current])
+        else:
+            ffmpeg_cmd.extend(["-map", "0:v:0"])
+
+        ffmpeg_cmd.extend([
+            "-map", "0:a?",
+            "-c:v", "libx264", "-crf", str(crf),
+            *get_audio_codec_args(video_path, output_path),
+            "-max_muxing_queue_size", "9999",
+            output_path
+        ])
+
+        logger.info(f"Job {job_id}: Overlaying {len(sprites)} subtitle sprite(s) for {len(events)} event(s)")
+        try:
+            run_ffmpeg(ffmpeg_cmd, operation="overlay_captions", job_id=job_id)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Job {job_id}: Overlay caption render failed: {e.stderr}")
+            raise
+        finally:
+            if filter_script:
+                os.remove(filter_script.name)
+
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(f"Output file was not created: {output_path}")
+
+    logger.info(f"Job {job_id}: Overlay caption render finished: {output_path} ({os.path.getsize(output_path)} bytes)")
+    return output_path
@@ -0,0 +1,313 @@
+import os
+import copy
+import json
+import shutil
+import logging
+import tempfile
+import subprocess
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import srt
+from services.v1.ffmpeg.audio_codec import get_audio_codec_args
+from services.v1.video.render_graph import RenderGraph, SubtitlesNode
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Segments shorter than this are not worth the split/concat overhead
+MIN_SEGMENT_SECONDS = 20.0
+
+def get_media_duration(media_path):
+    """
+    Get the duration of a media file in seconds.
+
+    Args:
+        media_path: Path to the media file
+
+    Returns:
+        Duration in seconds, or 0.0 if it cannot be determined
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", media_path],
+        capture_output=True,
+        text=True
+    )
+    try:
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (KeyError, ValueError, TypeError):
+        logger.error(f"Could not read duration of {media_path}: {result.stderr}")
+        return 0.0
+
+def get_keyframe_times(video_path):
+    """
+    List the presentation times of all keyframes in the first video stream.
+
+    Only packet headers are read, nothing is decoded.
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        Sorted list of keyframe times in seconds
+    """
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            video_path
+        ],
+        capture_output=True,
+        text=True
+    )
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            keyframes.append(float(parts[0]))
+        except ValueError:
+            continue
+    return sorted(set(keyframes))
+
+def choose_split_times(keyframes, duration, segment_count):
+    """
+    Pick keyframes that cut the video into roughly equal segments.
+
+    Args:
+        keyframes: Sorted keyframe times in seconds
+        duration: Total duration in seconds
+        segment_count: Desired number of segments
+
+    Returns:
+        Sorted list of split times (excluding 0)
+    """
+    split_times = []
+    for i in range(1, segment_count):
+        target = duration * i / segment_count
+        # First keyframe at or after the target keeps segments starting on a keyframe
+        candidates = [k for k in keyframes if k >= target]
+        if not candidates:
+            break
+        split_time = candidates[0]
+        previous = split_times[-1] if split_times else 0.0
+        if split_time - previous >= MIN_SEGMENT_SECONDS / 2 and duration - split_time >= MIN_SEGMENT_SECONDS / 2:
+            split_times.append(split_time)
+    return split_times
+
+def _parse_ass_time(value):
+    h, m, s = value.strip().split(':')
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+def _format_ass_time(seconds):
+    centiseconds = int(round(seconds * 100))
+    h, centiseconds = divmod(centiseconds, 360000)
+    m, centiseconds = divmod(centiseconds, 6000)
+    s, cs = divmod(centiseconds, 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+def shift_ass_file(ass_path, output_path, offset, duration):
+    """
+    Write a copy of an ASS file with all events shifted to a segment's timeline.
+
+    Events that fall completely outside [offset, offset + duration] are dropped,
+    events that straddle the segment start are clipped to 0.
+
+    Args:
+        ass_path: Path to the source ASS file
+        output_path: Path for the shifted ASS file
+        offset: Segment start time in seconds
+        duration: Segment duration in seconds
+
+    Returns:
+        Path to the shifted ASS file
+    """
+    lines = []
+    with open(ass_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.startswith("Dialogue:"):
+                lines.append(line)
+                continue
+            prefix, rest = line.split(':', 1)
+            fields = rest.split(',', 9)
+            if len(fields) < 10:
+                lines.append(line)
+                continue
+            start = _parse_ass_time(fields[1]) - offset
+            end = _parse_ass_time(fields[2]) - offset
+            if end <= 0 or start >= duration:
+                continue
+            fields[1] = _format_ass_time(max(start, 0.0))
+            fields[2] = _format_ass_time(end)
+            lines.append(f"{prefix}:{','.join(fields)}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    return output_path
+
+def shift_srt_file(srt_path, output_path, offset, duration):
+    """
+    Write a copy of an SRT file with all cues shifted to a segment's timeline.
+
+    Args:
+        srt_path: Path to the source SRT file
+        output_path: Path for the shifted SRT file
+        offset: Segment start time in seconds
+        duration: Segment duration in seconds
+
+    Returns:
+        Path to the shifted SRT file
+    """
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        subtitles = list(srt.parse(f.read()))
+
+    shift = timedelta(seconds=offset)
+    segment_end = timedelta(seconds=duration)
+    shifted = []
+    for sub in subtitles:
+        start = sub.start - shift
+        end = sub.end - shift
+        if end <= timedelta(0) or start >= segment_end:
+            continue
+        shifted.append(srt.Subtitle(index=len(shifted) + 1, start=max(start, timedelta(0)), end=end, content=sub.content))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(srt.compose(shifted))
+    return output_path
+
+def _shift_subtitle_file(subtitle_path, output_dir, index, offset, duration):
+    _, ext = os.path.splitext(subtitle_path)
+    shifted_path = os.path.join(output_dir, f"subtitles_{index:03d}{ext.lower()}")
+    if ext.lower() == '.ass':
+        return shift_ass_file(subtitle_path, shifted_path, offset, duration)
+    return shift_srt_file(subtitle_path, shifted_path, offset, duration)
+
+def render_graph_in_segments(graph, output_path, crf=23, segment_count=None, preset=None):
+    """
+    Render a render graph by splitting the input at keyframes and encoding the segments in parallel.
+
+    Each segment is encoded by its own ffmpeg process with subtitle timing shifted
+    by the segment offset. The encoded segments are joined with the concat demuxer
+    without re-encoding, and the untouched source audio is muxed back in.
+
+    Falls back to a normal single-process render when the video is too short to split.
+
+    Args:
+        graph: RenderGraph to render
+        output_path: Path to the output video
+        crf: x264 constant rate factor
+        segment_count: Number of segments (defaults to the CPU count)
+        preset: Optional x264 preset
+
+    Returns:
+        Path to the output video
+    """
+    job_id = graph.job_id
+    input_path = graph.input_path
+
+    if segment_count is None:
+        segment_count = os.cpu_count() or 1
+
+    duration = get_media_duration(input_path)
+    segment_count = min(segment_count, int(duration // MIN_SEGMENT_SECONDS))
+    if segment_count < 2:
+        logger.info(f"Job {job_id}: Video too short for parallel rendering ({duration:.1f}s), rendering in one pass")
+        return graph.render(output_path, crf=crf, preset=preset)
+
+    for node in graph.nodes:
+        if isinstance(node, SubtitlesNode) and os.path.splitext(node.subtitle_path)[1].lower() not in ('.ass', '.srt'):
+            logger.warning(f"Job {job_id}: Cannot shift subtitle file {node.subtitle_path}, rendering in one pass")
+            return graph.render(output_path, crf=crf, preset=preset)
+
+    split_times = choose_split_times(get_keyframe_times(input_path), duration, segment_count)
+    if not split_times:
+        logger.info(f"Job {job_id}: No usable keyframes for splitting, rendering in one pass")
+        return graph.render(output_path, crf=crf, preset=preset)
+
+    work_dir = tempfile.mkdtemp(prefix="parallel_render_")
+    try:
+        # Step 1: Split the video stream at the chosen keyframes without re-encoding
+        segment_pattern = os.path.join(work_dir, "segment_%03d.mp4")
+        split_cmd = [
+            "ffmpeg", "-y",
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_times", ",".join(f"{t:.6f}" for t in split_times),
+            "-reset_timestamps", "1",
+            segment_pattern
+        ]
+        logger.info(f"Job {job_id}: Splitting video at {len(split_times)} keyframe(s): {split_times}")
+        run_ffmpeg(split_cmd, operation="segment_split", job_id=job_id)
+
+        segment_paths = sorted(
+            os.path.join(work_dir, name) for name in os.listdir(work_dir)
+            if name.startswith("segment_") and name.endswith(".mp4")
+        )
+
+        # Actual offsets come from the segment durations, not the requested split times
+        segments = []
+        offset = 0.0
+        for index, segment_path in enumerate(segment_paths):
+            segment_duration = get_media_duration(segment_path)
+            segments.append((index, segment_path, offset, segment_duration))
+            offset += segment_duration
+
+        # Step 2: Burn each segment in its own ffmpeg process
+        threads_per_segment = max(1, (os.cpu_count() or 1) // len(segments))
+
+        def render_segment(segment):
+            index, segment_path, segment_offset, segment_duration = segment
+            segment_graph = RenderGraph(segment_path, job_id=job_id)
+            for node in graph.nodes:
+                if isinstance(node, SubtitlesNode):
+                    shifted_path = _shift_subtitle_file(node.subtitle_path, work_dir, index, segment_offset, segment_duration)
+                    segment_graph.add(SubtitlesNode(shifted_path, node.force_style))
+                else:
+                    segment_graph.add(copy.copy(node))
+            rendered_path = os.path.join(work_dir, f"rendered_{index:03d}.mp4")
+            return segment_graph.render(
+                rendered_path,
+                crf=crf,
+                preset=preset,
+                extra_output_args=["-threads", str(threads_per_segment)]
+            )
+
+        logger.info(f"Job {job_id}: Rendering {len(segments)} segments in parallel ({threads_per_segment} thread(s) each)")
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            rendered_paths = list(executor.map(render_segment, segments))
+
+        # Step 3: Join the rendered segments and put the source audio back
+        concat_list_path = os.path.join(work_dir, "concat.txt")
+        with open(concat_list_path, 'w', encoding='utf-8') as f:
+            for rendered_path in rendered_paths:
+                f.write(f"file '{rendered_path}'\n")
+
+        concat_cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", concat_list_path,
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-map", "1:a?",
+            "-c:v", "copy",
+            *get_audio_codec_args(input_path, output_path),
+            output_path
+        ]
+        logger.info(f"Job {job_id}: Joining rendered segments: {' '.join(concat_cmd)}")
+        run_ffmpeg(concat_cmd, operation="segment_concat", job_id=job_id)
+
+        if not os.path.exists(output_path):
+            raise FileNotFoundError(f"Output file was not created: {output_path}")
+
+        logger.info(f"Job {job_id}: Parallel render finished: {output_path} ({os.path.getsize(output_path)} bytes)")
+        return output_path
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Job {job_id}: Parallel render failed: {e.stderr}")
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,249 @@
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from services.job_progress import publish
+from services.cancellation import cancel_event as job_cancel_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Stage states reported in job responses
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FALLBACK = "fallback"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+class PipelineCancelled(Exception):
+    """Raised when a pipeline is cancelled before all of its stages ran."""
+
+@dataclass
+class Stage:
+    """
+    A declared pipeline step.
+
+    func is called with one keyword argument per input and returns the value of
+    its single output, a tuple with one value per output, or nothing if it has
+    no outputs. If every attempt fails and fallback is set, fallback is called
+    with the last exception and its return value is used as the outputs.
+    """
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    retries: int = 0
+    retry_delay: float = 1.0
+    fallback: Optional[Callable] = None
+    status: str = PENDING
+    attempts: int = 0
+    started_at: Optional[float] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+    def report(self):
+        """Timing and outcome of the stage, for job responses."""
+        entry = {"name": self.name, "status": self.status, "attempts": self.attempts}
+        if self.duration is not None:
+            entry["duration"] = round(self.duration, 3)
+        if self.error:
+            entry["error"] = self.error
+        return entry
+
+class Pipeline:
+    """
+    Run declared stages as a dependency graph.
+
+    A stage starts as soon as all of its inputs are available, so stages that
+    do not depend on each other run in parallel. Each stage is timed and
+    retried on failure; when a stage fails for good or the pipeline is
+    cancelled, no further stages are started and the error is raised once the
+    running stages have finished. Stage starts and ends are published to the
+    job's progress channel.
+
+    Example:
+        pipeline = Pipeline("captions", job_id=job_id)
+        pipeline.add_stage("download", download, outputs=("video_path",), retries=2)
+        pipeline.add_stage("burn", burn, inputs=("video_path", "subtitle_path"), outputs=("output_path",))
+        values = pipeline.run(subtitle_path=subtitle_path)
+    """
+
+    def __init__(self, name, job_id=None, max_workers=4, cancel_event=None):
+        self.name = name
+        self.job_id = job_id
+        self.max_workers = max_workers
+        # Follow the job's cancellation token unless an event is given
+        self.cancel_event = cancel_event or job_cancel_event(job_id) or threading.Event()
+        self.stages = []
+
+    def add_stage(self, name, func, inputs=(), outputs=(), retries=0, retry_delay=1.0, fallback=None):
+        """
+        Declare a stage.
+
+        Args:
+            name: Stage name, unique in the pipeline
+            func: Function called with the stage inputs as keyword arguments
+            inputs: Names of the values the stage reads
+            outputs: Names of the values the stage produces
+            retries: Number of extra attempts after a failure
+            retry_delay: Seconds to wait before the first retry, doubled for each later one
+            fallback: Optional function called with the last exception to produce the outputs instead
+
+        Returns:
+            The Stage
+        """
+        if any(stage.name == name for stage in self.stages):
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        produced = {output for stage in self.stages for output in stage.outputs}
+        duplicates = produced.intersection(outputs)
+        if duplicates:
+            raise ValueError(f"Stage {name} redeclares outputs {sorted(duplicates)}")
+        stage = Stage(name, func, tuple(inputs), tuple(outputs), retries, retry_delay, fallback)
+        self.stages.append(stage)
+        return stage
+
+    def stage(self, name, inputs=(), outputs=(), retries=0, retry_delay=1.0, fallback=None):
+        """Decorator form of add_stage."""
+        def decorator(func):
+            self.add_stage(name, func, inputs, outputs, retries, retry_delay, fallback)
+            return func
+        return decorator
+
+    def cancel(self):
+        """
+        Stop starting new stages and retries. Running stages finish their
+        current attempt unless they follow the same event, as ffmpeg runs,
+        downloads and uploads do through the job's cancellation token.
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report(self):
+        """
+        Per-stage timing and outcome.
+
+        Returns:
+            List of dictionaries in declaration order
+        """
+        return [stage.report() for stage in self.stages]
+
+    def _check_graph(self, available):
+        known = set(available)
+        for stage in self.stages:
+            known.update(stage.outputs)
+        for stage in self.stages:
+            missing = [name for name in stage.inputs if name not in known]
+            if missing:
+                raise ValueError(f"Stage {stage.name} reads undeclared inputs {missing}")
+
+    def _run_stage(self, stage, values):
+        kwargs = {name: values[name] for name in stage.inputs}
+        stage.status = RUNNING
+        stage.started_at = time.time()
+        publish(self.job_id, stage.name, state="start", attempt=stage.attempts + 1)
+        try:
+            while True:
+                stage.attempts += 1
+                try:
+                    result = stage.func(**kwargs)
+                    stage.status = SUCCEEDED
+                    stage.error = None
+                    return result
+                except Exception as e:
+                    stage.error = str(e)
+                    if self.cancelled:
+                        # A cancelled job must not retry or fall back
+                        stage.status = CANCELLED
+                        raise PipelineCancelled(f"Pipeline {self.name} cancelled during stage {stage.name}") from e
+                    if stage.attempts > stage.retries:
+                        if stage.fallback is None:
+                            stage.status = FAILED
+                            raise
+                        logger.warning(f"Job {self.job_id}: Stage {stage.name} failed, using fallback: {str(e)}")
+                        stage.status = FALLBACK
+                        return stage.fallback(e)
+                    delay = stage.retry_delay * (2 ** (stage.attempts - 1))
+                    logger.warning(f"Job {self.job_id}: Stage {stage.name} failed (attempt {stage.attempts}), retrying in {delay:.1f}s: {str(e)}")
+                    if self.cancel_event.wait(delay):
+                        stage.status = CANCELLED
+                        raise PipelineCancelled(f"Pipeline {self.name} cancelled during stage {stage.name}")
+        finally:
+            stage.duration = time.time() - stage.started_at
+            publish(self.job_id, stage.name, state="end", status=stage.status, duration=round(stage.duration, 3))
+
+    def _store_outputs(self, stage, result, values):
+        if not stage.outputs:
+            return
+        if len(stage.outputs) == 1:
+            result = (result,)
+        if not isinstance(result, tuple) or len(result) != len(stage.outputs):
+            raise ValueError(f"Stage {stage.name} must return {len(stage.outputs)} values for {stage.outputs}")
+        values.update(zip(stage.outputs, result))
+
+    def run(self, **initial):
+        """
+        Run all stages.
+
+        Args:
+            **initial: Values available before any stage runs
+
+        Returns:
+            Dictionary with the initial values and all stage outputs
+
+        Raises:
+            PipelineCancelled: If the pipeline was cancelled
+            Exception: The error of the first stage that failed for good
+        """
+        self._check_graph(initial)
+        values = dict(initial)
+        pending = list(self.stages)
+        running = {}
+        error = None
+        pipeline_start = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"pipeline-{self.name}") as executor:
+            while pending or running:
+                if error is None and self.cancelled:
+                    error = PipelineCancelled(f"Pipeline {self.name} cancelled")
+
+                if error is None:
+                    ready = [stage for stage in pending if all(name in values for name in stage.inputs)]
+                    for stage in ready:
+                        pending.remove(stage)
+                        logger.info(f"Job {self.job_id}: Starting stage {stage.name}")
+                        running[executor.submit(self._run_stage, stage, dict(values))] = stage
+
+                if not running:
+                    if error is None and pending:
+                        error = ValueError(f"Stages {[stage.name for stage in pending]} can never run: their inputs are never produced")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        self._store_outputs(stage, future.result(), values)
+                        logger.info(f"Job {self.job_id}: Stage {stage.name} {stage.status} in {stage.duration:.2f}s")
+                    except Exception as e:
+                        if stage.status in (RUNNING, SUCCEEDED, FALLBACK):
+                            stage.status = FAILED
+                            stage.error = str(e)
+                        logger.error(f"Job {self.job_id}: Stage {stage.name} {stage.status}: {str(e)}")
+                        if error is None:
+                            error = e
+
+        for stage in pending:
+            stage.status = CANCELLED if isinstance(error, PipelineCancelled) else SKIPPED
+
+        logger.info(f"Job {self.job_id}: Pipeline {self.name} finished in {time.time() - pipeline_start:.2f}s: "
+                    + ", ".join(f"{entry['name']}={entry['status']}" for entry in self.report()))
+        if error is not None:
+            raise error
+        return values
@@ -17,6 +17,10 @@ import traceback
 
 # Import the captioning module
 from services.v1.video.caption_video import add_subtitles_to_video, process_captioning_v1
+from services.job_history import record_job, payload_size
+from services.job_progress import get_job_progress
+from services.cancellation import CANCELLED_STATUS_CODE, register_job, release_job, get_token
+from services import metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -50,6 +54,12 @@ job_queues = {
 job_status = {}  # {job_id: {status, result, start_time, end_time, retries, error}}
 job_status_lock = threading.Lock()
 
+metrics.register_gauge(
+    "nca_captioning_queue_depth", "Jobs waiting in each captioning queue lane", ("lane",),
+    lambda: [({"lane": name}, job_queues[priority].qsize())
+             for name, priority in (("high", PRIORITY_HIGH), ("normal", PRIORITY_NORMAL), ("low", PRIORITY_LOW))]
+)
+
 # Worker pool
 worker_pool = None
 
@@ -157,6 +167,7 @@ def enqueue_job(params: Dict[str, Any], job_id: Optional[str] = None,
     
     # Check queue size
     if sum(q.qsize() for q in job_queues.values()) >= MAX_QUEUE_SIZE:
+        metrics.QUEUE_REJECTIONS.inc(lane="captioning")
         raise ValueError("Queue is full, try again later")
     
     # Generate job ID if not provided
@@ -176,8 +187,12 @@ def enqueue_job(params: Dict[str, Any], job_id: Optional[str] = None,
             'params': params
         }
     
+    # Cancelling a waiting job fails it right away; a running job stops at its next cancellation check
+    register_job(job_id).on_cancel(lambda: _cancel_waiting_job(job_id))
+    
     # Add to appropriate queue
     job_queues[priority].put(job)
+    get_job_progress().status(job_id, JOB_STATUS_PENDING, priority=priority)
     logger.info(f"Job {job_id} added to queue with priority {priority}")
     
     return job_id
@@ -212,7 +227,11 @@ def get_job_status(job_id: str) -> Dict[str, Any]:
 
 def cancel_job(job_id: str) -> bool:
     """
-    Cancel a pending job.
+    Cancel a pending, retrying or processing job.
+    
+    Waiting jobs are failed right away. A processing job is signalled through
+    its cancellation token: its ffmpeg processes are terminated, downloads and
+    uploads are aborted, and the job is failed without retries.
     
     Parameters:
     -----------
@@ -222,7 +241,7 @@ def cancel_job(job_id: str) -> bool:
     Returns:
     --------
     bool
-        True if the job was cancelled, False if it was already processing
+        True if the job was cancelled, False if it had already finished
     
     Raises:
     -------
@@ -235,15 +254,27 @@ def cancel_job(job_id: str) -> bool:
         
         status = job_status[job_id]['status']
         
-        if status == JOB_STATUS_PENDING:
-            job_status[job_id]['status'] = JOB_STATUS_FAILED
-            job_status[job_id]['error'] = "Job cancelled by user"
-            job_status[job_id]['end_time'] = datetime.now()
-            logger.info(f"Job {job_id} cancelled")
-            return True
-        
-        logger.warning(f"Cannot cancel job {job_id} with status {status}")
-        return False
+        if status in (JOB_STATUS_COMPLETED, JOB_STATUS_FAILED):
+            logger.warning(f"Cannot cancel job {job_id} with status {status}")
+            return False
+    
+    # The token runs _cancel_waiting_job, which takes the status lock itself
+    register_job(job_id).cancel()
+    logger.info(f"Job {job_id} cancelled")
+    return True
+
+
+def _cancel_waiting_job(job_id: str):
+    """Fail a cancelled job that is not running yet; a running job is failed by process_job."""
+    with job_status_lock:
+        status = job_status.get(job_id)
+        if status is None or status['status'] not in (JOB_STATUS_PENDING, JOB_STATUS_RETRY):
+            return
+        status['status'] = JOB_STATUS_FAILED
+        status['error'] = "Job cancelled by user"
+        status['end_time'] = datetime.now()
+    release_job(job_id)
+    get_job_progress().finish(job_id, "cancelled", code=CANCELLED_STATUS_CODE)
 
 
 def worker_thread():
@@ -299,8 +330,11 @@ def process_job(job: CaptioningJob):
         
         job_status[job_id]['status'] = JOB_STATUS_PROCESSING
         job_status[job_id]['start_time'] = datetime.now()
+        queue_time = (job_status[job_id]['start_time'] - job_status[job_id]['created_at']).total_seconds()
     
     logger.info(f"Processing job {job_id}")
+    run_start_time = time.time()
+    get_job_progress().status(job_id, JOB_STATUS_PROCESSING, queue_time=round(queue_time, 3))
     
     try:
         # Call the captioning process
@@ -313,16 +347,53 @@ def process_job(job: CaptioningJob):
             job_status[job_id]['end_time'] = datetime.now()
         
         logger.info(f"Job {job_id} completed successfully")
+        release_job(job_id)
+        get_job_progress().finish(job_id, JOB_STATUS_COMPLETED, code=200)
+        metrics.observe_job("queue_processor/captioning", 200, time.time() - run_start_time, queue_time)
+        record_job(
+            job_id=job_id,
+            endpoint="queue_processor/captioning",
+            status_code=200,
+            run_time=time.time() - run_start_time,
+            queue_time=queue_time,
+            queued=True,
+            pid=os.getpid(),
+            request_bytes=payload_size(params),
+            response_bytes=payload_size(result)
+        )
         
     except Exception as e:
+        token = get_token(job_id)
+        cancelled = token is not None and token.cancelled
+        status_code = CANCELLED_STATUS_CODE if cancelled else 500
+        metrics.observe_job("queue_processor/captioning", status_code, time.time() - run_start_time, queue_time)
+        record_job(
+            job_id=job_id,
+            endpoint="queue_processor/captioning",
+            status_code=status_code,
+            run_time=time.time() - run_start_time,
+            queue_time=queue_time,
+            queued=True,
+            pid=os.getpid(),
+            request_bytes=payload_size(params),
+            error=str(e)
+        )
         logger.error(f"Error processing job {job_id}: {str(e)}")
         logger.error(traceback.format_exc())
         
-        # Update job status to failed or retry
+        # Update job status to failed or retry; a cancelled job is not retried
         with job_status_lock:
             retries = job_status[job_id].get('retries', 0)
             
-            if retries < MAX_RETRIES:
+            if cancelled:
+                job_status[job_id]['status'] = JOB_STATUS_FAILED
+                job_status[job_id]['error'] = "Job cancelled by user"
+                job_status[job_id]['end_time'] = datetime.now()
+                
+                logger.info(f"Job {job_id} stopped after cancellation")
+                release_job(job_id)
+                get_job_progress().finish(job_id, "cancelled", code=CANCELLED_STATUS_CODE)
+            elif retries < MAX_RETRIES:
                 # Schedule for retry
                 job_status[job_id]['status'] = JOB_STATUS_RETRY
                 job_status[job_id]['retries'] = retries + 1
@@ -334,6 +405,7 @@ def process_job(job: CaptioningJob):
                 job_queues[job.priority].put(retry_job)
                 
                 logger.info(f"Job {job_id} scheduled for retry {retries + 1}/{MAX_RETRIES}")
+                get_job_progress().status(job_id, JOB_STATUS_RETRY, retries=retries + 1, error=str(e))
             else:
                 # Max retries reached, mark as failed
                 job_status[job_id]['status'] = JOB_STATUS_FAILED
@@ -341,6 +413,8 @@ def process_job(job: CaptioningJob):
                 job_status[job_id]['end_time'] = datetime.now()
                 
                 logger.warning(f"Job {job_id} failed after {MAX_RETRIES} retries")
+                release_job(job_id)
+                get_job_progress().finish(job_id, JOB_STATUS_FAILED, code=500, error=str(e))
 
 
 def monitor_thread():
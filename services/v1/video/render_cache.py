@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import logging
+import tempfile
+import functools
+import dataclasses
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rendered outputs are kept on disk, shared by all jobs of this host
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "caption_render_cache"))
+
+# Least recently used outputs are evicted once the cache grows beyond this size
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+# Outputs not used for this long are removed by the sweeper
+RENDER_CACHE_MAX_AGE = int(os.environ.get("RENDER_CACHE_MAX_AGE", str(24 * 3600)))
+
+# How often the background sweeper runs, in seconds
+RENDER_CACHE_SWEEP_INTERVAL = int(os.environ.get("RENDER_CACHE_SWEEP_INTERVAL", "600"))
+
+# Arguments that do not change the rendered output
+IGNORED_OPTIONS = {"job_id", "output_path"}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Number of remembered file hashes; the least recently used are forgotten first
+FILE_HASH_MEMO_SIZE = 4096
+
+_file_hashes = OrderedDict()
+_file_hash_lock = threading.Lock()
+
+def hash_file(path):
+    """
+    Hash the content of a file.
+
+    The most recent FILE_HASH_MEMO_SIZE hashes are remembered per (path, size,
+    mtime), so a file is read only once while it is unchanged.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex digest of the file content
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        digest = _file_hashes.get(memo_key)
+        if digest:
+            _file_hashes.move_to_end(memo_key)
+    if digest:
+        return digest
+
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    with _file_hash_lock:
+        _file_hashes[memo_key] = digest
+        _file_hashes.move_to_end(memo_key)
+        while len(_file_hashes) > FILE_HASH_MEMO_SIZE:
+            _file_hashes.popitem(last=False)
+    return digest
+
+def normalize_options(options):
+    """
+    Normalize render options for hashing.
+
+    None values and options that do not affect the output are dropped, options
+    objects (dataclasses) are expanded to their fields, and the remaining
+    options are serialized with sorted keys.
+    """
+    normalized = {}
+    for key, value in options.items():
+        if value is None or key in IGNORED_OPTIONS:
+            continue
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            value = {field: v for field, v in dataclasses.asdict(value).items() if v is not None}
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, default=str, ensure_ascii=False)
+
+def make_cache_key(namespace, input_paths, options):
+    """
+    Build a cache key from the content of the inputs and the render options.
+
+    Args:
+        namespace: Name of the render operation
+        input_paths: Paths to the input files (media, subtitles, ...)
+        options: Dictionary of render options
+
+    Returns:
+        Hex cache key
+    """
+    hasher = hashlib.sha256(namespace.encode("utf-8"))
+    for path in input_paths:
+        hasher.update(hash_file(path).encode("ascii"))
+    hasher.update(normalize_options(options).encode("utf-8"))
+    return hasher.hexdigest()
+
+def _copy_file(source, destination):
+    """Copy a file; outputs are never hard-linked because ffmpeg -y truncates in place."""
+    if os.path.abspath(source) != os.path.abspath(destination):
+        shutil.copyfile(source, destination)
+
+class RenderCache:
+    """
+    Disk-backed cache of rendered outputs with size-based LRU eviction.
+
+    Each entry is one file named after its cache key, and its modification
+    time is its last access. The directory is shared by all server workers,
+    so lookups go to the directory and every eviction pass re-scans it: the
+    size limit holds for the whole directory, not for what one worker stored.
+    """
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES, max_age=RENDER_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        # Entry count and size seen by the latest scan of the directory
+        self._entries = 0
+        self._total_bytes = 0
+        self._sweeper = None
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = self._scan()
+        if entries:
+            logger.info(f"Render cache has {len(entries)} entries ({self._total_bytes} bytes) in {self.cache_dir}")
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def _scan(self):
+        """
+        List the cached files, least recently used first.
+
+        Returns:
+            List of (last access, size, path) tuples
+        """
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Evicted by another worker during the scan
+                continue
+            if os.path.isfile(path):
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        with self._lock:
+            self._entries = len(entries)
+            self._total_bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def get(self, key, output_path):
+        """
+        Place a cached output at output_path.
+
+        Args:
+            key: Cache key
+            output_path: Where the cached output should appear; its extension selects the entry
+
+        Returns:
+            True on a cache hit, False on a miss
+        """
+        cached_path = self._path(key, os.path.splitext(output_path)[1])
+        try:
+            _copy_file(cached_path, output_path)
+            # Keep the access time on disk: it orders the eviction of every worker
+            os.utime(cached_path)
+        except FileNotFoundError:
+            # Never stored, or evicted by any worker
+            with self._lock:
+                self._stats["misses"] += 1
+            return False
+        with self._lock:
+            self._stats["hits"] += 1
+        return True
+
+    def put(self, key, rendered_path, evict=True):
+        """
+        Store a rendered output.
+
+        Args:
+            key: Cache key
+            rendered_path: Path to the rendered file
+            evict: Run an eviction pass; callers storing many small entries run one after the batch instead
+        """
+        cached_path = self._path(key, os.path.splitext(rendered_path)[1])
+        temp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _copy_file(rendered_path, temp_path)
+        os.replace(temp_path, cached_path)
+        with self._lock:
+            self._stats["stores"] += 1
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries, then least recently used entries until the
+        directory fits its size limit.
+
+        Returns:
+            Number of removed entries
+        """
+        now = time.time()
+        entries = self._scan()
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+        for last_access, size, path in entries:
+            expired = now - last_access > self.max_age
+            if not expired and total_bytes <= self.max_bytes:
+                break
+            total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                continue
+            except OSError as e:
+                logger.warning(f"Could not remove cached render {path}: {str(e)}")
+                continue
+            removed += 1
+
+        with self._lock:
+            self._entries -= removed
+            self._total_bytes = total_bytes
+            self._stats["evictions"] += removed
+        if removed:
+            logger.info(f"Evicted {removed} cached render(s)")
+        return removed
+
+    def start_sweeper(self, interval=RENDER_CACHE_SWEEP_INTERVAL):
+        """Start the background thread that periodically evicts expired and excess entries."""
+        if self._sweeper is not None:
+            return
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict()
+                except Exception as e:
+                    logger.warning(f"Render cache sweep failed: {str(e)}")
+
+        self._sweeper = threading.Thread(target=sweep, name="render-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Hits, misses, stores and evictions count this process; entries and
+        bytes are those of the directory at its latest scan.
+
+        Returns:
+            Dictionary with hits, misses, stores, evictions, entries, bytes and max_bytes
+        """
+        with self._lock:
+            return dict(self._stats, entries=self._entries, bytes=self._total_bytes, max_bytes=self.max_bytes)
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+def get_render_cache():
+    """
+    Get the process-wide render cache, starting its sweeper on first use.
+
+    Returns:
+        RenderCache instance
+    """
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+            _render_cache.start_sweeper()
+    return _render_cache
+
+def get_cache_stats():
+    """Get statistics of the process-wide render cache."""
+    return get_render_cache().stats()
+
+def cached_render(func):
+    """
+    Cache a render function by the content of its inputs and its options.
+
+    The wrapped function must take video_path, subtitle_path and output_path and
+    return the output path. On a hit the cached output is copied to output_path
+    and the function is not called.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        video_path = arguments.pop("video_path")
+        subtitle_path = arguments.pop("subtitle_path")
+        output_path = arguments.get("output_path")
+        job_id = arguments.get("job_id")
+
+        try:
+            cache = get_render_cache()
+            key = make_cache_key(func.__name__, [video_path, subtitle_path], arguments)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: Render cache unavailable: {str(e)}")
+            return func(*args, **kwargs)
+
+        if cache.get(key, output_path):
+            logger.info(f"Job {job_id}: Render cache hit for {os.path.basename(video_path)} with {os.path.basename(subtitle_path)}")
+            return output_path
+
+        result = func(*args, **kwargs)
+        if result and os.path.exists(result):
+            try:
+                cache.put(key, result)
+            except OSError as e:
+                logger.warning(f"Job {job_id}: Could not store render in cache: {str(e)}")
+        return result
+
+    return wrapper
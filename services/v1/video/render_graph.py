@@ -0,0 +1,223 @@
+import os
+import logging
+import subprocess
+from services.v1.ffmpeg.audio_codec import get_audio_codec_args
+from services.v1.ffmpeg.ffmpeg_runner import run_ffmpeg
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class FilterNode:
+    """
+    A single video filter in a render graph.
+
+    Subclasses implement to_filter() and return the ffmpeg filter string for the node.
+    """
+    name = "filter"
+
+    def to_filter(self):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.to_filter()}>"
+
+class ScaleNode(FilterNode):
+    """Scale the video to a fixed size."""
+    name = "scale"
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def to_filter(self):
+        return f"scale={self.width}:{self.height}"
+
+class PadNode(FilterNode):
+    """
+    Pad the video with a solid colour.
+
+    By default the padding grows the frame. When width and height are given the
+    frame is padded to that size and top/left place the video inside it.
+    """
+    name = "pad"
+
+    def __init__(self, top=0, bottom=0, left=0, right=0, color="white", width=None, height=None):
+        self.top = int(top)
+        self.bottom = int(bottom)
+        self.left = int(left)
+        self.right = int(right)
+        self.color = color
+        self.width = width
+        self.height = height
+
+    def to_filter(self):
+        width = self.width if self.width is not None else f"iw+{self.left + self.right}"
+        height = self.height if self.height is not None else f"ih+{self.top + self.bottom}"
+        return f"pad={width}:{height}:{self.left}:{self.top}:color={self.color}"
+
+class DrawTextNode(FilterNode):
+    """
+    Draw a line of text with the drawtext filter.
+
+    The text must already be escaped for use inside single quotes.
+    """
+    name = "drawtext"
+
+    def __init__(self, text, fontfile, font_size, font_color="white", border_color="black",
+                 border_width=0, x="(w-text_w)/2", y=0, shadow_color=None, shadow_x=1, shadow_y=1):
+        self.text = text
+        self.fontfile = fontfile
+        self.font_size = font_size
+        self.font_color = font_color
+        self.border_color = border_color
+        self.border_width = border_width
+        self.x = x
+        self.y = y
+        self.shadow_color = shadow_color
+        self.shadow_x = shadow_x
+        self.shadow_y = shadow_y
+
+    def to_filter(self):
+        shadow_option = ""
+        if self.shadow_color:
+            shadow_option = f":shadowcolor={self.shadow_color}:shadowx={self.shadow_x}:shadowy={self.shadow_y}"
+        return (
+            f"drawtext=text='{self.text}':"
+            f"fontfile={self.fontfile}:"
+            f"fontsize={self.font_size}:"
+            f"fontcolor={self.font_color}:"
+            f"bordercolor={self.border_color}:"
+            f"borderw={self.border_width}{shadow_option}:"
+            f"x={self.x}:"
+            f"y={self.y}"
+        )
+
+class SubtitlesNode(FilterNode):
+    """
+    Burn in a subtitle file.
+
+    ASS files go through the ass filter so their own styles are kept, anything
+    else goes through the subtitles filter with an optional force_style.
+    """
+    name = "subtitles"
+
+    def __init__(self, subtitle_path, force_style=None):
+        self.subtitle_path = subtitle_path
+        self.force_style = force_style
+
+    def to_filter(self):
+        subtitle_path_fixed = self.subtitle_path.replace('\\', '/')
+        if subtitle_path_fixed.lower().endswith('.ass'):
+            return f"ass='{subtitle_path_fixed}'"
+        subtitle_filter = f"subtitles='{subtitle_path_fixed}'"
+        if self.force_style:
+            subtitle_filter += f":force_style='{self.force_style}'"
+        return subtitle_filter
+
+class RenderGraph:
+    """
+    Build a single ffmpeg filtergraph from a chain of filter nodes and render it in one encode.
+
+    Example:
+        RenderGraph(video_path).pad(top=200, color="white").subtitles(ass_path).render(output_path)
+    """
+
+    def __init__(self, input_path, job_id=None):
+        self.input_path = input_path
+        self.job_id = job_id
+        self.nodes = []
+
+    def add(self, node):
+        """Append a node to the graph and return the graph for chaining."""
+        self.nodes.append(node)
+        return self
+
+    def scale(self, width, height):
+        return self.add(ScaleNode(width, height))
+
+    def pad(self, top=0, bottom=0, left=0, right=0, color="white", width=None, height=None):
+        if not any([top, bottom, left, right]) and width is None and height is None:
+            return self
+        return self.add(PadNode(top, bottom, left, right, color, width, height))
+
+    def drawtext(self, text, fontfile, font_size, **kwargs):
+        return self.add(DrawTextNode(text, fontfile, font_size, **kwargs))
+
+    def subtitles(self, subtitle_path, force_style=None):
+        return self.add(SubtitlesNode(subtitle_path, force_style))
+
+    def build_filtergraph(self):
+        """
+        Join all nodes into a single filter chain.
+
+        Returns:
+            Filter string for -vf, or None if the graph is empty
+        """
+        if not self.nodes:
+            return None
+        return ",".join(node.to_filter() for node in self.nodes)
+
+    def build_command(self, output_path, crf=23, preset=None, extra_output_args=None):
+        """
+        Build the ffmpeg command for rendering the graph.
+
+        Args:
+            output_path: Path to the output video
+            crf: x264 constant rate factor
+            preset: Optional x264 preset
+            extra_output_args: Optional list of extra output arguments
+
+        Returns:
+            ffmpeg command as a list
+        """
+        ffmpeg_cmd = ["ffmpeg", "-y", "-i", self.input_path]
+
+        filtergraph = self.build_filtergraph()
+        if filtergraph:
+            ffmpeg_cmd.extend(["-vf", filtergraph])
+            ffmpeg_cmd.extend(["-c:v", "libx264", "-crf", str(crf)])
+            if preset:
+                ffmpeg_cmd.extend(["-preset", preset])
+        else:
+            # Nothing to draw, no need to touch the video stream
+            ffmpeg_cmd.extend(["-c:v", "copy"])
+
+        ffmpeg_cmd.extend(get_audio_codec_args(self.input_path, output_path))
+        ffmpeg_cmd.extend(["-max_muxing_queue_size", "9999"])
+        if extra_output_args:
+            ffmpeg_cmd.extend(extra_output_args)
+        ffmpeg_cmd.append(output_path)
+        return ffmpeg_cmd
+
+    def render(self, output_path, crf=23, preset=None, extra_output_args=None):
+        """
+        Render the graph with one ffmpeg encode.
+
+        Args:
+            output_path: Path to the output video
+            crf: x264 constant rate factor
+            preset: Optional x264 preset
+            extra_output_args: Optional list of extra output arguments
+
+        Returns:
+            Path to the output video
+        """
+        ffmpeg_cmd = self.build_command(output_path, crf=crf, preset=preset, extra_output_args=extra_output_args)
+        logger.info(f"Job {self.job_id}: Rendering {len(self.nodes)} filter node(s) in one pass: {[node.name for node in self.nodes]}")
+        logger.info(f"Job {self.job_id}: Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
+
+        try:
+            process = run_ffmpeg(ffmpeg_cmd, operation="render", job_id=self.job_id)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Job {self.job_id}: FFmpeg render failed: {e.stderr}")
+            raise
+
+        if process.stderr:
+            logger.debug(f"Job {self.job_id}: FFmpeg stderr: {process.stderr}")
+
+        if not os.path.exists(output_path):
+            logger.error(f"Job {self.job_id}: Output file was not created: {output_path}")
+            raise FileNotFoundError(f"Output file was not created: {output_path}")
+
+        logger.info(f"Job {self.job_id}: Rendered {output_path} ({os.path.getsize(output_path)} bytes)")
+        return output_path
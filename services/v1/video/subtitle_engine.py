@@ -0,0 +1,295 @@
+import os
+import re
+import logging
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional, Union
+from services.v1.video.render_graph import RenderGraph
+from services.v1.video.parallel_render import render_graph_in_segments
+from services.v1.video.overlay_captions import burn_subtitles_with_overlays
+from services.v1.video.render_cache import cached_render
+from services.v1.subtitles.ass_transcoder import to_ass_color
+from services.v1.fonts import font_registry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+THAI_PATTERN = re.compile(r'[\u0E00-\u0E7F]')
+
+# Named colours accepted in force_style, as ASS &HAABBGGRR
+ASS_NAMED_COLORS = {
+    "white": "&H00FFFFFF",
+    "black": "&H00000000",
+    "yellow": "&H0000FFFF",
+    "red": "&H000000FF",
+    "green": "&H0000FF00",
+    "blue": "&H00FF0000",
+    "cyan": "&H00FFFF00",
+    "magenta": "&H00FF00FF",
+}
+
+HORIZONTAL_ALIGNMENTS = {"left": 1, "center": 2, "right": 3}
+
+# ASS numpad alignment: bottom row 1-3, middle row 4-6, top row 7-9
+POSITION_ROW_OFFSETS = {"bottom": 0, "middle": 3, "top": 6}
+
+@dataclass
+class SubtitleOptions:
+    """
+    Styling and rendering options for burning subtitles into a video.
+
+    Font sizes and margins are in the subtitle script's coordinates: 1920x1080
+    for generated ASS files, libass defaults for SRT files.
+    """
+    font_name: Optional[str] = "Arial"
+    font_size: int = 24
+    position: str = "bottom"
+    alignment: Union[int, str] = 2
+    margin_v: int = 30
+    margin_l: Optional[int] = None
+    margin_r: Optional[int] = None
+    subtitle_style: str = "classic"
+    line_color: Optional[str] = "white"
+    outline_color: Optional[str] = "black"
+    back_color: Optional[str] = None
+    word_color: Optional[str] = None
+    all_caps: bool = False
+    max_words_per_line: int = 7
+    max_width: Optional[int] = None
+    max_width_px: Optional[int] = None
+    x: Optional[int] = None
+    y: Optional[int] = None
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+    strikeout: bool = False
+    outline: bool = True
+    shadow: bool = True
+    border_style: int = 1
+    encoding: Optional[int] = None
+    padding_top: int = 0
+    padding_bottom: int = 0
+    padding_left: int = 0
+    padding_right: int = 0
+    padding_color: str = "white"
+    engine: str = "libass"
+    parallel: bool = False
+    crf: int = 23
+    preset: Optional[str] = None
+
+    @classmethod
+    def from_kwargs(cls, **kwargs):
+        """
+        Build options from keyword arguments, ignoring None values and unknown keys.
+
+        Returns:
+            SubtitleOptions instance
+        """
+        names = {field.name for field in dataclasses.fields(cls)}
+        unknown = set(kwargs) - names
+        if unknown:
+            logger.warning(f"Ignoring unknown subtitle options: {sorted(unknown)}")
+        return cls(**{key: value for key, value in kwargs.items() if key in names and value is not None})
+
+    @property
+    def ass_alignment(self):
+        """ASS numpad alignment combining the horizontal alignment and the vertical position."""
+        if isinstance(self.alignment, str):
+            horizontal = HORIZONTAL_ALIGNMENTS.get(self.alignment.lower(), 2)
+        else:
+            horizontal = ((int(self.alignment) - 1) % 3) + 1
+        return horizontal + POSITION_ROW_OFFSETS.get((self.position or "bottom").lower(), 0)
+
+def contains_thai_text(path, chunk_size=65536):
+    """Check a text file for Thai characters, stopping at the first match."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            if THAI_PATTERN.search(chunk):
+                return True
+    return False
+
+def _write_all_caps_srt(srt_path):
+    caps_path = os.path.splitext(srt_path)[0] + ".caps.srt"
+    with open(srt_path, 'r', encoding='utf-8-sig') as f_in, open(caps_path, 'w', encoding='utf-8') as f_out:
+        for line in f_in:
+            # Cue numbers and timing lines are unaffected by upper()
+            f_out.write(line.upper())
+    return caps_path
+
+def _write_positioned_ass(ass_path, x, y):
+    """Write a copy of an ASS file with every dialogue line anchored at (x, y)."""
+    positioned_path = os.path.splitext(ass_path)[0] + ".pos.ass"
+    pos_tag = f"\\an5\\pos({x},{y})"
+    with open(ass_path, 'r', encoding='utf-8') as f_in, open(positioned_path, 'w', encoding='utf-8') as f_out:
+        for line in f_in:
+            if line.startswith("Dialogue:"):
+                fields = line.split(',', 9)
+                if len(fields) == 10:
+                    text = re.sub(r'\\an\d|\\pos\([^)]*\)', '', fields[9])
+                    line = ','.join(fields[:9]) + ',{' + pos_tag + '}' + text
+            f_out.write(line)
+    return positioned_path
+
+def force_style_for(options):
+    """
+    Build the libass force_style string for SRT subtitles.
+
+    Args:
+        options: SubtitleOptions
+
+    Returns:
+        force_style value
+    """
+    style = [
+        f"FontName={options.font_name or 'Arial'}",
+        f"FontSize={options.font_size}",
+    ]
+    if options.line_color:
+        style.append(f"PrimaryColour={to_ass_color(options.line_color, named=ASS_NAMED_COLORS)}")
+    if options.outline_color:
+        style.append(f"OutlineColour={to_ass_color(options.outline_color, named=ASS_NAMED_COLORS)}")
+    style.append(f"BackColour={to_ass_color(options.back_color, default_alpha='80', named=ASS_NAMED_COLORS) if options.back_color else '&H80000000'}")
+    style.append(f"BorderStyle={options.border_style}")
+    style.append(f"Outline={1 if options.outline else 0}")
+    style.append(f"Shadow={1 if options.shadow else 0}")
+    style.append(f"Bold={1 if options.bold else 0}")
+    style.append(f"Italic={1 if options.italic else 0}")
+    style.append(f"Underline={1 if options.underline else 0}")
+    style.append(f"StrikeOut={1 if options.strikeout else 0}")
+    style.append(f"Alignment={options.ass_alignment}")
+    style.append(f"MarginV={options.margin_v}")
+    if options.margin_l is not None:
+        style.append(f"MarginL={options.margin_l}")
+    if options.margin_r is not None:
+        style.append(f"MarginR={options.margin_r}")
+    if options.encoding is not None:
+        style.append(f"Encoding={options.encoding}")
+    return ",".join(style)
+
+def prepare_subtitle_file(subtitle_path, options, job_id=None):
+    """
+    Turn the input subtitles into the single file the renderer reads.
+
+    Thai SRT subtitles (and SRT subtitles that need absolute positioning) are
+    converted to ASS exactly once; other SRT files are left to libass with a
+    force_style. Each file is scanned for Thai only once.
+
+    Args:
+        subtitle_path: Path to the SRT or ASS file
+        options: SubtitleOptions
+        job_id: Job ID for logging
+
+    Returns:
+        Path to the subtitle file to render
+    """
+    from services.v1.video.caption_video import convert_srt_to_ass_for_thai
+
+    ext = os.path.splitext(subtitle_path)[1].lower()
+    if ext == '.srt':
+        if options.all_caps:
+            subtitle_path = _write_all_caps_srt(subtitle_path)
+
+        is_thai = contains_thai_text(subtitle_path)
+        needs_position = options.x is not None and options.y is not None
+        if is_thai or needs_position:
+            font_name = options.font_name
+            if is_thai:
+                registry = font_registry.get_font_registry()
+                font_path = registry.find(font_name) if font_name else None
+                if font_path is None or not registry.has_thai(font_path):
+                    # Let the converter pick the best installed Thai font
+                    font_name = None
+            logger.info(f"Job {job_id}: Converting SRT to ASS once for rendering")
+            subtitle_path = convert_srt_to_ass_for_thai(
+                srt_path=subtitle_path,
+                font_name=font_name,
+                font_size=options.font_size,
+                primary_color=options.line_color or "white",
+                outline_color=options.outline_color or "black",
+                back_color=options.back_color,
+                alignment=options.ass_alignment,
+                margin_v=options.margin_v,
+                max_words_per_line=options.max_words_per_line,
+                max_width=options.max_width,
+                max_width_px=options.max_width_px
+            )
+            ext = '.ass'
+    elif options.all_caps:
+        logger.debug(f"Job {job_id}: all_caps is only applied to SRT input")
+
+    if ext == '.ass' and options.x is not None and options.y is not None:
+        logger.info(f"Job {job_id}: Anchoring subtitles at custom coordinates x={options.x}, y={options.y}")
+        subtitle_path = _write_positioned_ass(subtitle_path, options.x, options.y)
+
+    return subtitle_path
+
+@cached_render
+def burn_subtitles(video_path, subtitle_path, output_path, options, job_id=None):
+    """
+    Burn subtitles into a video.
+
+    This is the single subtitle burn-in engine used by all caption routes.
+    Padding and subtitles are rendered in one encode; the source audio is kept
+    when the container allows it.
+
+    Args:
+        video_path: Path to the input video
+        subtitle_path: Path to the SRT or ASS file
+        output_path: Path to the output video
+        options: SubtitleOptions
+        job_id: Job ID for logging
+
+    Returns:
+        Path to the output video
+    """
+    if not os.path.exists(subtitle_path):
+        logger.error(f"Job {job_id}: Subtitle file not found: {subtitle_path}")
+        raise FileNotFoundError(f"Subtitle file not found: {subtitle_path}")
+
+    logger.info(f"Job {job_id}: Burning {subtitle_path} into {video_path} with the {options.engine} engine")
+
+    # Build the filtergraph: optional padding first so subtitles are laid out on the final frame
+    graph = RenderGraph(video_path, job_id=job_id)
+    graph.pad(top=options.padding_top, bottom=options.padding_bottom, left=options.padding_left,
+              right=options.padding_right, color=options.padding_color)
+
+    ext = os.path.splitext(subtitle_path)[1].lower()
+    if options.engine == "overlay" and ext in ('.ass', '.srt') and options.x is None:
+        # Composite pre-rendered subtitle sprites instead of laying out text on every frame
+        overlay_result = burn_subtitles_with_overlays(
+            video_path, subtitle_path, output_path,
+            font_size=options.font_size,
+            font_name=options.font_name,
+            position=options.position,
+            margin_v=options.margin_v,
+            line_color=options.line_color,
+            outline_color=options.outline_color,
+            back_color=options.back_color,
+            outline_width=2 if options.outline else 0,
+            pre_filters=graph.build_filtergraph(),
+            crf=options.crf,
+            job_id=job_id
+        )
+        if overlay_result:
+            return overlay_result
+        logger.info(f"Job {job_id}: Falling back to libass subtitle rendering")
+
+    render_path = prepare_subtitle_file(subtitle_path, options, job_id=job_id)
+    if os.path.splitext(render_path)[1].lower() == '.ass':
+        # The ass filter keeps the file's own styles
+        graph.subtitles(render_path)
+    else:
+        graph.subtitles(render_path, force_style=force_style_for(options))
+
+    # Render padding and subtitles in a single encode
+    if options.parallel:
+        render_graph_in_segments(graph, output_path, crf=options.crf, preset=options.preset)
+    else:
+        graph.render(output_path, crf=options.crf, preset=options.preset)
+
+    if not os.path.exists(output_path):
+        logger.error(f"Job {job_id}: Output file was not created: {output_path}")
+        raise FileNotFoundError(f"Output file was not created: {output_path}")
+
+    logger.info(f"Job {job_id}: Subtitled video created: {output_path} ({os.path.getsize(output_path)} bytes)")
+    return output_path
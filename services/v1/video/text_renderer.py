@@ -1,66 +1,276 @@
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import logging
+import json
+import threading
+from fractions import Fraction
+from collections import OrderedDict
+from services.v1.fonts import font_registry
+from services.v1.fonts.font_cache import load_font
+from services.v1.ffmpeg.audio_codec import get_audio_codec_args
+from services.v1.ffmpeg.ffmpeg_runner import FFmpegPipe, run_ffmpeg
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of rasterized captions kept in memory
+MAX_CACHED_SPRITES = 256
+
+_sprite_cache = OrderedDict()
+_sprite_lock = threading.Lock()
+
+class TextSprite:
+    """
+    A caption rasterized once into an RGBA image, prepared for fast blending.
+
+    The colour is stored premultiplied by alpha and the inverse alpha is kept
+    alongside, so blending onto a frame is one multiply-add per pixel. Fully
+    opaque sprites (the usual case with a background box) are plain copies.
+    """
+
+    def __init__(self, rgba):
+        self.height, self.width = rgba.shape[:2]
+        alpha = rgba[:, :, 3:4].astype(np.uint16)
+        self.opaque = bool((alpha == 255).all())
+        self.rgb = np.ascontiguousarray(rgba[:, :, :3])
+        self.premultiplied = rgba[:, :, :3].astype(np.uint16) * alpha
+        self.inverse_alpha = 255 - alpha
+
+def _load_text_font(font_family, font_size):
+    try:
+        font_path = font_registry.find_font(font_family) or f"fonts/{font_family}.ttf"
+        return load_font(font_path, font_size)
+    except Exception as e:
+        logger.error(f"Error loading font: {str(e)}")
+        # Fallback to a default font
+        return ImageFont.load_default()
+
+def render_text_sprite(text, font_family, font_size, text_color, bg_color, padding_x=20, padding_y=10):
+    """
+    Rasterize a caption with a background box into an RGBA sprite.
+
+    Sprites are cached by text and style, so a caption that stays on screen
+    for many frames is only laid out and rasterized once.
+
+    Args:
+        text: text to render
+        font_family: font family name
+        font_size: font size
+        text_color: text color (e.g., "white")
+        bg_color: background color (e.g., "black"), or None for no box
+        padding_x: horizontal padding around the text
+        padding_y: vertical padding around the text (extra room for Thai diacritics)
+
+    Returns:
+        TextSprite
+    """
+    key = (text, font_family, font_size, text_color, bg_color, padding_x, padding_y)
+    with _sprite_lock:
+        sprite = _sprite_cache.get(key)
+        if sprite is not None:
+            _sprite_cache.move_to_end(key)
+            return sprite
+
+    font = _load_text_font(font_family, font_size)
+
+    # Measure with the ink box so Thai vowels above and below the line are not cut off
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.textbbox((0, 0), text, font=font)
+    width = (right - left) + padding_x * 2
+    height = (bottom - top) + padding_y * 2
+
+    image = Image.new("RGBA", (max(width, 1), max(height, 1)), bg_color or (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.text((padding_x - left, padding_y - top), text, font=font, fill=text_color)
+
+    sprite = TextSprite(np.asarray(image))
+    with _sprite_lock:
+        _sprite_cache[key] = sprite
+        while len(_sprite_cache) > MAX_CACHED_SPRITES:
+            _sprite_cache.popitem(last=False)
+    return sprite
+
+def sprite_position(frame_width, frame_height, sprite, position, margin_bottom=30):
+    """
+    Resolve a position tuple to pixel coordinates for a sprite.
+
+    Args:
+        frame_width: frame width in pixels
+        frame_height: frame height in pixels
+        sprite: TextSprite to place
+        position: tuple (x, y) of pixels or strings like "center", "bottom"
+        margin_bottom: distance from the bottom edge for "bottom"
+
+    Returns:
+        Tuple (x, y) of the sprite's top-left corner
+    """
+    x, y = position
+    if x == "center":
+        x = (frame_width - sprite.width) // 2
+    if y == "bottom":
+        y = frame_height - sprite.height - margin_bottom
+    elif y == "center":
+        y = (frame_height - sprite.height) // 2
+    return int(x), int(y)
+
+def blend_sprite(frame, sprite, x, y):
+    """
+    Alpha-blend a sprite onto an RGB frame in place.
+
+    Only the covered region is touched and the sprite is clipped to the frame.
+
+    Args:
+        frame: writable numpy array (height, width, 3) of uint8
+        sprite: TextSprite to blend
+        x: left edge of the sprite in the frame
+        y: top edge of the sprite in the frame
+
+    Returns:
+        The same frame array
+    """
+    frame_height, frame_width = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sprite.width, frame_width), min(y + sprite.height, frame_height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    sx0, sy0 = x0 - x, y0 - y
+    sx1, sy1 = sx0 + (x1 - x0), sy0 + (y1 - y0)
+    region = frame[y0:y1, x0:x1]
+
+    if sprite.opaque:
+        region[...] = sprite.rgb[sy0:sy1, sx0:sx1]
+    else:
+        # (src * a + dst * (255 - a)) / 255 stays within uint16
+        blended = region * sprite.inverse_alpha[sy0:sy1, sx0:sx1]
+        blended += sprite.premultiplied[sy0:sy1, sx0:sx1]
+        blended //= 255
+        region[...] = blended
+    return frame
+
 def render_text_with_background(frame, text, position, font_family, font_size, text_color, bg_color):
     """
     Render text with a background box on a video frame.
-    
+
+    The caption is rasterized once and blended onto the frame in place.
+
     Args:
-        frame: numpy array of the video frame
+        frame: numpy array of the video frame (modified in place)
         text: text to render
         position: tuple (x, y) or strings like "center", "bottom"
         font_family: font family name
         font_size: font size
         text_color: text color (e.g., "white")
         bg_color: background color (e.g., "black")
-        
+
     Returns:
         numpy array of the frame with rendered text
     """
-    # 1. Increase padding around text to prevent cutting off
-    padding_x = 20  # Horizontal padding
-    padding_y = 10  # Vertical padding
-    
-    # 2. Use a font that fully supports Thai characters
-    try:
-        font = ImageFont.truetype(f"fonts/{font_family}.ttf", font_size)
-    except Exception as e:
-        logger.error(f"Error loading font: {str(e)}")
-        # Fallback to a default font
-        font = ImageFont.load_default()
-    
-    # 3. Create a temporary image to measure text dimensions
-    img_pil = Image.fromarray(frame)
-    draw = ImageDraw.Draw(img_pil)
-    
-    # 4. Get text size with extra padding for Thai diacritics
-    text_width, text_height = draw.textsize(text, font=font)
-    text_width += padding_x * 2  # Add padding to width
-    text_height += padding_y * 2  # Add padding to height
-    
-    # 5. Calculate text position (assuming bottom center)
-    x, y = position
-    if x == "center":
-        x = (frame.shape[1] - text_width) // 2
-    if y == "bottom":
-        y = frame.shape[0] - text_height - 30  # 30px from bottom
-    
-    # 6. Draw black background rectangle
-    draw.rectangle(
-        [(x, y), (x + text_width, y + text_height)],
-        fill=bg_color  # Background color
-    )
-    
-    # 7. Draw text with proper positioning to account for Thai characters
-    draw.text(
-        (x + padding_x, y + padding_y),  # Add padding to text position
-        text,
-        font=font,
-        fill=text_color
+    sprite = render_text_sprite(text, font_family, font_size, text_color, bg_color)
+    x, y = sprite_position(frame.shape[1], frame.shape[0], sprite, position)
+    return blend_sprite(frame, sprite, x, y)
+
+def _probe_video_stream(video_path, job_id=None):
+    """Get width, height and frame rate of the first video stream."""
+    result = run_ffmpeg(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,r_frame_rate",
+            "-of", "json",
+            video_path
+        ],
+        operation="ffprobe",
+        job_id=job_id,
+        capture_stdout=True
     )
-    
-    # 8. Convert back to numpy array for OpenCV
-    return np.array(img_pil)
+    stream = json.loads(result.stdout)["streams"][0]
+    return int(stream["width"]), int(stream["height"]), Fraction(stream["r_frame_rate"])
+
+def burn_text_stream(video_path, output_path, captions, font_family, font_size, text_color="white",
+                     bg_color="black", position=("center", "bottom"), crf=23, job_id=None):
+    """
+    Burn timed captions into a video by streaming raw frames through NumPy.
+
+    Frames are decoded by one ffmpeg process into a rawvideo pipe, the active
+    caption sprite is blended onto each frame in place, and the frames are piped
+    into a second ffmpeg process for encoding. The source audio is kept. Both
+    processes run under the ffmpeg runner's time limits and stop when the job
+    is cancelled.
+
+    Args:
+        video_path: Path to the input video
+        output_path: Path to the output video
+        captions: List of (start_seconds, end_seconds, text) tuples
+        font_family: font family name
+        font_size: font size
+        text_color: text color
+        bg_color: background color
+        position: tuple (x, y) or strings like "center", "bottom"
+        crf: x264 constant rate factor
+        job_id: Job ID for logging and cancellation
+
+    Returns:
+        Path to the output video
+
+    Raises:
+        FFmpegError: The decoder or encoder failed
+        FFmpegTimeout: A time limit was exceeded
+        FFmpegCancelled: The job was cancelled
+    """
+    width, height, frame_rate = _probe_video_stream(video_path, job_id=job_id)
+    frame_size = width * height * 3
+    captions = sorted(captions)
+    logger.info(f"Job {job_id}: Streaming {width}x{height}@{float(frame_rate):.3f} frames with {len(captions)} caption(s)")
+
+    decoder_cmd = ["ffmpeg", "-v", "error", "-i", video_path, "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    encoder_cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(frame_rate),
+        "-i", "-",
+        "-i", video_path,
+        "-map", "0:v:0", "-map", "1:a?",
+        "-c:v", "libx264", "-crf", str(crf), "-pix_fmt", "yuv420p",
+        *get_audio_codec_args(video_path, output_path),
+        output_path
+    ]
+
+    # One reusable buffer: frames are read into it, blended in place and written out
+    buffer = bytearray(frame_size)
+    view = memoryview(buffer)
+    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+    frame_index = 0
+    caption_index = 0
+    with FFmpegPipe(decoder_cmd, operation="burn_text_decode", job_id=job_id, read=True) as decoder, \
+            FFmpegPipe(encoder_cmd, operation="burn_text_encode", job_id=job_id, write=True) as encoder:
+        while True:
+            filled = 0
+            while filled < frame_size:
+                count = decoder.stdout.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if filled < frame_size:
+                break
+
+            timestamp = frame_index / frame_rate
+            while caption_index < len(captions) and captions[caption_index][1] <= timestamp:
+                caption_index += 1
+            if caption_index < len(captions) and captions[caption_index][0] <= timestamp:
+                sprite = render_text_sprite(captions[caption_index][2], font_family, font_size, text_color, bg_color)
+                x, y = sprite_position(width, height, sprite, position)
+                blend_sprite(frame, sprite, x, y)
+
+            try:
+                encoder.stdin.write(view)
+            except BrokenPipeError:
+                # The encoder stopped; its wait below reports why
+                break
+            frame_index += 1
+
+        # The encoder is checked first: when it fails the decoder only sees a closed pipe
+        encoder.wait()
+        decoder.wait()
+
+    logger.info(f"Job {job_id}: Streamed {frame_index} frames to {output_path}")
+    return output_path
@@ -1,11 +1,14 @@
 import requests
 import logging
 import json
+import time
+from services import metrics
 
 logger = logging.getLogger(__name__)
 
 def send_webhook(webhook_url, data):
     """Send a POST request to a webhook URL with the provided data."""
+    start_time = time.time()
     try:
         # Ensure data is JSON serializable
         try:
@@ -29,5 +32,9 @@ def send_webhook(webhook_url, data):
             response = requests.post(webhook_url, json=simple_data)
             response.raise_for_status()
             logger.info(f"Simplified webhook sent")
+        metrics.WEBHOOKS.inc(outcome="ok")
     except requests.RequestException as e:
         logger.error(f"Webhook request failed: {e}")
+        metrics.WEBHOOKS.inc(outcome="error")
+    finally:
+        metrics.WEBHOOK_DURATION.observe(time.time() - start_time)